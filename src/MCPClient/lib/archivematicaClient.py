@@ -32,11 +32,13 @@
 # The server will send the transcoder association pk, and file uuid to run.
 # The client is responsible for running the correct command on the file.
 
+from __future__ import print_function
 import ConfigParser
 import cPickle
 import gearman
 import logging
 import os
+import sys
 import time
 from socket import gethostname
 import threading
@@ -52,6 +54,7 @@ from main.models import Task
 
 from databaseFunctions import auto_close_db, getUTCDate
 from executeOrRunSubProcess import executeOrRun
+import in_process
 
 
 logger = logging.getLogger('archivematica.mcp.client')
@@ -62,6 +65,8 @@ replacementDic = {
     "%clientAssetsDirectory%": django_settings.CLIENT_ASSETS_DIRECTORY,
 }
 supportedModules = {}
+# Entry points of the client scripts run in-process, see in_process.py
+inProcessModules = {}
 
 
 def loadSupportedModulesSupport(key, value):
@@ -70,6 +75,11 @@ def loadSupportedModulesSupport(key, value):
     if not os.path.isfile(value):
         logger.error("Warning! Module can't find file, or relies on system path: {%s} %s", key, value)
     supportedModules[key] = value + " "
+    if django_settings.EXECUTE_IN_PROCESS:
+        entry_point = in_process.load_entry_point(value)
+        if entry_point is not None:
+            logger.info('Module %s will be executed in-process', key)
+            inProcessModules[key] = entry_point
 
 
 def loadSupportedModules(file):
@@ -82,65 +92,122 @@ def loadSupportedModules(file):
         for key, value in supportedModulesConfig.items('supportedCommandsSpecial'):
             loadSupportedModulesSupport(key, value)
 
+    if inProcessModules:
+        in_process.install_output_capture()
 
-@auto_close_db
-def executeCommand(gearman_worker, gearman_job):
+
+TASK_ALREADY_STARTED = """Detected this task has already started!
+Unable to determine if it completed successfully."""
+
+
+def runTask(execute, taskUUID, data, utcDate):
+    """
+    Run the command of a single task and return its results, a dict with the
+    exitCode, stdOut and stdError keys.
+
+    :param str execute: The name of the supported module to run.
+    :param str taskUUID: The UUID of the Task in the database.
+    :param dict data: The task data sent by MCPServer.
+    :param datetime utcDate: The time at which the task was started.
+    """
     try:
-        execute = gearman_job.task
-        logger.info('Executing %s (%s)', execute, gearman_job.unique)
-        data = cPickle.loads(gearman_job.data)
-        utcDate = getUTCDate()
         arguments = data["arguments"]  # .encode("utf-8")
         always_capture = data["alwaysCapture"]
         if isinstance(arguments, unicode):
             arguments = arguments.encode("utf-8")
 
         sInput = ""
-        clientID = gearman_worker.worker_client_id
-
-        task = Task.objects.get(taskuuid=gearman_job.unique)
-        if task.starttime is not None:
-            exitCode = -1
-            stdOut = ""
-            stdError = """Detected this task has already started!
-Unable to determine if it completed successfully."""
-            return cPickle.dumps({"exitCode": exitCode, "stdOut": stdOut, "stdError": stdError})
-        else:
-            task.client = clientID
-            task.starttime = utcDate
-            task.save()
 
         if execute not in supportedModules:
             output = ["Error!", "Error! - Tried to run and unsupported command."]
             exitCode = -1
-            return cPickle.dumps({"exitCode": exitCode, "stdOut": output[0], "stdError": output[1]})
+            return {"exitCode": exitCode, "stdOut": output[0], "stdError": output[1]}
         command = supportedModules[execute]
 
-        replacementDic["%date%"] = utcDate.isoformat()
-        replacementDic["%jobCreatedDate%"] = data["createdDate"]
+        taskReplacementDic = dict(replacementDic)
+        taskReplacementDic["%date%"] = utcDate.isoformat()
+        taskReplacementDic["%jobCreatedDate%"] = data["createdDate"]
         # Replace replacement strings
-        for key in replacementDic.keys():
-            command = command.replace(key, replacementDic[key])
-            arguments = arguments.replace(key, replacementDic[key])
+        for key in taskReplacementDic.keys():
+            command = command.replace(key, taskReplacementDic[key])
+            arguments = arguments.replace(key, taskReplacementDic[key])
 
         key = "%taskUUID%"
-        value = gearman_job.unique.__str__()
+        value = taskUUID.__str__()
         arguments = arguments.replace(key, value)
 
         # Execute command
         command += " " + arguments
-        logger.info('<processingCommand>{%s}%s</processingCommand>', gearman_job.unique, command)
+        logger.info('<processingCommand>{%s}%s</processingCommand>', taskUUID, command)
         capture_output = (
             django_settings.CAPTURE_CLIENT_SCRIPT_OUTPUT or always_capture)
-        exitCode, stdOut, stdError = executeOrRun(
-            'command', command, stdIn=sInput, printing=capture_output,
-            capture_output=capture_output)
-        return cPickle.dumps({"exitCode": exitCode, "stdOut": stdOut, "stdError": stdError})
+        if execute in inProcessModules:
+            exitCode, stdOut, stdError = in_process.execute(
+                inProcessModules[execute], arguments,
+                capture_output=capture_output)
+            if capture_output:
+                print(stdOut)
+                print(stdError, file=sys.stderr)
+        else:
+            exitCode, stdOut, stdError = executeOrRun(
+                'command', command, stdIn=sInput, printing=capture_output,
+                capture_output=capture_output)
+        return {"exitCode": exitCode, "stdOut": stdOut, "stdError": stdError}
     except OSError:
         logger.exception('Execution failed')
         output = ["Archivematica Client Error!", traceback.format_exc()]
         exitCode = 1
-        return cPickle.dumps({"exitCode": exitCode, "stdOut": output[0], "stdError": output[1]})
+        return {"exitCode": exitCode, "stdOut": output[0], "stdError": output[1]}
+    except Exception:
+        logger.exception('Unexpected error')
+        output = ["", traceback.format_exc()]
+        return {"exitCode": -1, "stdOut": output[0], "stdError": output[1]}
+
+
+def executeBatch(clientID, execute, tasks):
+    """
+    Run a batch of tasks sent by MCPServer as a single gearman job, one
+    after the other, and return the results of each task keyed by task UUID.
+
+    :param str clientID: The gearman worker client ID, recorded in each Task.
+    :param str execute: The name of the supported module to run.
+    :param list tasks: The data of each task; like the data of a single
+                       task plus the task UUID under the ``uuid`` key.
+    """
+    utcDate = getUTCDate()
+    taskUUIDs = [task["uuid"] for task in tasks]
+    started = set(Task.objects.filter(taskuuid__in=taskUUIDs, starttime__isnull=False).values_list('taskuuid', flat=True))
+    Task.objects.filter(taskuuid__in=taskUUIDs, starttime__isnull=True).update(client=clientID, starttime=utcDate)
+
+    results = {}
+    for task in tasks:
+        if task["uuid"] in started:
+            results[task["uuid"]] = {"exitCode": -1, "stdOut": "", "stdError": TASK_ALREADY_STARTED}
+            continue
+        results[task["uuid"]] = runTask(execute, task["uuid"], task, utcDate)
+    return {"taskResults": results}
+
+
+@auto_close_db
+def executeCommand(gearman_worker, gearman_job):
+    try:
+        execute = gearman_job.task
+        logger.info('Executing %s (%s)', execute, gearman_job.unique)
+        data = cPickle.loads(gearman_job.data)
+        clientID = gearman_worker.worker_client_id
+
+        if "tasks" in data:
+            return cPickle.dumps(executeBatch(clientID, execute, data["tasks"]))
+
+        utcDate = getUTCDate()
+        # Claim the task, unless another client has already started it
+        if not Task.objects.filter(taskuuid=gearman_job.unique, starttime__isnull=True).update(client=clientID, starttime=utcDate):
+            exitCode = -1
+            stdOut = ""
+            stdError = TASK_ALREADY_STARTED
+            return cPickle.dumps({"exitCode": exitCode, "stdOut": stdOut, "stdError": stdError})
+
+        return cPickle.dumps(runTask(execute, gearman_job.unique, data, utcDate))
     except Exception:
         logger.exception('Unexpected error')
         output = ["", traceback.format_exc()]
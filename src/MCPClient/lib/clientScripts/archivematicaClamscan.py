@@ -27,6 +27,7 @@ import subprocess
 import sys
 import uuid
 import errno
+import logging
 
 import django
 from django.conf import settings as mcpclient_settings
@@ -38,7 +39,7 @@ from databaseFunctions import insertIntoEvents
 from main.models import Event, File
 
 
-logger = get_script_logger("archivematica.mcp.client.clamscan")
+logger = logging.getLogger("archivematica.mcp.client.clamscan")
 
 
 def clamav_version_parts(ver):
@@ -371,5 +372,10 @@ def main(args):
     return scan_file(**kwargs)
 
 
+def call(args):
+    return main(args)
+
+
 if __name__ == '__main__':
-    sys.exit(main(sys.argv[1:]))
+    get_script_logger("archivematica.mcp.client.clamscan")
+    sys.exit(call(sys.argv[1:]))
@@ -41,6 +41,8 @@ django.setup()
 from django.utils import timezone
 from main.models import Agent, Derivation, Directory, DublinCore, Event, File, FileID, FPCommandOutput, SIP, SIPArrange
 
+from archivematicaCreateMETSPrefetch import UnitData
+from archivematicaCreateMETSWriter import SectionSpool
 import archivematicaCreateMETSReingest
 from archivematicaCreateMETSMetadataCSV import parseMetadata
 from archivematicaCreateMETSRights import archivematicaGetRights
@@ -98,6 +100,11 @@ trimStructMapObjects = None
 
 CSV_METADATA = {}
 
+# Rows of the unit loaded in bulk, see archivematicaCreateMETSPrefetch. When
+# unset, e.g. when functions are called on their own, every function queries
+# the database for the file it describes.
+unitData = None
+
 # move to common
 
 
@@ -167,6 +174,13 @@ def getDublinCore(unit, id):
     return ret
 
 
+def _unit_data(fileUUID):
+    """Return ``unitData`` if it has the rows of the file with fileUUID."""
+    if unitData is not None and fileUUID in unitData.files:
+        return unitData
+    return None
+
+
 def _get_mdl_identifiers(mdl):
     """Get identifiers of a model as a type-value 2-tuple."""
     if isinstance(mdl, FakeDirMdl):
@@ -426,7 +440,8 @@ def create_premis_object(fileUUID):
     :param str fileUUID: UUID of the File to create an object for
     :return: premis:object Element, suitable for inserting into mets:xmlData
     """
-    f = File.objects.get(uuid=fileUUID)
+    data = _unit_data(fileUUID)
+    f = data.files[fileUUID] if data else File.objects.get(uuid=fileUUID)
     # PREMIS:OBJECT
     object_elem = etree.Element(ns.premisBNS + "object", nsmap={'premis': ns.premisNS})
     object_elem.set(ns.xsiBNS + "type", "premis:file")
@@ -466,14 +481,18 @@ def create_premis_object(fileUUID):
 
 
 def create_premis_object_formats(fileUUID):
-    files = FileID.objects.filter(file_id=fileUUID)
+    data = _unit_data(fileUUID)
+    if data:
+        formats = data.formats.get(fileUUID, [])
+    else:
+        formats = FileID.objects.filter(file_id=fileUUID).values_list('format_name', 'format_version', 'format_registry_name', 'format_registry_key')
     elements = []
-    if not files.exists():
+    if not formats:
         fmt = etree.Element(ns.premisBNS + "format")
         formatDesignation = etree.SubElement(fmt, ns.premisBNS + "formatDesignation")
         etree.SubElement(formatDesignation, ns.premisBNS + "formatName").text = "Unknown"
         elements.append(fmt)
-    for row in files.values_list('format_name', 'format_version', 'format_registry_name', 'format_registry_key'):
+    for row in formats:
         fmt = etree.Element(ns.premisBNS + "format")
 
         formatDesignation = etree.SubElement(fmt, ns.premisBNS + "formatDesignation")
@@ -493,8 +512,12 @@ def create_premis_object_characteristics_extensions(fileUUID):
     elements = [objectCharacteristicsExtension]
 
     parser = etree.XMLParser(remove_blank_text=True)
-    documents = FPCommandOutput.objects.filter(file_id=fileUUID, rule__purpose__in=['characterization', 'default_characterization']).values_list('content')
-    for document, in documents:
+    data = _unit_data(fileUUID)
+    if data:
+        documents = data.characterization_documents(fileUUID)
+    else:
+        documents = [content for content, in FPCommandOutput.objects.filter(file_id=fileUUID, rule__purpose__in=['characterization', 'default_characterization']).values_list('content')]
+    for document in documents:
         # This needs to be converted into an str because lxml doesn't accept
         # XML documents in unicode strings if the document contains an
         # encoding declaration.
@@ -506,8 +529,12 @@ def create_premis_object_characteristics_extensions(fileUUID):
 
 def create_premis_object_derivations(fileUUID):
     elements = []
+    data = _unit_data(fileUUID)
     # Derivations
-    derivations = Derivation.objects.filter(source_file_id=fileUUID, event__isnull=False)
+    if data:
+        derivations = [d for d in data.derivations_by_source.get(fileUUID, []) if d.event_id is not None]
+    else:
+        derivations = Derivation.objects.filter(source_file_id=fileUUID, event__isnull=False)
     for derivation in derivations:
         relationship = etree.Element(ns.premisBNS + "relationship")
         etree.SubElement(relationship, ns.premisBNS + "relationshipType").text = "derivation"
@@ -523,7 +550,10 @@ def create_premis_object_derivations(fileUUID):
 
         elements.append(relationship)
 
-    derivations = Derivation.objects.filter(derived_file_id=fileUUID, event__isnull=False)
+    if data:
+        derivations = [d for d in data.derivations_by_derived.get(fileUUID, []) if d.event_id is not None]
+    else:
+        derivations = Derivation.objects.filter(derived_file_id=fileUUID, event__isnull=False)
     for derivation in derivations:
         relationship = etree.Element(ns.premisBNS + "relationship")
         etree.SubElement(relationship, ns.premisBNS + "relationshipType").text = "derivation"
@@ -548,8 +578,12 @@ def createDigiprovMD(fileUUID):
     """
     global globalDigiprovMDCounter
     ret = []
+    data = _unit_data(fileUUID)
 
-    events = Event.objects.filter(file_uuid_id=fileUUID)
+    if data:
+        events = data.events.get(fileUUID, [])
+    else:
+        events = Event.objects.filter(file_uuid_id=fileUUID)
     for event_record in events:
         globalDigiprovMDCounter += 1
         digiprovMD = etree.Element(ns.metsBNS + "digiprovMD", ID='digiprovMD_' + str(globalDigiprovMDCounter))
@@ -559,7 +593,10 @@ def createDigiprovMD(fileUUID):
         xmlData = etree.SubElement(mdWrap, ns.metsBNS + "xmlData")
         xmlData.append(createEvent(event_record))
 
-    agents = Agent.objects.filter(event__file_uuid_id=fileUUID).distinct()
+    if data:
+        agents = data.agents(fileUUID)
+    else:
+        agents = Agent.objects.filter(event__file_uuid_id=fileUUID).distinct()
     for agent in agents:
         globalDigiprovMDCounter += 1
         digiprovMD = etree.Element(ns.metsBNS + "digiprovMD", ID='digiprovMD_' + str(globalDigiprovMDCounter))
@@ -644,7 +681,7 @@ def getAMDSec(fileUUID, filePath, use, type, sip_uuid, transferUUID, itemdirecto
 
     if use == "original":
         metadataAppliesToList = [(fileUUID, FileMetadataAppliesToType), (sip_uuid, SIPMetadataAppliesToType), (transferUUID, TransferMetadataAppliesToType)]
-        for a in archivematicaGetRights(metadataAppliesToList, fileUUID):
+        for a in archivematicaGetRights(metadataAppliesToList, fileUUID, _unit_data(fileUUID)):
             globalRightsMDCounter += 1
             rightsMD = etree.SubElement(AMD, ns.metsBNS + "rightsMD")
             rightsMD.set("ID", "rightsMD_" + globalRightsMDCounter.__str__())
@@ -780,6 +817,15 @@ def createFileSec(directoryPath, parentDiv, baseDirectoryPath,
         else:
             structMapDiv.set("DMDID", dir_dmd_id)
 
+    if unitData is not None and includeAmdSec:
+        # Characterization output is loaded one directory at a time
+        directoryFileUUIDs = []
+        for name in directoryContents:
+            location = os.path.join(directoryPath, name).replace(baseDirectoryPath, baseDirectoryName, 1)
+            directoryFileUUIDs.extend(
+                dir_file.uuid for dir_file in unitData.files_by_location.get(location, []))
+        unitData.load_characterization(directoryFileUUIDs)
+
     for item in directoryContents:
         itemdirectoryPath = os.path.join(directoryPath, item)
         if os.path.isdir(itemdirectoryPath):
@@ -798,7 +844,10 @@ def createFileSec(directoryPath, parentDiv, baseDirectoryPath,
                 "currentlocation": directoryPathSTR
             }
             try:
-                f = File.objects.get(**kwargs)
+                if unitData is not None:
+                    f = unitData.file_at(directoryPathSTR)
+                else:
+                    f = File.objects.get(**kwargs)
             except File.DoesNotExist:
                 print('No uuid for file: "', directoryPathSTR, '"',
                       file=sys.stderr)
@@ -824,7 +873,6 @@ def createFileSec(directoryPath, parentDiv, baseDirectoryPath,
 
                 trimAmdSec = etree.Element(ns.metsBNS + "amdSec")
                 globalAmdSecCounter += 1
-                amdSecs.append(trimAmdSec)
                 ID = "amdSec_" + globalAmdSecCounter.__str__()
                 trimAmdSec.set("ID", ID)
 
@@ -833,6 +881,8 @@ def createFileSec(directoryPath, parentDiv, baseDirectoryPath,
                 digiprovMD.set("ID", "digiprovMD_" + str(globalDigiprovMDCounter))
 
                 trimAmdSec.append(digiprovMD)
+                # amdSecs may be spooled, append it once complete
+                amdSecs.append(trimAmdSec)
 
                 trimStructMapObjects.set("ADMID", ID)
 
@@ -891,7 +941,10 @@ def createFileSec(directoryPath, parentDiv, baseDirectoryPath,
             elif use in ("preservation", "text/ocr"):
                 # Derived files should be in the original file's group
                 try:
-                    d = Derivation.objects.get(derived_file_id=f.uuid)
+                    if _unit_data(f.uuid):
+                        d = unitData.source_derivation(f.uuid)
+                    else:
+                        d = Derivation.objects.get(derived_file_id=f.uuid)
                 except Derivation.DoesNotExist:
                     print('Fatal error: unable to locate a Derivation object'
                           ' where the derived file is {}'.format(f.uuid))
@@ -1116,18 +1169,24 @@ def create_object_metadata(struct_map, baseDirectoryPath):
     return el
 
 
-def write_mets(tree, filename):
+def write_mets(tree, filename, spool=None):
     """
     Write tree to filename, and a validate METS form.
 
     :param ElementTree tree: METS ElementTree
     :param str filename: Filename to write the METS to
+    :param SectionSpool spool: Sections to write in place of the spool's
+                               placeholder in tree, if any
     """
-    tree.write(filename, pretty_print=True, xml_declaration=True, encoding='utf-8')
+    if spool is None:
+        tree.write(filename, pretty_print=True, xml_declaration=True, encoding='utf-8')
+    else:
+        with open(filename, 'wb') as f:
+            spool.write_tree(tree, f)
 
     import cgi
     validate_filename = filename + ".validatorTester.html"
-    fileContents = """<html>
+    form_start, form_end = """<html>
 <body>
   <form method="post" action="http://pim.fcla.edu/validate/results">
     <label for="document">Enter XML Document:</label>
@@ -1139,9 +1198,13 @@ def write_mets(tree, filename):
     <br/>
   </form>
 </body>
-</html>""" % (cgi.escape(etree.tostring(tree, pretty_print=True, xml_declaration=True, encoding='utf-8')))
-    with open(validate_filename, 'w') as f:
-        f.write(fileContents)
+</html>""".split('%s')
+    # Copy the METS file in chunks rather than serializing the tree again
+    with open(validate_filename, 'w') as f, open(filename, 'rb') as mets:
+        f.write(form_start)
+        for chunk in iter(lambda: mets.read(1024 * 1024), b''):
+            f.write(cgi.escape(chunk))
+        f.write(form_end)
 
 
 def get_paths_as_fsitems(baseDirectoryPath, objectsDirectoryPath):
@@ -1329,6 +1392,8 @@ if __name__ == '__main__':
         except OSError:
             pass
 
+    unitData = UnitData(fileGroupType, fileGroupIdentifier)
+
     # Get the <dmdSec> for the entire AIP; it is associated to the root
     # <mets:div> in the physical structMap.
     sip_mdl = SIP.objects.filter(uuid=fileGroupIdentifier).first()
@@ -1340,6 +1405,15 @@ if __name__ == '__main__':
         aipDmdSec.set("ID", aip_dmd_id)
         structMapDiv.set("DMDID", aip_dmd_id)
 
+    rootNSMap = {
+        'mets': ns.metsNS,
+        'xsi': ns.xsiNS,
+        'xlink': ns.xlinkNS,
+    }
+    # Serialize amdSecs as they are created rather than keeping every one of
+    # them in memory until the end
+    amdSecs = SectionSpool(rootNSMap, dir=os.path.dirname(os.path.abspath(XMLFile)))
+
     structMapDivObjects = createFileSec(
         objectsDirectoryPath, structMapDiv, baseDirectoryPath,
         baseDirectoryPathString, fileGroupIdentifier, fileGroupType,
@@ -1361,11 +1435,6 @@ if __name__ == '__main__':
         if len(grp) > 0:
             fileSec.append(grp)
 
-    rootNSMap = {
-        'mets': ns.metsNS,
-        'xsi': ns.xsiNS,
-        'xlink': ns.xlinkNS,
-    }
     root = etree.Element(ns.metsBNS + "mets",
                          nsmap=rootNSMap,
                          attrib={"{" + ns.xsiNS + "}schemaLocation": "http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/version111/mets.xsd"},
@@ -1388,8 +1457,7 @@ if __name__ == '__main__':
     for dmdSec in dmdSecs:
         root.append(dmdSec)
 
-    for amdSec in amdSecs:
-        root.append(amdSec)
+    root.append(amdSecs.placeholder())
 
     root.append(fileSec)
     root.append(structMap)
@@ -1412,6 +1480,7 @@ if __name__ == '__main__':
         print("DigiprovMDs:", globalDigiprovMDCounter)
 
     tree = etree.ElementTree(root)
-    write_mets(tree, XMLFile)
+    write_mets(tree, XMLFile, amdSecs)
+    amdSecs.close()
 
     sys.exit(sharedVariablesAcrossModules.globalErrorCount)
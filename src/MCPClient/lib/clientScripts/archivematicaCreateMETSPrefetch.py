@@ -0,0 +1,209 @@
+#!/usr/bin/env python2
+#
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.    If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage archivematicaClientScript
+
+"""
+Bulk loading of the database rows needed to write the METS of a unit.
+
+Building the amdSec of a file takes around ten queries (the File, its
+identifiers, formats, characterization output, derivations, events, agents
+and rights), so a SIP with tens of thousands of files costs hundreds of
+thousands of round trips. ``UnitData`` loads those rows with a few queries
+per table for the whole unit and indexes them by file UUID.
+"""
+
+import collections
+from itertools import islice
+
+from django.db.models import Q
+# dashboard
+from main.models import Derivation, Event, File, FileID, FPCommandOutput, RightsStatement
+
+SIPMetadataAppliesToType = '3e48343d-e2d2-4956-aaa3-b54d26eb9761'
+TransferMetadataAppliesToType = '45696327-44c5-4e78-849b-e027a189bf4d'
+FileMetadataAppliesToType = '7f04d9d4-92c2-44a5-93dc-b7bfdf0c1f17'
+
+# Keep IN clauses short enough for every database backend
+QUERY_CHUNK_SIZE = 500
+
+CHARACTERIZATION_PURPOSES = ['characterization', 'default_characterization']
+
+RIGHTS_RELATIONS = (
+    'rightsstatementcopyright_set__rightsstatementcopyrightnote_set',
+    'rightsstatementcopyright_set__rightsstatementcopyrightdocumentationidentifier_set',
+    'rightsstatementlicense_set__rightsstatementlicensedocumentationidentifier_set',
+    'rightsstatementlicense_set__rightsstatementlicensenote_set',
+    'rightsstatementstatuteinformation_set__rightsstatementstatuteinformationnote_set',
+    'rightsstatementstatuteinformation_set__rightsstatementstatutedocumentationidentifier_set',
+    'rightsstatementotherrightsinformation_set__rightsstatementotherrightsdocumentationidentifier_set',
+    'rightsstatementotherrightsinformation_set__rightsstatementotherrightsinformationnote_set',
+    'rightsstatementrightsgranted_set__restrictions',
+    'rightsstatementrightsgranted_set__notes',
+)
+
+
+def _chunks(iterable, size=QUERY_CHUNK_SIZE):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+class UnitData(object):
+    """
+    The rows describing the files of a unit, keyed by file UUID.
+
+    :param str fileGroupType: Name of the File field linking files to the
+                              unit, e.g. "sip_id".
+    :param str fileGroupIdentifier: UUID of the unit.
+    """
+
+    def __init__(self, fileGroupType, fileGroupIdentifier):
+        self.fileGroupType = fileGroupType
+        self.fileGroupIdentifier = fileGroupIdentifier
+        self._load_files()
+        self._load_formats()
+        self._load_derivations()
+        self._load_events()
+        self._characterization = {}
+        self._rights = {}
+        self.load_rights(FileMetadataAppliesToType, self.files)
+        self.load_rights(SIPMetadataAppliesToType, [fileGroupIdentifier])
+        self.load_rights(TransferMetadataAppliesToType,
+                         set(f.transfer_id for f in self.files.values() if f.transfer_id))
+
+    def _unit_filter(self, prefix=''):
+        return {prefix + self.fileGroupType: self.fileGroupIdentifier}
+
+    def _load_files(self):
+        self.files = {}
+        self.files_by_location = {}
+        files = File.objects.filter(**self._unit_filter()) \
+            .select_related('transfer') \
+            .prefetch_related('identifiers')
+        for f in files:
+            self.files[f.uuid] = f
+            if f.removedtime is None:
+                self.files_by_location.setdefault(f.currentlocation, []).append(f)
+
+    def _load_formats(self):
+        self.formats = collections.defaultdict(list)
+        rows = FileID.objects.filter(**self._unit_filter('file__')).order_by('pk') \
+            .values_list('file_id', 'format_name', 'format_version', 'format_registry_name', 'format_registry_key')
+        for row in rows:
+            self.formats[row[0]].append(row[1:])
+
+    def _load_derivations(self):
+        self.derivations_by_source = collections.defaultdict(list)
+        self.derivations_by_derived = collections.defaultdict(list)
+        derivations = Derivation.objects.filter(
+            Q(**self._unit_filter('source_file__')) | Q(**self._unit_filter('derived_file__'))).order_by('pk')
+        for derivation in derivations:
+            self.derivations_by_source[derivation.source_file_id].append(derivation)
+            self.derivations_by_derived[derivation.derived_file_id].append(derivation)
+
+    def _load_events(self):
+        self.events = collections.defaultdict(list)
+        events = Event.objects.filter(**self._unit_filter('file_uuid__')) \
+            .order_by('pk').prefetch_related('agents')
+        for event in events:
+            self.events[event.file_uuid_id].append(event)
+
+    def file_at(self, currentlocation):
+        """
+        Return the File of the unit at ``currentlocation`` that has not been
+        removed, raising File.DoesNotExist or File.MultipleObjectsReturned
+        like ``File.objects.get`` would.
+        """
+        files = self.files_by_location.get(currentlocation, [])
+        if not files:
+            raise File.DoesNotExist('No file at ' + currentlocation)
+        if len(files) > 1:
+            raise File.MultipleObjectsReturned('Several files at ' + currentlocation)
+        return files[0]
+
+    def source_derivation(self, fileUUID):
+        """
+        Return the Derivation whose derived file is ``fileUUID``, raising
+        Derivation.DoesNotExist or Derivation.MultipleObjectsReturned like
+        ``Derivation.objects.get`` would.
+        """
+        derivations = self.derivations_by_derived.get(fileUUID, [])
+        if not derivations:
+            raise Derivation.DoesNotExist('No derivation for ' + fileUUID)
+        if len(derivations) > 1:
+            raise Derivation.MultipleObjectsReturned('Several derivations for ' + fileUUID)
+        return derivations[0]
+
+    def agents(self, fileUUID):
+        """Return the distinct Agents linked to the events of ``fileUUID``."""
+        agents = {}
+        for event in self.events.get(fileUUID, []):
+            for agent in event.agents.all():
+                agents[agent.pk] = agent
+        return [agents[pk] for pk in sorted(agents)]
+
+    def load_characterization(self, fileUUIDs):
+        """
+        Load the characterization output of ``fileUUIDs``, replacing the
+        output loaded previously.
+
+        Characterization documents can be large, so they are loaded for a
+        directory at a time rather than for the whole unit.
+        """
+        self._characterization = {fileUUID: [] for fileUUID in fileUUIDs}
+        for chunk in _chunks(self._characterization):
+            rows = FPCommandOutput.objects.filter(
+                file_id__in=chunk,
+                rule__purpose__in=CHARACTERIZATION_PURPOSES).order_by('pk').values_list('file_id', 'content')
+            for fileUUID, content in rows:
+                self._characterization[fileUUID].append(content)
+
+    def characterization_documents(self, fileUUID):
+        """Return the characterization output of ``fileUUID``."""
+        if fileUUID in self._characterization:
+            return self._characterization[fileUUID]
+        return [content for content, in FPCommandOutput.objects.filter(
+            file_id=fileUUID,
+            rule__purpose__in=CHARACTERIZATION_PURPOSES).values_list('content')]
+
+    def load_rights(self, metadataAppliesToType, identifiers):
+        """
+        Load the RightsStatements of type ``metadataAppliesToType`` for
+        ``identifiers``, with all the related rows used to write them.
+        """
+        identifiers = [i for i in set(identifiers) if (i, metadataAppliesToType) not in self._rights]
+        for identifier in identifiers:
+            self._rights[(identifier, metadataAppliesToType)] = []
+        for chunk in _chunks(identifiers):
+            statements = RightsStatement.objects.filter(
+                metadataappliestoidentifier__in=chunk,
+                metadataappliestotype_id=metadataAppliesToType).order_by('pk').prefetch_related(*RIGHTS_RELATIONS)
+            for statement in statements:
+                self._rights[(statement.metadataappliestoidentifier, metadataAppliesToType)].append(statement)
+
+    def rights(self, metadataAppliesToIdentifier, metadataAppliesToType):
+        """Return the RightsStatements applying to an identifier."""
+        key = (metadataAppliesToIdentifier, metadataAppliesToType)
+        if key not in self._rights:
+            self.load_rights(metadataAppliesToType, [metadataAppliesToIdentifier])
+        return self._rights[key]
@@ -46,14 +46,21 @@ def formatDate(date):
     return date
 
 
-def archivematicaGetRights(metadataAppliesToList, fileUUID):
-    """[(fileUUID, fileUUIDTYPE), (sipUUID, sipUUIDTYPE), (transferUUID, transferUUIDType)]"""
+def archivematicaGetRights(metadataAppliesToList, fileUUID, unitData=None):
+    """[(fileUUID, fileUUIDTYPE), (sipUUID, sipUUIDTYPE), (transferUUID, transferUUIDType)]
+
+    If given, the statements are taken from ``unitData``, a
+    archivematicaCreateMETSPrefetch.UnitData, instead of the database.
+    """
     ret = []
     for metadataAppliesToidentifier, metadataAppliesToType in metadataAppliesToList:
-        statements = RightsStatement.objects.filter(
-            metadataappliestoidentifier=metadataAppliesToidentifier,
-            metadataappliestotype_id=metadataAppliesToType
-        )
+        if unitData is not None:
+            statements = unitData.rights(metadataAppliesToidentifier, metadataAppliesToType)
+        else:
+            statements = RightsStatement.objects.filter(
+                metadataappliestoidentifier=metadataAppliesToidentifier,
+                metadataappliestotype_id=metadataAppliesToType
+            )
         for statement in statements:
             rightsStatement = createRightsStatement(statement, fileUUID)
             ret.append(rightsStatement)
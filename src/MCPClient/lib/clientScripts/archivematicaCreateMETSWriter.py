@@ -0,0 +1,97 @@
+#!/usr/bin/env python2
+#
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.    If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage archivematicaClientScript
+
+"""
+Incremental writing of METS documents too large to be held in memory.
+
+The amdSecs, which embed the characterization output of every file, make up
+most of a METS document. ``SectionSpool`` serializes each of them as soon as
+it is created and keeps the bytes in a temporary file; the rest of the
+document is built as an lxml tree as usual, with a placeholder where the
+spooled sections go, and both are stitched together when writing.
+
+Each section is serialized as the child of an element declaring the same
+namespaces as the METS root, so that the output is byte for byte what
+serializing the whole tree would give.
+"""
+
+import io
+import shutil
+import tempfile
+from uuid import uuid4
+
+import lxml.etree as etree
+
+import namespaces as ns
+
+
+class SectionSpool(object):
+    """
+    Top-level METS sections serialized to a temporary file as they come.
+
+    :param dict nsmap: The namespace map of the METS root element.
+    :param str dir: Directory to create the temporary file in.
+    """
+
+    def __init__(self, nsmap, dir=None):
+        self.nsmap = nsmap
+        self._file = tempfile.TemporaryFile(dir=dir)
+        self._marker = 'spooled-sections-' + str(uuid4())
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, section):
+        """
+        Serialize ``section`` and drop it from memory; it must not be modified
+        afterwards.
+        """
+        wrapper = etree.Element(ns.metsBNS + "mets", nsmap=self.nsmap)
+        wrapper.append(section)
+        serialized = etree.tostring(wrapper, pretty_print=True, encoding='utf-8')
+        # Keep the indented child and its trailing newline, without the
+        # wrapper's start and end tags
+        self._file.write(serialized[serialized.index('>\n') + 2:serialized.rindex('</')])
+        self._count += 1
+
+    def placeholder(self):
+        """Return the element marking where the sections go in the tree."""
+        return etree.Comment(self._marker)
+
+    def write_tree(self, tree, f):
+        """
+        Write ``tree`` to the file object ``f`` as ``ElementTree.write`` with
+        pretty_print would, with the spooled sections in place of the
+        placeholder.
+        """
+        buf = io.BytesIO()
+        tree.write(buf, pretty_print=True, xml_declaration=True, encoding='utf-8')
+        head, tail = buf.getvalue().split('<!--{}-->'.format(self._marker))
+        # Drop the placeholder's indentation and newline
+        f.write(head[:head.rindex('\n') + 1])
+        self._file.seek(0)
+        shutil.copyfileobj(self._file, f)
+        f.write(tail[1:])
+
+    def close(self):
+        self._file.close()
@@ -18,8 +18,11 @@
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+from contextlib import closing
+import fcntl
 import os
 import re
+import sqlite3
 import sys
 import uuid
 
@@ -39,6 +42,8 @@ import parse_mets_to_db
 
 logger = get_script_logger('archivematica.mcp.client.updateSizeAndChecksum')
 
+METS_INFO_COLUMNS = ('file_size', 'checksum', 'checksum_type', 'derivation', 'format_version')
+
 
 def find_mets_file(unit_path):
     """
@@ -52,35 +57,20 @@ def find_mets_file(unit_path):
             return os.path.join(src, m.group())
 
 
-def get_file_info_from_mets(shared_path, file_):
-    """Get file size, checksum & type, and derivation for this file from METS.
+def _fsentry_info(fsentries, fsentry):
+    """Get file size, checksum & type, and derivation of an FSEntry.
 
-    Given an instance of a File, return a dict with keys: file_size,
-    checksum and checksum_type, as they are described in the original METS
-    document of the transfer. The dict will be empty or missing keys on error.
+    :param dict fsentries: Every FSEntry of the document with a file UUID,
+                           keyed by file UUID.
+    :return: A dict as described in ``get_file_info_from_mets``, or None if
+             the FSEntry has no PREMIS object.
     """
-    transfer = file_.transfer
-    transfer_location = transfer.currentlocation.replace(
-        '%sharedPath%', shared_path, 1)
-    mets_file = find_mets_file(transfer_location)
-    if not mets_file:
-        logger.info('Archivematica AIP: METS file not found in %s.',
-                    transfer_location)
-        return {}
-    logger.info('Archivematica AIP: reading METS file %s.', mets_file)
-    mets = metsrw.METSDocument.fromfile(mets_file)
-    fsentry = mets.get_file(file_uuid=file_.uuid)
-    if not fsentry:
-        logger.error('Archivematica AIP: FSEntry with UUID %s not found', file_.uuid)
-        return {}
-
     # Get the UUID of a preservation derivative, if one exists
     try:
         premis_object = fsentry.get_premis_objects()[0]
     except IndexError:
-        logger.error('Archivematica AIP: PREMIS:OBJECT could not be found')
-        return {}
-    premis_object = fsentry.get_premis_objects()[0]
+        logger.error('Archivematica AIP: PREMIS:OBJECT could not be found for %s', fsentry.file_uuid)
+        return None
     related_object_uuid = None
     for relationship in premis_object.relationship:
         if relationship.sub_type != 'is source of':
@@ -90,7 +80,7 @@ def get_file_info_from_mets(shared_path, file_):
         if (not event) or (event.type != 'normalization'):
             continue
         rel_obj_uuid = relationship.related_object_identifier_value
-        related_object_fsentry = mets.get_file(file_uuid=rel_obj_uuid)
+        related_object_fsentry = fsentries.get(rel_obj_uuid)
         if getattr(related_object_fsentry, 'use', None) != 'preservation':
             continue
         related_object_uuid = rel_obj_uuid
@@ -99,15 +89,118 @@ def get_file_info_from_mets(shared_path, file_):
     premis_object_doc = [
         ss.contents.document for ss in fsentry.amdsecs[0].subsections
         if ss.contents.mdtype == metsrw.FSEntry.PREMIS_OBJECT][0]
+    format_version = parse_mets_to_db.parse_format_version(premis_object_doc)
 
-    ret = {
+    return {
         'file_size': premis_object.size,
         'checksum': premis_object.message_digest,
         'checksum_type': premis_object.message_digest_algorithm,
         'derivation': related_object_uuid,
-        'format_version': parse_mets_to_db.parse_format_version(
-            premis_object_doc),
+        'format_version': format_version.uuid if format_version else None,
     }
+
+
+def read_mets_file_info(mets_file):
+    """Read the information of every file described in a METS document.
+
+    The document is parsed once; see ``get_file_info_from_mets``.
+
+    :return: A dict of file UUID to file information.
+    """
+    logger.info('Archivematica AIP: reading METS file %s.', mets_file)
+    mets = metsrw.METSDocument.fromfile(mets_file)
+    fsentries = {fsentry.file_uuid: fsentry for fsentry in mets.all_files()
+                 if fsentry.file_uuid}
+    files_info = {}
+    for file_uuid, fsentry in fsentries.items():
+        info = _fsentry_info(fsentries, fsentry)
+        if info is not None:
+            files_info[file_uuid] = info
+    return files_info
+
+
+def _mets_info_cache_is_current(cache_path, mets_file):
+    if not os.path.isfile(cache_path):
+        return False
+    stat = os.stat(mets_file)
+    with closing(sqlite3.connect(cache_path)) as conn:
+        try:
+            row = conn.execute('SELECT size, mtime FROM mets').fetchone()
+        except sqlite3.DatabaseError:
+            return False
+    return row == (stat.st_size, stat.st_mtime)
+
+
+def _write_mets_info_cache(cache_path, mets_file):
+    stat = os.stat(mets_file)
+    files_info = read_mets_file_info(mets_file)
+    temp_path = '{}.{}'.format(cache_path, os.getpid())
+    with closing(sqlite3.connect(temp_path)) as conn:
+        conn.execute('CREATE TABLE mets (size INTEGER, mtime REAL)')
+        conn.execute('INSERT INTO mets VALUES (?, ?)',
+                     (stat.st_size, stat.st_mtime))
+        conn.execute('CREATE TABLE files (uuid TEXT PRIMARY KEY, {})'.format(
+            ', '.join('{} TEXT'.format(column) for column in METS_INFO_COLUMNS)))
+        conn.executemany(
+            'INSERT INTO files VALUES (?, {})'.format(
+                ', '.join('?' for _ in METS_INFO_COLUMNS)),
+            ([file_uuid] + [info[column] for column in METS_INFO_COLUMNS]
+             for file_uuid, info in files_info.items()))
+        conn.commit()
+    os.rename(temp_path, cache_path)
+
+
+def get_mets_info_cache(shared_path, transfer, mets_file):
+    """Return the path of the file information cache of a transfer.
+
+    Every file of an Archivematica AIP transfer is described in the same
+    original METS document, which can be very large. Instead of parsing it
+    once per file, the first task run for the transfer reads the information
+    of all the files into a SQLite database next to the other temporary files
+    of the shared directory, and the following tasks only look their file up.
+    The cache is rebuilt if the METS document changes, and removed by
+    ``parse_external_mets`` once the sizes and checksums of all the files of
+    the transfer are updated, or by ``failedTransferCleanup``.
+    """
+    cache_path = parse_mets_to_db.mets_info_cache_path(shared_path, transfer.uuid)
+    cache_dir = os.path.dirname(cache_path)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with open(cache_path + '.lock', 'w') as lock:
+        # Tasks of the same transfer run concurrently; only one builds it
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not _mets_info_cache_is_current(cache_path, mets_file):
+            _write_mets_info_cache(cache_path, mets_file)
+    return cache_path
+
+
+def get_file_info_from_mets(shared_path, file_):
+    """Get file size, checksum & type, and derivation for this file from METS.
+
+    Given an instance of a File, return a dict with keys: file_size,
+    checksum, checksum_type, derivation (the UUID of the preservation
+    derivative) and format_version (the UUID of the FPR format version), as
+    they are described in the original METS document of the transfer. The
+    dict will be empty or missing keys on error.
+    """
+    transfer = file_.transfer
+    transfer_location = transfer.currentlocation.replace(
+        '%sharedPath%', shared_path, 1)
+    mets_file = find_mets_file(transfer_location)
+    if not mets_file:
+        logger.info('Archivematica AIP: METS file not found in %s.',
+                    transfer_location)
+        return {}
+    cache_path = get_mets_info_cache(shared_path, transfer, mets_file)
+    with closing(sqlite3.connect(cache_path)) as conn:
+        row = conn.execute(
+            'SELECT {} FROM files WHERE uuid = ?'.format(', '.join(METS_INFO_COLUMNS)),
+            (file_.uuid,)).fetchone()
+    if not row:
+        logger.error('Archivematica AIP: FSEntry with UUID %s not found', file_.uuid)
+        return {}
+
+    ret = dict(zip(METS_INFO_COLUMNS, row))
     logger.info('Archivematica AIP: %s', ret)
     return ret
 
@@ -139,7 +232,7 @@ def main(shared_path, file_uuid, file_path, date, event_uuid):
         if info.get('format_version'):
             FileFormatVersion.objects.create(
                 file_uuid_id=file_uuid,
-                format_version=info['format_version']
+                format_version_id=info['format_version']
             )
 
     updateSizeAndChecksum(file_uuid, file_path, date, event_uuid, **kw)
@@ -92,10 +92,12 @@ def main(file_path, file_uuid, sip_uuid):
         return 0
 
 
+def call(args):
+    file_path, file_uuid, sip_uuid = args[:3]
+    return main(file_path, file_uuid, sip_uuid)
+
+
 if __name__ == '__main__':
     logger = get_script_logger("archivematica.mcp.client.characterizeFile")
 
-    file_path = sys.argv[1]
-    file_uuid = sys.argv[2]
-    sip_uuid = sys.argv[3]
-    sys.exit(main(file_path, file_uuid, sip_uuid))
+    sys.exit(call(sys.argv[1:]))
@@ -29,7 +29,7 @@ django.setup()
 from main.models import File
 
 # archivematicaCommon
-from databaseFunctions import insertIntoEvents
+from databaseFunctions import insertIntoEventsInBulk
 
 
 if __name__ == '__main__':
@@ -50,11 +50,12 @@ if __name__ == '__main__':
         opts.groupType: opts.groupUUID
     }
     file_uuids = File.objects.filter(**kwargs).values_list('uuid')
-    for fileUUID, in file_uuids:
-        insertIntoEvents(fileUUID=fileUUID,
-                         eventIdentifierUUID=str(uuid.uuid4()),
-                         eventType=opts.eventType,
-                         eventDateTime=opts.eventDateTime,
-                         eventDetail=opts.eventDetail,
-                         eventOutcome=opts.eventOutcome,
-                         eventOutcomeDetailNote=opts.eventOutcomeDetailNote)
+    insertIntoEventsInBulk([
+        {'fileUUID': fileUUID,
+         'eventIdentifierUUID': str(uuid.uuid4()),
+         'eventType': opts.eventType,
+         'eventDateTime': opts.eventDateTime,
+         'eventDetail': opts.eventDetail,
+         'eventOutcome': opts.eventOutcome,
+         'eventOutcomeDetailNote': opts.eventOutcomeDetailNote}
+        for fileUUID, in file_uuids])
@@ -7,12 +7,15 @@ import sys
 
 import django
 django.setup()
+from django.conf import settings as mcpclient_settings
 
 # archivematicaCommon
 import storageService as storage_service
 
 from main.models import File, Transfer
 
+import parse_mets_to_db
+
 REJECTED = 'reject'
 FAILED = 'fail'
 
@@ -46,6 +49,7 @@ def main(fail_type, transfer_uuid, transfer_path):
     transfer = Transfer.objects.get(uuid=transfer_uuid)
     if transfer.type == 'Archivematica AIP':
         File.objects.filter(transfer_id=transfer_uuid).delete()
+        parse_mets_to_db.remove_mets_info_cache(mcpclient_settings.SHARED_DIRECTORY, transfer_uuid)
     return 0
 
 
@@ -153,14 +153,18 @@ def main(command_uuid, file_path, file_uuid, disable_reidentify):
     return 0
 
 
-if __name__ == '__main__':
-    logger = get_script_logger("archivematica.mcp.client.identifyFileFormat")
-
+def call(args):
     parser = argparse.ArgumentParser(description='Identify file formats.')
     parser.add_argument('idcommand', type=str, help='%IDCommand%')
     parser.add_argument('file_path', type=str, help='%relativeLocation%')
     parser.add_argument('file_uuid', type=str, help='%fileUUID%')
     parser.add_argument('--disable-reidentify', action='store_true', help='Disable identification if it has already happened for this file.')
 
-    args = parser.parse_args()
-    sys.exit(main(args.idcommand, args.file_path, args.file_uuid, args.disable_reidentify))
+    args = parser.parse_args(args)
+    return main(args.idcommand, args.file_path, args.file_uuid, args.disable_reidentify)
+
+
+if __name__ == '__main__':
+    logger = get_script_logger("archivematica.mcp.client.identifyFileFormat")
+
+    sys.exit(call(sys.argv[1:]))
@@ -6,6 +6,10 @@ from lxml import etree
 import os
 import sys
 
+import django
+django.setup()
+from django.conf import settings as mcpclient_settings
+
 # archivematicaCommon
 from custom_handlers import get_script_logger
 
@@ -36,6 +40,10 @@ def main(transfer_uuid, transfer_path):
     # Parse all external METS files if they exist
     parse_reingest_mets(transfer_uuid, transfer_path)
 
+    # Sizes and checksums were read from the METS of an Archivematica AIP
+    # transfer through a cache, not needed anymore
+    parse_mets_to_db.remove_mets_info_cache(mcpclient_settings.SHARED_DIRECTORY, transfer_uuid)
+
     return 0
 
 
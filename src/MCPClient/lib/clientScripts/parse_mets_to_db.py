@@ -3,6 +3,7 @@
 from __future__ import print_function
 import argparse
 import datetime
+import errno
 from lxml import etree
 import sys
 import os
@@ -20,6 +21,28 @@ import fileOperations
 import databaseFunctions
 
 MD_TYPE_SIP_ID = "3e48343d-e2d2-4956-aaa3-b54d26eb9761"
+# Name of the file information cache of an Archivematica AIP transfer, in the
+# tmp directory of the shared directory (see archivematicaUpdateSizeAndChecksum)
+METS_INFO_CACHE = 'reingest-mets-info-{}.sqlite'
+
+
+def mets_info_cache_path(shared_path, transfer_uuid):
+    """Return the path of the file information cache of a transfer."""
+    return os.path.join(shared_path, 'tmp', METS_INFO_CACHE.format(transfer_uuid))
+
+
+def remove_mets_info_cache(shared_path, transfer_uuid):
+    """
+    Remove the file information cache of a transfer and its lock file, once
+    the sizes and checksums of all its files have been updated.
+    """
+    cache_path = mets_info_cache_path(shared_path, transfer_uuid)
+    for path in (cache_path, cache_path + '.lock'):
+        try:
+            os.remove(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
 
 
 def parse_format_version(element):
@@ -34,6 +34,7 @@ from main.models import File, Directory, Transfer
 
 # archivematicaCommon
 from custom_handlers import get_script_logger
+from databaseFunctions import insertIntoEventsInBulk
 from fileOperations import updateFileLocation
 from archivematicaFunctions import unicodeToStr
 import sanitizeNames
@@ -66,6 +67,8 @@ def sanitize_object_names(objectsDirectory, sipUUID, date, groupType, groupSQL,
         "removedtime__isnull": True,
     }
     file_mdls = File.objects.filter(**kwargs)
+    # Name cleanup events, written together at the end
+    events = []
     # Iterate over ``File`` and ``Directory``
     for model in chain(file_mdls, directory_mdls):
         # Check all files to see if any parent directory had a sanitization event
@@ -116,7 +119,14 @@ def sanitize_object_names(objectsDirectory, sipUUID, date, groupType, groupSQL,
             logger.info('Sanitized name: %s -> %s', old_location, new_location)
             print('Sanitized name:', old_location, " -> ", new_location)
             if isinstance(model, File):
-                updateFileLocation(**kwargs)
+                updateFileLocation(createEvent=False, **kwargs)
+                events.append({
+                    'fileUUID': model.uuid,
+                    'eventType': kwargs['eventType'],
+                    'eventDateTime': kwargs['eventDateTime'],
+                    'eventDetail': kwargs['eventDetail'],
+                    'eventOutcomeDetailNote': 'Original name="%s"; cleaned up name="%s"' % (old_location, new_location),
+                })
             else:
                 model.currentlocation = new_location
                 model.save()
@@ -124,6 +134,8 @@ def sanitize_object_names(objectsDirectory, sipUUID, date, groupType, groupSQL,
             logger.info('No sanitization for %s', current_location)
             print('No sanitization found for', current_location)
 
+    insertIntoEventsInBulk(events)
+
 
 if __name__ == '__main__':
     logger = get_script_logger("archivematica.mcp.client.sanitizeObjectNames")
@@ -42,6 +42,7 @@ date = sys.argv[4]
 
 currentDirectory = ''
 exitCode = 0
+events = []
 
 for transfer_dir in os.listdir(transferPath):
     dirPath = os.path.join(transferPath, transfer_dir)
@@ -80,17 +81,18 @@ for transfer_dir in os.listdir(transferPath):
                 eventOutcomeDetailNote = '%s %s' % (xmlFile.__str__(), 'verified')
                 eventIdentifierUUID = uuid.uuid4().__str__()
 
-                databaseFunctions.insertIntoEvents(
-                    fileUUID=fileUUID,
-                    eventIdentifierUUID=eventIdentifierUUID,
-                    eventType='fixity check',
-                    eventDateTime=date,
-                    eventOutcome=eventOutcome,
-                    eventOutcomeDetailNote=eventOutcomeDetailNote,
-                    eventDetail=eventDetail
-                )
+                events.append({
+                    'fileUUID': fileUUID,
+                    'eventIdentifierUUID': eventIdentifierUUID,
+                    'eventType': 'fixity check',
+                    'eventDateTime': date,
+                    'eventOutcome': eventOutcome,
+                    'eventOutcomeDetailNote': eventOutcomeDetailNote,
+                    'eventDetail': eventDetail,
+                })
         else:
             print('Checksum mismatch: ', filePath.replace(transferPath, '%TransferDirectory%'), file=sys.stderr)
             exitCode += 1
 
+databaseFunctions.insertIntoEventsInBulk(events, transferUUID=transferUUID)
 quit(exitCode)
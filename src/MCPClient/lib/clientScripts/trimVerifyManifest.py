@@ -42,6 +42,7 @@ topDirectory = None
 currentDirectory = ""
 fileCount = 0
 exitCode = 0
+events = []
 
 logger = get_script_logger("archivematica.mcp.client.trimVerifyManifest")
 
@@ -95,13 +96,13 @@ for line in open(os.path.join(transferPath, "manifest.txt"), 'r'):
                 eventOutcome = "Pass"
                 eventOutcomeDetailNote = "Verified file exists"
                 eventIdentifierUUID = uuid.uuid4().__str__()
-                databaseFunctions.insertIntoEvents(fileUUID=fileUUID,
-                                                   eventIdentifierUUID=eventIdentifierUUID,
-                                                   eventType="manifest check",
-                                                   eventDateTime=date,
-                                                   eventOutcome=eventOutcome,
-                                                   eventOutcomeDetailNote=eventOutcomeDetailNote,
-                                                   eventDetail=eventDetail)
+                events.append({'fileUUID': fileUUID,
+                               'eventIdentifierUUID': eventIdentifierUUID,
+                               'eventType': "manifest check",
+                               'eventDateTime': date,
+                               'eventOutcome': eventOutcome,
+                               'eventOutcomeDetailNote': eventOutcomeDetailNote,
+                               'eventDetail': eventDetail})
         else:
             i = path.rfind(".")
             path2 = path[:i] + path[i:].lower()
@@ -117,16 +118,17 @@ for line in open(os.path.join(transferPath, "manifest.txt"), 'r'):
                     eventOutcome = "Pass"
                     eventOutcomeDetailNote = "Verified file exists, but with implicit extension case"
                     eventIdentifierUUID = uuid.uuid4().__str__()
-                    databaseFunctions.insertIntoEvents(fileUUID=fileUUID,
-                                                       eventIdentifierUUID=eventIdentifierUUID,
-                                                       eventType="manifest check",
-                                                       eventDateTime=date,
-                                                       eventOutcome=eventOutcome,
-                                                       eventOutcomeDetailNote=eventOutcomeDetailNote,
-                                                       eventDetail=eventDetail)
+                    events.append({'fileUUID': fileUUID,
+                                   'eventIdentifierUUID': eventIdentifierUUID,
+                                   'eventType': "manifest check",
+                                   'eventDateTime': date,
+                                   'eventOutcome': eventOutcome,
+                                   'eventOutcomeDetailNote': eventOutcomeDetailNote,
+                                   'eventDetail': eventDetail})
             else:
                 print("File does not exists: ", path.replace(transferPath, "%TransferDirectory%"), file=sys.stderr)
                 exitCode += 1
+databaseFunctions.insertIntoEventsInBulk(events, transferUUID=transferUUID)
 if fileCount:
     quit(exitCode)
 else:
@@ -4,13 +4,17 @@ import os
 import shutil
 import sys
 
+import django
+django.setup()
+from django.conf import settings as mcpclient_settings
+
 # archivematicaCommon
+from archivematicaFunctions import get_setting
+import bag_verifier
 from custom_handlers import get_script_logger
 from executeOrRunSubProcess import executeOrRun
 
-import django
-django.setup()
-from django.conf import settings as mcpclient_settings
+from verifyBAG import print_report
 
 
 def extract_aip(aip_path, extract_path):
@@ -27,8 +31,28 @@ def extract_aip(aip_path, extract_path):
     return os.path.join(extract_path, aip_identifier)
 
 
+def verify_extracted_aip(sip_uuid, aip_path):
+    """Extract the AIP to the temporary directory and verify the bag."""
+    extract_dir = os.path.join(mcpclient_settings.TEMP_DIRECTORY, sip_uuid)
+    try:
+        bag = extract_aip(aip_path, extract_dir)
+    except Exception:
+        print('Error extracting AIP at "{}"'.format(aip_path), file=sys.stderr)
+        return 1
+    try:
+        print('Verifying bag', bag)
+        report = bag_verifier.verify_bag(bag)
+    finally:
+        shutil.rmtree(extract_dir)
+    print_report(report)
+    return 0 if report.valid else 1
+
+
 def verify_aip():
-    """ Verify the AIP was bagged correctly by extracting it and running verification on its contents.
+    """ Verify the AIP was bagged correctly by running verification on its contents.
+
+    Compressed AIPs are verified by streaming the members of the archive when
+    it is a tar or 7z archive, or by extracting it otherwise.
 
     sys.argv[1] = UUID
       UUID of the SIP, which will become the UUID of the AIP
@@ -39,38 +63,19 @@ def verify_aip():
     sip_uuid = sys.argv[1]  # %sip_uuid%
     aip_path = sys.argv[2]  # SIPDirectory%%sip_name%-%sip_uuid%.7z
 
-    temp_dir = mcpclient_settings.TEMP_DIRECTORY
-
-    is_uncompressed_aip = os.path.isdir(aip_path)
-
-    if is_uncompressed_aip:
-        bag = aip_path
+    if os.path.isdir(aip_path):
+        print('Verifying bag', aip_path)
+        report = bag_verifier.verify_bag(aip_path)
     else:
         try:
-            extract_dir = os.path.join(temp_dir, sip_uuid)
-            bag = extract_aip(aip_path, extract_dir)
-        except Exception:
-            print('Error extracting AIP at "{}"'.format(aip_path), file=sys.stderr)
-            return 1
-
-    verification_commands = [
-        '/usr/share/bagit/bin/bag verifyvalid "{}"'.format(bag),
-        '/usr/share/bagit/bin/bag checkpayloadoxum "{}"'.format(bag),
-        '/usr/share/bagit/bin/bag verifycomplete "{}"'.format(bag),
-        '/usr/share/bagit/bin/bag verifypayloadmanifests "{}"'.format(bag),
-        '/usr/share/bagit/bin/bag verifytagmanifests "{}"'.format(bag),
-    ]
-    return_code = 0
-    for command in verification_commands:
-        print("Running test: ", command)
-        exit_code, _, _ = executeOrRun("command", command, printing=True)
-        if exit_code != 0:
-            print("Failed test: ", command, file=sys.stderr)
-            return_code = 1
-    # cleanup
-    if not is_uncompressed_aip:
-        shutil.rmtree(extract_dir)
-    return return_code
+            print('Verifying bag in archive', aip_path)
+            # The bag was created with the checksum algorithm setting
+            report = bag_verifier.verify_archive(aip_path, algorithms=[get_setting('checksum_type', 'sha512')])
+        except bag_verifier.StreamingNotSupported as e:
+            print('Unable to verify the AIP without extracting it:', e)
+            return verify_extracted_aip(sip_uuid, aip_path)
+    print_report(report)
+    return 0 if report.valid else 1
 
 
 if __name__ == '__main__':
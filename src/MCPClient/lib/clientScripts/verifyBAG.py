@@ -19,54 +19,31 @@
 
 from __future__ import print_function
 
-import os
 import sys
 
 # archivematicaCommon
+import bag_verifier
 from custom_handlers import get_script_logger
-from executeOrRunSubProcess import executeOrRun
 
 logger = get_script_logger('archivematica.mcp.client.verifyBAG')
 
-PRINT_SUBPROCESS_OUTPUT = True
-BAG = '/usr/share/bagit/bin/bag'
-BAG_INFO = 'bag-info.txt'
 
+def print_report(report):
+    """Print the outcome of every check, and the problems to stderr."""
+    for line in report.lines():
+        print(line)
+    for problem in report.problems:
+        print('Failed test: {}: {}: {}'.format(problem.check, problem.path or report.path, problem.message), file=sys.stderr)
 
-def verify_bag(bag):
-    verification_commands = [
-        ["/usr/share/bagit/bin/bag", "verifyvalid", bag],  # Validity
-        ["/usr/share/bagit/bin/bag", "verifycomplete", bag],  # Completness
-        ["/usr/share/bagit/bin/bag", "verifypayloadmanifests", bag],  # Checksums in manifests
-    ]
-    bag_info = os.path.join(bag, "bag-info.txt")
-    if os.path.isfile(bag_info):
-        for line in open(bag_info, 'r'):
-            if line.startswith("Payload-Oxum"):
-                # Generate Payload-Oxum and check against Payload-Oxum in bag-info.txt.
-                verification_commands.append(
-                    ["/usr/share/bagit/bin/bag", "checkpayloadoxum", bag]
-                )
-                break
-
-    for item in os.listdir(bag):
-        if item.startswith("tagmanifest-") and item.endswith(".txt"):
-            # Verify the checksums in all tag manifests.
-            verification_commands.append(
-                ["/usr/share/bagit/bin/bag", "verifytagmanifests", bag]
-            )
-            break
 
-    exit_code = 0
-    for command in verification_commands:
-        ret = executeOrRun("command", command)
-        rc, _, _ = ret
-        if rc != 0:
-            print("Failed test: %s", command, file=sys.stderr)
-            exit_code = 1
-        else:
-            print("Passed test: %s", command)
-    return exit_code
+def verify_bag(bag):
+    """
+    Verify the validity, completeness, Payload-Oxum (if any), payload
+    manifests and tag manifests (if any) of ``bag``.
+    """
+    report = bag_verifier.verify_bag(bag)
+    print_report(report)
+    return 0 if report.valid else 1
 
 
 if __name__ == '__main__':
@@ -0,0 +1,208 @@
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+In-process execution of Python client scripts.
+
+Launching a new interpreter for every task means re-running ``django.setup()``,
+reconnecting to the database and re-importing heavy libraries such as lxml,
+which for small per-file scripts costs more than the work itself. A client
+script can opt in to in-process execution by defining a top-level function::
+
+    def call(args):
+        ...
+        return exit_code
+
+where ``args`` is the list of command-line arguments (without the program
+name). The MCPClient imports such scripts once and calls the entry point from
+its worker threads, capturing stdout, stderr and the exit code so that the
+result has the same shape as a subprocess run through ``executeOrRun``.
+"""
+
+from __future__ import print_function
+
+import ast
+import contextlib
+import imp
+import io
+import logging
+import os
+import shlex
+import sys
+import threading
+import traceback
+
+logger = logging.getLogger('archivematica.mcp.client')
+
+ENTRY_POINT = 'call'
+
+# Loaded entry points, keyed by script path, so that several commands pointing
+# at the same script share one module.
+_entry_points = {}
+_entry_points_lock = threading.Lock()
+
+
+class ThreadLocalOutput(object):
+    """
+    File-like object standing in for ``sys.stdout`` or ``sys.stderr``.
+
+    Writes made by a thread that is capturing output go to that thread's own
+    buffer; writes made by any other thread go to the original stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, 'buffer', None) or self.stream
+
+    def start_capture(self):
+        self._local.buffer = io.BytesIO()
+
+    def stop_capture(self):
+        buf = self._local.buffer
+        self._local.buffer = None
+        return buf.getvalue()
+
+    def write(self, data):
+        target = self._target()
+        if isinstance(data, unicode) and target is not self.stream:
+            data = data.encode('utf-8')
+        target.write(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+def install_output_capture():
+    """Replace ``sys.stdout`` and ``sys.stderr`` with thread-aware proxies."""
+    if not isinstance(sys.stdout, ThreadLocalOutput):
+        sys.stdout = ThreadLocalOutput(sys.stdout)
+    if not isinstance(sys.stderr, ThreadLocalOutput):
+        sys.stderr = ThreadLocalOutput(sys.stderr)
+
+
+@contextlib.contextmanager
+def captured_output():
+    """
+    Capture everything the current thread writes to stdout and stderr.
+
+    Yields a dict which, once the block exits, holds the captured output
+    under the ``stdout`` and ``stderr`` keys.
+    """
+    install_output_capture()
+    output = {}
+    sys.stdout.start_capture()
+    sys.stderr.start_capture()
+    try:
+        yield output
+    finally:
+        output['stdout'] = sys.stdout.stop_capture()
+        output['stderr'] = sys.stderr.stop_capture()
+
+
+def exposes_entry_point(path):
+    """
+    Returns True if the Python script at ``path`` defines a top-level
+    ``call`` function.
+
+    The script is parsed rather than imported: some client scripts do their
+    work at module level and importing them would run them.
+    """
+    if not path.endswith('.py') or not os.path.isfile(path):
+        return False
+    with open(path) as f:
+        try:
+            tree = ast.parse(f.read(), path)
+        except SyntaxError:
+            return False
+    return any(isinstance(node, ast.FunctionDef) and node.name == ENTRY_POINT
+               for node in tree.body)
+
+
+def load_entry_point(path):
+    """
+    Import the client script at ``path`` and return its ``call`` function.
+
+    Returns None if the script does not expose the entry point or cannot be
+    imported, in which case the caller should fall back to a subprocess.
+    """
+    with _entry_points_lock:
+        if path in _entry_points:
+            return _entry_points[path]
+        entry_point = None
+        if exposes_entry_point(path):
+            # Client scripts import helpers that live next to them (e.g. the
+            # ``lib`` package), which a subprocess gets from sys.path[0].
+            scripts_directory = os.path.dirname(path)
+            if scripts_directory not in sys.path:
+                sys.path.append(scripts_directory)
+            module_name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                module = imp.load_source(module_name, path)
+            except Exception:
+                logger.exception('Unable to import %s; it will be run in a subprocess', path)
+            else:
+                entry_point = getattr(module, ENTRY_POINT)
+        _entry_points[path] = entry_point
+        return entry_point
+
+
+def _normalize_exit_code(code):
+    """Map a ``call`` return value or ``SystemExit`` code to a process exit status."""
+    if code is None:
+        return 0
+    if isinstance(code, bool) or not isinstance(code, (int, long)):
+        print(code, file=sys.stderr)
+        return 1
+    # A subprocess exiting with e.g. -1 is reported with status 255; the
+    # workflow's exit code mappings rely on this.
+    return code % 256
+
+
+def execute(entry_point, arguments, capture_output=True):
+    """
+    Run a client script entry point in the current thread.
+
+    :param entry_point: The script's ``call`` function.
+    :param str arguments: The command-line arguments, as a single string that
+                          will be split with shlex.split().
+    :param bool capture_output: Same semantics as in ``launchSubProcess``: if
+                                False, stdout is discarded and stderr is only
+                                returned if the script failed.
+    :returns: A tuple of (exit code, stdout, stderr).
+    """
+    with captured_output() as output:
+        try:
+            code = entry_point(shlex.split(arguments))
+        except SystemExit as e:
+            code = e.code
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        code = _normalize_exit_code(code)
+    stdout, stderr = output['stdout'], output['stderr']
+    if not capture_output:
+        stdout = ''
+        if code == 0:
+            stderr = ''
+    return code, stdout, stderr
@@ -38,11 +38,14 @@ CONFIG_MAPPING = {
     'client_modules_file': {'section': 'MCPClient', 'option': 'archivematicaClientModules', 'type': 'string'},
     'elasticsearch_server': {'section': 'MCPClient', 'option': 'elasticsearchServer', 'type': 'string'},
     'elasticsearch_timeout': {'section': 'MCPClient', 'option': 'elasticsearchTimeout', 'type': 'float'},
+    'elasticsearch_bulk_chunk_size': {'section': 'MCPClient', 'option': 'elasticsearchBulkChunkSize', 'type': 'int'},
+    'elasticsearch_bulk_max_bytes': {'section': 'MCPClient', 'option': 'elasticsearchBulkMaxBytes', 'type': 'int'},
     'search_enabled': [
         {'section': 'MCPClient', 'option': 'disableElasticsearchIndexing', 'type': 'iboolean'},
         {'section': 'MCPClient', 'option': 'search_enabled', 'type': 'boolean'},
     ],
     'capture_client_script_output': {'section': 'MCPClient', 'option': 'capture_client_script_output', 'type': 'boolean'},
+    'execute_in_process': {'section': 'MCPClient', 'option': 'execute_in_process', 'type': 'boolean'},
     'removable_files': {'section': 'MCPClient', 'option': 'removableFiles', 'type': 'string'},
     'temp_directory': {'section': 'MCPClient', 'option': 'temp_dir', 'type': 'string'},
     'secret_key': {'section': 'MCPClient', 'option': 'django_secret_key', 'type': 'string'},
@@ -81,8 +84,11 @@ LoadSupportedCommandsSpecial = True
 numberOfTasks = 0
 elasticsearchServer = localhost:9200
 elasticsearchTimeout = 10
+elasticsearchBulkChunkSize = 500
+elasticsearchBulkMaxBytes = 10485760
 search_enabled = true
 capture_client_script_output = true
+execute_in_process = false
 temp_dir = /var/archivematica/sharedDirectory/tmp
 removableFiles = Thumbs.db, Icon, Icon\r, .DS_Store
 clamav_server = /var/run/clamav/clamd.ctl
@@ -203,6 +209,8 @@ REMOVABLE_FILES = config.get('removable_files')
 TEMP_DIRECTORY = config.get('temp_directory')
 ELASTICSEARCH_SERVER = config.get('elasticsearch_server')
 ELASTICSEARCH_TIMEOUT = config.get('elasticsearch_timeout')
+ELASTICSEARCH_BULK_CHUNK_SIZE = config.get('elasticsearch_bulk_chunk_size')
+ELASTICSEARCH_BULK_MAX_BYTES = config.get('elasticsearch_bulk_max_bytes')
 CLAMAV_SERVER = config.get('clamav_server')
 CLAMAV_PASS_BY_STREAM = config.get('clamav_pass_by_stream')
 CLAMAV_CLIENT_TIMEOUT = config.get('clamav_client_timeout')
@@ -213,3 +221,4 @@ STORAGE_SERVICE_CLIENT_TIMEOUT = config.get('storage_service_client_timeout')
 AGENTARCHIVES_CLIENT_TIMEOUT = config.get('agentarchives_client_timeout')
 SEARCH_ENABLED = config.get('search_enabled')
 CAPTURE_CLIENT_SCRIPT_OUTPUT = config.get('capture_client_script_output')
+EXECUTE_IN_PROCESS = config.get('execute_in_process')
@@ -2,7 +2,9 @@
 import collections
 import csv
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 from django.test import TestCase
@@ -13,7 +15,9 @@ THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(THIS_DIR, '../lib/clientScripts')))
 import archivematicaCreateMETS2
 import archivematicaCreateMETSMetadataCSV
+import archivematicaCreateMETSPrefetch
 import archivematicaCreateMETSRights
+import archivematicaCreateMETSWriter
 
 from main.models import RightsStatement
 
@@ -520,6 +524,23 @@ class TestCreateDigiprovMD(TestCase):
         assert ret[8].find('.//{info:lc/xmlns/premis-v2}agentName').text == 'username="kmindelan", first_name="Keladry", last_name="Mindelan"'
         assert ret[8].find('.//{info:lc/xmlns/premis-v2}agentType').text == 'Archivematica user'
 
+    def test_creates_events_from_unit_data(self):
+        """
+        It should create the same Events and Agents from the rows loaded for
+        the whole unit, without querying the database.
+        """
+        file_uuid = 'ae8d4290-fe52-4954-b72a-0f591bee2e2f'
+        expected = [etree.tostring(e[0]) for e in archivematicaCreateMETS2.createDigiprovMD(file_uuid)]
+
+        archivematicaCreateMETS2.unitData = archivematicaCreateMETSPrefetch.UnitData(
+            'sip_id', '4060ee97-9c3f-4822-afaf-ebdf838284c3')
+        try:
+            with self.assertNumQueries(0):
+                ret = archivematicaCreateMETS2.createDigiprovMD(file_uuid)
+        finally:
+            archivematicaCreateMETS2.unitData = None
+        assert [etree.tostring(e[0]) for e in ret] == expected
+
 
 class TestRights(TestCase):
     """ Test archivematicaCreateMETSRights creating rightsMD. """
@@ -558,3 +579,48 @@ class TestRights(TestCase):
         assert rightsgranted[3].text == 'Attribution required'
         assert len(rightsgranted[3].attrib) == 0
         assert len(rightsgranted[3]) == 0
+
+
+class TestSectionSpool(unittest.TestCase):
+    """ Test writing a METS document with spooled amdSecs. """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _amdsecs(self):
+        """ amdSecs as created by archivematicaCreateMETS2, outside of any tree. """
+        mets = etree.parse(os.path.join(THIS_DIR, 'fixtures', 'mets_no_metadata.xml'))
+        return [etree.fromstring(etree.tostring(el)) for el in mets.findall('mets:amdSec', namespaces=NSMAP)]
+
+    def _root(self):
+        nsmap = {'mets': NSMAP['mets'], 'xsi': 'http://www.w3.org/2001/XMLSchema-instance', 'xlink': 'http://www.w3.org/1999/xlink'}
+        root = etree.Element('{http://www.loc.gov/METS/}mets', nsmap=nsmap)
+        etree.SubElement(root, '{http://www.loc.gov/METS/}metsHdr', CREATEDATE='2017-01-01T00:00:00')
+        return root, nsmap
+
+    def test_write_tree_matches_tree_write(self):
+        """ It should write the same bytes as writing the whole tree. """
+        root, _ = self._root()
+        for amdsec in self._amdsecs():
+            root.append(amdsec)
+        etree.SubElement(root, '{http://www.loc.gov/METS/}fileSec')
+        expected = os.path.join(self.tmpdir, 'expected.xml')
+        etree.ElementTree(root).write(expected, pretty_print=True, xml_declaration=True, encoding='utf-8')
+
+        root, nsmap = self._root()
+        spool = archivematicaCreateMETSWriter.SectionSpool(nsmap)
+        for amdsec in self._amdsecs():
+            spool.append(amdsec)
+        root.append(spool.placeholder())
+        etree.SubElement(root, '{http://www.loc.gov/METS/}fileSec')
+        written = os.path.join(self.tmpdir, 'written.xml')
+        with open(written, 'wb') as f:
+            spool.write_tree(etree.ElementTree(root), f)
+        spool.close()
+
+        assert len(spool) == 3
+        with open(expected, 'rb') as e, open(written, 'rb') as w:
+            assert e.read() == w.read()
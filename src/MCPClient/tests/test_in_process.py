@@ -0,0 +1,80 @@
+# -*- coding: utf8
+"""Tests for the in-process execution of client scripts."""
+
+import os
+import sys
+import textwrap
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(THIS_DIR, '../lib')))
+
+import in_process
+
+
+SCRIPT = textwrap.dedent("""
+    from __future__ import print_function
+    import sys
+
+    def call(args):
+        print('args:', ' '.join(args))
+        print('to stderr', file=sys.stderr)
+        if args and args[0] == 'exit':
+            sys.exit(int(args[1]))
+        if args and args[0] == 'raise':
+            raise ValueError('boom')
+        return int(args[0]) if args else 0
+""")
+
+UNGUARDED_SCRIPT = textwrap.dedent("""
+    import sys
+    sys.exit(2)
+""")
+
+
+def _write_script(tmpdir, name, source):
+    path = os.path.join(str(tmpdir), name)
+    with open(path, 'w') as f:
+        f.write(source)
+    return path
+
+
+def test_exposes_entry_point(tmpdir):
+    assert in_process.exposes_entry_point(
+        _write_script(tmpdir, 'with_call.py', SCRIPT))
+    assert not in_process.exposes_entry_point(
+        _write_script(tmpdir, 'unguarded.py', UNGUARDED_SCRIPT))
+    assert not in_process.exposes_entry_point(
+        _write_script(tmpdir, 'script.sh', SCRIPT))
+
+
+def test_load_entry_point_does_not_import_unguarded_scripts(tmpdir):
+    path = _write_script(tmpdir, 'unguarded_script.py', UNGUARDED_SCRIPT)
+    assert in_process.load_entry_point(path) is None
+
+
+def test_execute_captures_output_and_exit_code(tmpdir):
+    call = in_process.load_entry_point(
+        _write_script(tmpdir, 'in_process_script.py', SCRIPT))
+    assert in_process.load_entry_point(
+        os.path.join(str(tmpdir), 'in_process_script.py')) is call
+
+    code, stdout, stderr = in_process.execute(call, '0 "a b"')
+    assert code == 0
+    assert stdout == 'args: 0 a b\n'
+    assert stderr == 'to stderr\n'
+
+    # Return values and sys.exit() codes are mapped like process statuses
+    assert in_process.execute(call, '-1')[0] == 255
+    assert in_process.execute(call, 'exit 3')[0] == 3
+
+    code, _, stderr = in_process.execute(call, 'raise')
+    assert code == 1
+    assert 'ValueError: boom' in stderr
+
+
+def test_execute_without_capturing_output(tmpdir):
+    call = in_process.load_entry_point(
+        _write_script(tmpdir, 'quiet_script.py', SCRIPT))
+
+    assert in_process.execute(call, '0', capture_output=False) == (0, '', '')
+    assert in_process.execute(call, '1', capture_output=False) == (1, '', 'to stderr\n')
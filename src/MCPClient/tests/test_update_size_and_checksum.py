@@ -0,0 +1,74 @@
+# -*- coding: utf8
+import os
+import shutil
+import sys
+
+import pytest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(THIS_DIR, '../lib/clientScripts')))
+import archivematicaUpdateSizeAndChecksum
+import parse_external_mets
+import parse_mets_to_db
+
+from main import models
+
+ORIGINAL_UUID = 'ae8d4290-fe52-4954-b72a-0f591bee2e2f'
+PRESERVATION_UUID = '8140ebe5-295c-490b-a34a-83955b7c844e'
+
+
+@pytest.fixture
+def aip_transfer(tmpdir):
+    """An Archivematica AIP transfer with its original METS document."""
+    shared_path = str(tmpdir) + '/'
+    metadata_dir = tmpdir.mkdir('currentlyProcessing').mkdir('transfer').mkdir('metadata')
+    shutil.copy(os.path.join(THIS_DIR, 'fixtures', 'mets_no_metadata.xml'),
+                str(metadata_dir.join('METS.a2f1f249-7bd4-4f52-8f1a-84319cb1b6d3.xml')))
+    transfer = models.Transfer(
+        uuid='4ae2a4bd-4c1a-4e4c-a3d7-2b0ea9e7fb1c',
+        currentlocation='%sharedPath%currentlyProcessing/transfer/',
+        type='Archivematica AIP')
+    return shared_path, transfer
+
+
+@pytest.mark.django_db
+def test_get_file_info_from_mets(aip_transfer, mocker):
+    shared_path, transfer = aip_transfer
+    read_mets_file_info = mocker.spy(archivematicaUpdateSizeAndChecksum, 'read_mets_file_info')
+
+    file_ = models.File(uuid=ORIGINAL_UUID, transfer=transfer)
+    info = archivematicaUpdateSizeAndChecksum.get_file_info_from_mets(shared_path, file_)
+    assert info['file_size'] == '158131'
+    assert info['checksum'] == 'd2bed92b73c7090bb30a0b30016882e7069c437488e1513e9deaacbe29d38d92'
+    assert info['checksum_type'] == 'sha256'
+    assert info['derivation'] == PRESERVATION_UUID
+
+    file_ = models.File(uuid=PRESERVATION_UUID, transfer=transfer)
+    info = archivematicaUpdateSizeAndChecksum.get_file_info_from_mets(shared_path, file_)
+    assert info['file_size'] == '1446772'
+    assert info['derivation'] is None
+
+    file_ = models.File(uuid='00000000-0000-0000-0000-000000000000', transfer=transfer)
+    assert archivematicaUpdateSizeAndChecksum.get_file_info_from_mets(shared_path, file_) == {}
+
+    # The METS document is only parsed once for the whole transfer
+    assert read_mets_file_info.call_count == 1
+
+
+@pytest.mark.django_db
+def test_mets_info_cache_removed_with_transfer(aip_transfer, settings):
+    shared_path, transfer = aip_transfer
+    settings.SHARED_DIRECTORY = shared_path
+    file_ = models.File(uuid=ORIGINAL_UUID, transfer=transfer)
+    archivematicaUpdateSizeAndChecksum.get_file_info_from_mets(shared_path, file_)
+    cache_path = parse_mets_to_db.mets_info_cache_path(shared_path, transfer.uuid)
+    assert os.path.exists(cache_path)
+    assert os.path.exists(cache_path + '.lock')
+
+    # "Parse external METS" runs once the whole transfer is done
+    transfer_path = os.path.join(shared_path, 'currentlyProcessing', 'transfer')
+    assert parse_external_mets.main(transfer.uuid, transfer_path) == 0
+    assert not os.path.exists(cache_path)
+    assert not os.path.exists(cache_path + '.lock')
+    # Already removed
+    parse_mets_to_db.remove_mets_info_cache(shared_path, transfer.uuid)
@@ -29,6 +29,9 @@ from socket import gethostname
 import time
 
 from linkTaskManagerChoice import choicesAvailableForUnits
+import dispatcher
+import scheduler
+import workflow
 
 from django.conf import settings as django_settings
 
@@ -79,12 +82,33 @@ def gearmanGetJobsAwaitingApproval(gearman_worker, gearman_job):
         raise
 
 
+def gearmanGetSchedulerStats(gearman_worker, gearman_job):
+    """Return the state of the MCPServer executors and of the Gearman
+    dispatcher, for monitoring."""
+    try:
+        return cPickle.dumps(scheduler.stats() + [dispatcher.stats()])
+    except Exception:
+        LOGGER.exception('Error getting scheduler stats')
+        raise
+
+
+def gearmanReloadWorkflow(gearman_worker, gearman_job):
+    """Load the workflow from the database again, after it was changed."""
+    try:
+        return cPickle.dumps(workflow.reload_workflow().stats())
+    except Exception:
+        LOGGER.exception('Error reloading the workflow')
+        raise
+
+
 def startRPCServer():
     gm_worker = gearman.GearmanWorker([django_settings.GEARMAN_SERVER])
     hostID = gethostname() + "_MCPServer"
     gm_worker.set_client_id(hostID)
     gm_worker.register_task("approveJob", gearmanApproveJob)
     gm_worker.register_task("getJobsAwaitingApproval", gearmanGetJobsAwaitingApproval)
+    gm_worker.register_task("getSchedulerStats", gearmanGetSchedulerStats)
+    gm_worker.register_task("reloadWorkflow", gearmanReloadWorkflow)
     failMaxSleep = 30
     failSleep = 1
     failSleepIncrementor = 2
@@ -60,21 +60,29 @@ from unitFile import unitFile
 from unitTransfer import unitTransfer
 from utils import isUUID
 import RPCServer
+import events
+import journal
+import scheduler
+import workflow
 
 from archivematicaFunctions import unicodeToStr
 from databaseFunctions import auto_close_db, createSIP, getUTCDate
 import dicts
 
-from main.models import Job, SIP, Task, WatchedDirectory
+from main.models import Job, SIP, Task, UnitStatus, WatchedDirectory
 
 
-countOfCreateUnitAndJobChainThreaded = 0
-
 # time to sleep to allow db to be updated with the new location of a SIP
 dbWaitSleep = 2
 
 stopSignalReceived = False  # Tracks whether a sigkill has been received or not
 
+# Watched directories into which transfers are copied from outside of the
+# pipeline, so that their new entries must settle before being processed.
+# Entries are moved into the other watched directories by MCPServer or the
+# MCPClient scripts, in one rename.
+SETTLED_WATCHED_DIRECTORIES = ('%watchDirectoryPath%activeTransfers/',)
+
 
 DEFAULT_PROCESSING_CONFIG = u"""<processingMCP>
   <preconfiguredChoices>
@@ -313,7 +321,7 @@ def findOrCreateSipInDB(path, waitSleep=dbWaitSleep, unit_type='SIP'):
 
 @log_exceptions
 @auto_close_db
-def createUnitAndJobChain(path, config, terminate=False):
+def createUnitAndJobChain(path, config):
     path = unicodeToStr(path)
     if os.path.isdir(path):
         path = path + "/"
@@ -339,27 +347,20 @@ def createUnitAndJobChain(path, config, terminate=False):
         return
     jobChain(unit, config[1])
 
-    if terminate:
-        exit(0)
 
-
-def createUnitAndJobChainThreaded(path, config, terminate=True):
-    global countOfCreateUnitAndJobChainThreaded
+def createUnitAndJobChainThreaded(path, config):
+    """
+    Queue the creation of a unit and its job chain for ``path``. Blocks while
+    too many tasks are waiting to be run.
+    """
     try:
         logger.debug('Watching path %s', path)
-        t = threading.Thread(target=createUnitAndJobChain, args=(path, config), kwargs={"terminate": terminate})
-        t.daemon = True
-        countOfCreateUnitAndJobChainThreaded += 1
-        while(django_settings.LIMIT_TASK_THREADS <= threading.activeCount() + django_settings.RESERVED_AS_TASK_PROCESSING_THREADS):
-            if stopSignalReceived:
-                logger.info('Signal was received; stopping createUnitAndJobChainThreaded(path, config)')
-                exit(0)
-            logger.debug('Active thread count: %s', threading.activeCount())
-            time.sleep(.5)
-        countOfCreateUnitAndJobChainThreaded -= 1
-        t.start()
+        if stopSignalReceived:
+            logger.info('Signal was received; not queueing %s', path)
+            return
+        scheduler.submit_unit(createUnitAndJobChain, args=(path, config))
     except Exception:
-        logger.exception('Error creating threads to watch directories')
+        logger.exception('Error queueing unit for %s', path)
 
 
 def watchDirectories():
@@ -384,18 +385,22 @@ def watchDirectories():
             if isinstance(item, six.binary_type):
                 item = item.decode("utf-8")
             path = os.path.join(unicode(directory), item)
-            while(django_settings.LIMIT_TASK_THREADS <= threading.activeCount() + django_settings.RESERVED_AS_TASK_PROCESSING_THREADS):
-                time.sleep(1)
-            createUnitAndJobChainThreaded(path, row, terminate=False)
+            createUnitAndJobChainThreaded(path, row)
         actOnFiles = True
         if watched_directory.only_act_on_directories:
             actOnFiles = False
+        settle_delay = 0
+        if watched_directory.watched_directory_path.startswith(SETTLED_WATCHED_DIRECTORIES):
+            settle_delay = django_settings.WATCH_DIRECTORY_SETTLE_DELAY
         watchDirectory.archivematicaWatchDirectory(
             directory,
             variablesAdded=row,
             callBackFunctionAdded=createUnitAndJobChainThreaded,
             alertOnFiles=actOnFiles,
             interval=interval,
+            method=django_settings.WATCH_DIRECTORY_METHOD,
+            settle_delay=settle_delay,
+            rescan_interval=django_settings.WATCH_DIRECTORY_RESCAN_INTERVAL,
         )
 
 
@@ -407,6 +412,10 @@ def signal_handler(signalReceived, frame):
     threads = threading.enumerate()
     for thread in threads:
         logger.warning('Not stopping %s %s', type(thread), thread)
+    try:
+        journal.flush()
+    except Exception:
+        logger.exception('Error writing buffered tasks to the database')
     sys.stdout.flush()
     sys.stderr.flush()
     sys.exit(0)
@@ -417,11 +426,11 @@ def signal_handler(signalReceived, frame):
 @auto_close_db
 def debugMonitor():
     """Periodically prints out status of MCP, including whether the database lock is locked, thread count, etc."""
-    global countOfCreateUnitAndJobChainThreaded
     while True:
         logger.debug('Debug monitor: datetime: %s', getUTCDate())
         logger.debug('Debug monitor: thread count: %s', threading.activeCount())
-        logger.debug('Debug monitor: created job chain threaded: %s', countOfCreateUnitAndJobChainThreaded)
+        for stats in scheduler.stats():
+            logger.debug('Debug monitor: %s executor: %s', stats['name'], stats)
         time.sleep(3600)
 
 
@@ -435,8 +444,11 @@ def flushOutputs():
 
 
 def cleanupOldDbEntriesOnNewRun():
+    stale = Job.objects.filter(currentstep__in=(Job.STATUS_AWAITING_DECISION, Job.STATUS_EXECUTING_COMMANDS))
+    unit_uuids = set(stale.values_list('sipuuid', flat=True))
     Job.objects.filter(currentstep=Job.STATUS_AWAITING_DECISION).delete()
     Job.objects.filter(currentstep=Job.STATUS_EXECUTING_COMMANDS).update(currentstep=Job.STATUS_FAILED)
+    UnitStatus.objects.changed(unit_uuids)
     Task.objects.filter(exitcode=None).update(exitcode=-1, stderror="MCP shut down while processing.")
 
 
@@ -555,6 +567,9 @@ if __name__ == '__main__':
     t.daemon = True
     t.start()
     cleanupOldDbEntriesOnNewRun()
+    journal.sweep_spooled_output()
+    events.reset()
+    workflow.get_workflow()
     watchDirectories()
 
     # This is blocking the main thread with the worker loop
@@ -0,0 +1,207 @@
+#!/usr/bin/env python2
+
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage MCPServer
+
+"""
+Submission of tasks to Gearman over a persistent connection.
+
+A single thread owns a ``gearman.GearmanClient``: it sends the jobs queued
+with ``submit`` without waiting for them to complete, polls the connection
+for the jobs in flight and hands every finished job request to the callback
+given for it, which runs on the ``scheduler`` task executor. A task in flight
+therefore holds no thread and no connection of its own.
+
+At most ``LIMIT_TASK_THREADS`` jobs are in flight at once; ``submit`` blocks
+until there is room, which keeps the tasks waiting in the priority queue of
+the task executor rather than in the Gearman server.
+
+If the Gearman server cannot be reached, only the jobs that were not sent
+are sent again later; jobs sent over a connection that was lost are handed
+to their callbacks as failed, never sent twice.
+"""
+
+import collections
+import cPickle
+import logging
+import threading
+import time
+
+import gearman
+from gearman.constants import JOB_UNKNOWN
+from gearman.job import GearmanJob, GearmanJobRequest
+
+import scheduler
+
+from django.conf import settings as django_settings
+
+LOGGER = logging.getLogger('archivematica.mcp.server')
+
+# Seconds spent polling for completed jobs before sending the new ones
+POLL_TIMEOUT = 0.1
+# Seconds to wait for the Gearman server to accept new jobs
+ACCEPT_TIMEOUT = 30.0
+FAIL_SLEEP_INITIAL = 1
+FAIL_SLEEP_INCREMENT = 2
+FAIL_SLEEP_MAX = 60
+
+
+class Dispatcher(object):
+    """Sends jobs to Gearman and dispatches their results from one thread."""
+
+    def __init__(self, host_list, max_in_flight):
+        self.host_list = host_list
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self._submitted = threading.Condition(self._lock)
+        self._queue = collections.deque()
+        # Jobs submitted and not dispatched yet, queued or in Gearman
+        self._in_flight = 0
+        self._started = False
+        self._sent = 0
+        self._dispatched = 0
+
+    def _start(self):
+        t = threading.Thread(target=self._work, name='gearman-dispatcher')
+        t.daemon = True
+        t.start()
+        self._started = True
+
+    def submit(self, execute, data, unique, callback):
+        """
+        Queue a job, blocking while ``max_in_flight`` jobs are in flight.
+        ``callback`` is called with the finished ``GearmanJobRequest``.
+        """
+        job = GearmanJob(connection=None, handle=None, task=execute.lower(),
+                         unique=unique, data=cPickle.dumps(data))
+        request = GearmanJobRequest(job)
+        with self._lock:
+            if not self._started:
+                self._start()
+            while self._in_flight >= self.max_in_flight:
+                self._capacity.wait()
+            self._in_flight += 1
+            self._queue.append((request, callback))
+            self._submitted.notify()
+
+    def _work(self):
+        client = gearman.GearmanClient(self.host_list)
+        in_flight = {}
+        fail_sleep = FAIL_SLEEP_INITIAL
+        while True:
+            with self._lock:
+                if not in_flight and not self._queue:
+                    self._submitted.wait()
+                queued, self._queue = list(self._queue), collections.deque()
+            try:
+                if queued:
+                    if self._send(client, queued, in_flight, log_errors=fail_sleep == FAIL_SLEEP_INITIAL):
+                        fail_sleep = FAIL_SLEEP_INITIAL
+                    else:
+                        time.sleep(fail_sleep)
+                        fail_sleep = min(fail_sleep + FAIL_SLEEP_INCREMENT, FAIL_SLEEP_MAX)
+                if in_flight:
+                    try:
+                        client.wait_until_jobs_completed(in_flight.keys(), poll_timeout=POLL_TIMEOUT)
+                    except gearman.errors.ServerUnavailable:
+                        # The jobs of the lost connections are now unknown
+                        LOGGER.warning('Lost the connection to the Gearman server')
+                    if self._dispatch(in_flight) and not in_flight:
+                        # The client keeps track of the requests it could
+                        # not complete; start afresh rather than leak them
+                        client = gearman.GearmanClient(self.host_list)
+            except Exception:
+                LOGGER.exception('Unexpected error in the Gearman dispatcher')
+
+    def _send(self, client, queued, in_flight, log_errors=True):
+        """
+        Send the ``queued`` (request, callback) pairs, adding those sent to
+        ``in_flight`` and queueing the others again, in order.
+
+        Returns whether they could all be sent.
+        """
+        requests = [request for request, _ in queued]
+        try:
+            client.submit_multiple_requests(requests, wait_until_complete=False, poll_timeout=ACCEPT_TIMEOUT)
+            sent_all = True
+        except (gearman.errors.ServerUnavailable, gearman.errors.ExceededConnectionAttempts):
+            if log_errors:
+                LOGGER.exception('Error submitting jobs. Retrying.')
+            sent_all = False
+        unsent = []
+        for request, callback in queued:
+            # Requests that lost their connection once sent may have reached
+            # the server: they are dispatched as failed instead
+            if request.state == JOB_UNKNOWN and not request.connection_attempts:
+                unsent.append((request, callback))
+            else:
+                in_flight[request] = callback
+        with self._lock:
+            self._sent += len(queued) - len(unsent)
+            self._queue.extendleft(reversed(unsent))
+        return sent_all
+
+    def _dispatch(self, in_flight):
+        """
+        Hand the finished job requests to their callbacks. Returns the number
+        of requests whose connection was lost.
+        """
+        finished = [request for request in in_flight
+                    if request.complete or request.state == JOB_UNKNOWN]
+        lost = 0
+        for request in finished:
+            callback = in_flight.pop(request)
+            if request.state == JOB_UNKNOWN:
+                lost += 1
+            # Only incomplete requests are marked as timed out; these ones
+            # failed, or their connection was lost
+            request.timed_out = False
+            scheduler.submit_task(callback, args=(request,), priority=scheduler.PRIORITY_HIGH)
+        if finished:
+            with self._lock:
+                self._in_flight -= len(finished)
+                self._dispatched += len(finished)
+                self._capacity.notify_all()
+        return lost
+
+    def stats(self):
+        """Return a dict describing the state of the dispatcher."""
+        with self._lock:
+            return {
+                'name': 'gearman',
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'sent': self._sent,
+                'dispatched': self._dispatched,
+            }
+
+
+dispatcher = Dispatcher([django_settings.GEARMAN_SERVER], django_settings.LIMIT_TASK_THREADS)
+
+
+def submit_job(execute, data, unique, callback):
+    """Queue a job for Gearman; see ``Dispatcher.submit``."""
+    dispatcher.submit(execute, data, unique, callback)
+
+
+def stats():
+    return dispatcher.stats()
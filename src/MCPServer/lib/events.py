@@ -0,0 +1,116 @@
+#!/usr/bin/env python2
+
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage MCPServer
+
+"""
+Job lifecycle events, published to the ``event_log`` for the dashboard to
+push to the browsers.
+
+- ``job``: a job was created or its status changed; the job is described as
+  in the dashboard status feed (``components.status_feed``).
+- ``choices``: a job is awaiting a decision between ``choices``.
+- ``tasks``: the number of tasks of a job, and how many are left, published
+  at most every ``TASK_COUNT_INTERVAL`` seconds per job.
+- ``reset``: MCPServer started, after changing the status of the jobs left
+  over by its previous run; the dashboard should reload the status.
+"""
+
+import calendar
+from decimal import Decimal
+import threading
+import time
+
+from databaseFunctions import getDeciDate, getJobUnitUUID
+import event_log
+
+from main.models import Job
+
+from django.conf import settings as django_settings
+
+TASK_COUNT_INTERVAL = 1.0
+
+STATUS_LABELS = dict(Job.STATUS)
+
+_task_counts_lock = threading.Lock()
+# Time of the latest task count event, by job
+_task_counts_published = {}
+
+
+def _publish(event, data):
+    event_log.publish(django_settings.SHARED_DIRECTORY, event, data)
+
+
+def _unit(jobChainLink):
+    return {'unit': getJobUnitUUID(jobChainLink), 'unit_type': jobChainLink.unit.__class__.__name__}
+
+
+def job_changed(jobChainLink, status_code):
+    """Publish the creation or status change of the job of a link."""
+    if jobChainLink.subJobOf:
+        return
+    seconds = calendar.timegm(jobChainLink.createdDate.utctimetuple())
+    fraction = getDeciDate("." + str(jobChainLink.createdDate.microsecond).zfill(6))
+    data = _unit(jobChainLink)
+    data.update({
+        'timestamp': float(seconds + Decimal(fraction)),
+        'job': {
+            'uuid': jobChainLink.UUID,
+            'type': jobChainLink.description,
+            'microservicegroup': jobChainLink.microserviceGroup,
+            'subjobof': '',
+            'currentstep': status_code,
+            'currentstep_label': unicode(STATUS_LABELS.get(status_code, '')),
+            'timestamp': '%d.%s' % (seconds, fraction.split('.')[-1]),
+        },
+    })
+    _publish('job', data)
+
+
+def choices_available(taskManager):
+    """Publish the choices a link task manager is awaiting a decision on."""
+    xml = taskManager.xmlify()
+    data = _unit(taskManager.jobChainLink)
+    data.update({
+        'job': taskManager.jobChainLink.UUID,
+        'choices': {choice.findtext('chainAvailable'): choice.findtext('description')
+                    for choice in xml.findall('choices/choice')},
+    })
+    _publish('choices', data)
+
+
+def task_counts(jobChainLink, total, remaining):
+    """Publish the number of tasks of a job, and of those not completed."""
+    now = time.time()
+    with _task_counts_lock:
+        if remaining:
+            if now - _task_counts_published.get(jobChainLink.UUID, 0) < TASK_COUNT_INTERVAL:
+                return
+            _task_counts_published[jobChainLink.UUID] = now
+        else:
+            _task_counts_published.pop(jobChainLink.UUID, None)
+    data = _unit(jobChainLink)
+    data.update({'job': jobChainLink.UUID, 'total': total, 'remaining': remaining})
+    _publish('tasks', data)
+
+
+def reset():
+    """Publish that the status of the jobs should be reloaded."""
+    _publish('reset', {})
@@ -26,8 +26,9 @@ import logging
 from jobChainLink import jobChainLink
 
 from dicts import ReplacementDict
+from workflow import get_workflow
 
-from main.models import MicroServiceChain, UnitVariable
+from main.models import UnitVariable
 
 # Holds:
 # -UNIT
@@ -69,7 +70,7 @@ class jobChain:
         self.linkSplitCount = 1
         self.subJobOf = subJobOf
 
-        chain = MicroServiceChain.objects.get(id=str(chainPK))
+        chain = get_workflow().chain(chainPK)
         LOGGER.debug('Chain: %s', chain)
         self.startingChainLink = chain.startinglink_id
         self.description = chain.description
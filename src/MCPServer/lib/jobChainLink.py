@@ -35,9 +35,12 @@ from linkTaskManagerGetUserChoiceFromMicroserviceGeneratedList import linkTaskMa
 from linkTaskManagerSetUnitVariable import linkTaskManagerSetUnitVariable
 from linkTaskManagerUnitVariableLinkPull import linkTaskManagerUnitVariableLinkPull
 
-from databaseFunctions import auto_close_db, logJobCreatedSQL, getUTCDate
+from databaseFunctions import auto_close_db, logJobCreatedSQL, logJobStatusSQL, getUTCDate
+from workflow import get_workflow
+import events
+import journal
 
-from main.models import Job, MicroServiceChainLink, MicroServiceChainLinkExitCode, TaskType
+from main.models import Job, MicroServiceChainLink, TaskType
 
 LOGGER = logging.getLogger('archivematica.mcp.server')
 
@@ -67,14 +70,14 @@ class jobChainLink:
 
         # Depending on the path that led to this, jobChainLinkPK may
         # either be a UUID or a MicroServiceChainLink instance
-        if isinstance(jobChainLinkPK, basestring):
-            try:
-                link = MicroServiceChainLink.objects.get(id=str(jobChainLinkPK))
-            # This will sometimes return no values
-            except MicroServiceChainLink.DoesNotExist:
-                return
-        else:
-            link = jobChainLinkPK
+        if isinstance(jobChainLinkPK, MicroServiceChainLink):
+            jobChainLinkPK = jobChainLinkPK.id
+        self.workflow = get_workflow()
+        try:
+            link = self.workflow.link(jobChainLinkPK)
+        # This will sometimes return no values
+        except MicroServiceChainLink.DoesNotExist:
+            return
 
         self.pk = link.id
 
@@ -91,6 +94,7 @@ class jobChainLink:
         self.unit.reload()
 
         logJobCreatedSQL(self)
+        events.job_changed(self, Job.STATUS_EXECUTING_COMMANDS)
 
         if self.createTasks(taskType, taskTypePKReference) is None:
             self.getNextChainLinkPK(None)
@@ -125,10 +129,10 @@ class jobChainLink:
 
     def getNextChainLinkPK(self, exitCode):
         if exitCode is not None:
-            try:
-                return MicroServiceChainLinkExitCode.objects.get(microservicechainlink_id=str(self.pk), exitcode=str(exitCode)).nextmicroservicechainlink_id
-            except (MicroServiceChainLinkExitCode.DoesNotExist, MicroServiceChainLinkExitCode.MultipleObjectsReturned):
+            exit_code = self.workflow.exit_code(self.pk, exitCode)
+            if exit_code is None:
                 return self.defaultNextChainLink
+            return exit_code.nextmicroservicechainlink_id
 
     @log_exceptions
     @auto_close_db
@@ -148,7 +152,8 @@ class jobChainLink:
             status_code = int(status_code)
         except ValueError:
             status_code = 0
-        Job.objects.filter(jobuuid=self.UUID).update(currentstep=status_code)
+        logJobStatusSQL(self, status_code)
+        events.job_changed(self, status_code)
 
     def updateExitMessage(self, exitCode):
         """
@@ -159,10 +164,9 @@ class jobChainLink:
         """
         status_code = self.defaultExitMessage
         if exitCode is not None:
-            try:
-                status_code = MicroServiceChainLinkExitCode.objects.get(microservicechainlink_id=str(self.pk), exitcode=str(exitCode)).exitmessage
-            except MicroServiceChainLinkExitCode.DoesNotExist:
-                pass
+            exit_code = self.workflow.exit_code(self.pk, exitCode)
+            if exit_code is not None:
+                status_code = exit_code.exitmessage
         if status_code is not None:
             self.setExitMessage(status_code)
         else:
@@ -171,5 +175,6 @@ class jobChainLink:
     @log_exceptions
     @auto_close_db
     def linkProcessingComplete(self, exitCode, passVar=None):
+        journal.flush()
         self.updateExitMessage(exitCode)
         self.jobChain.nextChainLink(self.getNextChainLinkPK(exitCode), passVar=passVar)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python2
+
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage MCPServer
+
+"""
+Buffered writes of the Tasks table.
+
+Creating and completing a task used to cost a query each (plus a read before
+the update), which adds up for links run for each file of a large unit.
+Instead, new tasks are buffered and inserted together with ``bulk_create``,
+and task results are buffered and written together with one UPDATE per
+batch of tasks.
+
+New tasks must exist before the MCPClient runs them, so ``flush_created`` is
+called before a task is submitted to Gearman. Results are written once
+``TASK_JOURNAL_BATCH_SIZE`` of them are buffered, at least every
+``TASK_JOURNAL_FLUSH_INTERVAL`` seconds, and when a link completes, so the
+tasks of a link are written before the unit moves on. If MCPServer stops
+with results still buffered, those tasks are left without an exit code and
+``cleanupOldDbEntriesOnNewRun`` marks them as failed on the next run, as it
+does for tasks that were still running.
+"""
+
+import logging
+import os
+import threading
+
+from django.db.models import Case, Value, When
+
+from archivematicaFunctions import strToUnicode
+from databaseFunctions import auto_close_db, getUTCDate
+import output_spool
+
+from main.models import Task
+
+from django.conf import settings as django_settings
+
+LOGGER = logging.getLogger('archivematica.mcp.server')
+
+# Fields written when a task completes
+COMPLETED_FIELDS = ('endtime', 'exitcode', 'stdout', 'stderror', 'stdout_digest', 'stderror_digest')
+# Bounds of a single UPDATE of completed tasks, whatever the batch size, so
+# that the statement stays well below the max_allowed_packet of MySQL: the
+# number of tasks, and the bytes of their output
+UPDATE_MAX_ROWS = 500
+UPDATE_MAX_BYTES = 1024 * 1024
+
+
+class TaskJournal(object):
+    """Buffers Task inserts and updates and writes them in batches."""
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)
+        # Held while writing, so that a flush only returns once everything
+        # buffered before it has been written, even by another thread
+        self._insert_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._created = []
+        self._completed = []
+        self._started = False
+
+    def _start(self):
+        t = threading.Thread(target=self._work, name='task-journal')
+        t.daemon = True
+        t.start()
+        self._started = True
+
+    def created(self, task):
+        """Buffer the insert of an unsaved Task instance."""
+        with self._lock:
+            if not self._started:
+                self._start()
+            self._created.append(task)
+
+    def completed(self, task):
+        """
+        Buffer the update of a Task instance, with at least ``taskuuid``
+        and the ``COMPLETED_FIELDS`` set.
+        """
+        with self._lock:
+            if not self._started:
+                self._start()
+            self._completed.append(task)
+            if len(self._completed) >= self.batch_size:
+                self._full.notify()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if len(self._completed) < self.batch_size:
+                    self._full.wait(self.flush_interval)
+            self._flush_pending()
+
+    @auto_close_db
+    def _flush_pending(self):
+        # The connection of this thread lasts as long as MCPServer: closing
+        # it when unusable after each flush lets the next flush reconnect,
+        # e.g. once the database is back
+        try:
+            self.flush()
+        except Exception:
+            LOGGER.exception('Error writing tasks to the database')
+
+    def flush_created(self):
+        """Insert every buffered new task."""
+        with self._insert_lock:
+            with self._lock:
+                created, self._created = self._created, []
+            if not created:
+                return
+            try:
+                Task.objects.bulk_create(created, batch_size=self.batch_size)
+            except Exception:
+                with self._lock:
+                    self._created[:0] = created
+                raise
+            LOGGER.debug('Inserted %d tasks', len(created))
+
+    def flush_completed(self):
+        """Update every buffered completed task."""
+        with self._update_lock:
+            with self._lock:
+                completed, self._completed = self._completed, []
+            if not completed:
+                return
+            updated = 0
+            try:
+                for batch in _update_batches(completed, min(self.batch_size, UPDATE_MAX_ROWS), UPDATE_MAX_BYTES):
+                    _update_tasks(batch)
+                    updated += len(batch)
+            except Exception:
+                with self._lock:
+                    self._completed[:0] = completed[updated:]
+                raise
+            LOGGER.debug('Updated %d tasks', len(completed))
+
+    def flush(self):
+        """Write everything buffered; new tasks first."""
+        self.flush_created()
+        self.flush_completed()
+
+
+def _output_size(task):
+    """Return the size in bytes of the output of a completed task."""
+    return sum(len((getattr(task, name) or u'').encode('utf-8')) for name in ('stdout', 'stderror'))
+
+
+def _update_batches(tasks, max_rows, max_bytes):
+    """
+    Split ``tasks`` into lists of at most ``max_rows`` tasks whose output is
+    at most ``max_bytes`` in total. A task with more output than that is in
+    a list of its own.
+    """
+    batch = []
+    size = 0
+    for task in tasks:
+        task_size = _output_size(task)
+        if batch and (len(batch) >= max_rows or size + task_size > max_bytes):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(task)
+        size += task_size
+    if batch:
+        yield batch
+
+
+def _update_tasks(tasks):
+    """
+    Write the ``COMPLETED_FIELDS`` of ``tasks`` with a single UPDATE. Fields
+    that differ between tasks are set with a CASE on the task UUID.
+    """
+    updates = {}
+    for name in COMPLETED_FIELDS:
+        field = Task._meta.get_field(name)
+        values = [getattr(task, name) for task in tasks]
+        if all(value == values[0] for value in values):
+            updates[name] = Value(values[0], output_field=field)
+        else:
+            updates[name] = Case(
+                *[When(taskuuid=task.taskuuid, then=Value(value, output_field=field))
+                  for task, value in zip(tasks, values)],
+                output_field=field)
+    Task.objects.filter(taskuuid__in=[task.taskuuid for task in tasks]).update(**updates)
+
+
+task_journal = TaskJournal(django_settings.TASK_JOURNAL_BATCH_SIZE,
+                           django_settings.TASK_JOURNAL_FLUSH_INTERVAL)
+
+
+def log_task_created(taskManager, commandReplacementDic, taskUUID, arguments):
+    """
+    Buffer a new entry in the Tasks table, like
+    ``databaseFunctions.logTaskCreatedSQL``.
+
+    :param MCPServer.linkTaskManager taskManager: A linkTaskManager subclass instance.
+    :param ReplacementDict commandReplacementDic: A ReplacementDict or dict instance. %fileUUID% and %relativeLocation% variables will be looked up from this dict.
+    :param str taskUUID: The UUID to be used for this Task in the database.
+    :param str arguments: The arguments to be passed to the command when it is executed, as a string.
+    """
+    fileUUID = ""
+    if "%fileUUID%" in commandReplacementDic:
+        fileUUID = commandReplacementDic["%fileUUID%"]
+    fileName = os.path.basename(os.path.abspath(commandReplacementDic["%relativeLocation%"]))
+    task_journal.created(Task(taskuuid=taskUUID,
+                              job_id=taskManager.jobChainLink.UUID,
+                              fileuuid=fileUUID,
+                              filename=fileName,
+                              execution=taskManager.execute,
+                              arguments=arguments,
+                              createdtime=getUTCDate()))
+
+
+def log_task_completed(task):
+    """
+    Buffer the update of the Tasks table entry of a completed task with its
+    exit code, standard output and standard error, like
+    ``databaseFunctions.logTaskCompletedSQL``.
+
+    Output longer than ``TASK_OUTPUT_SPOOL_THRESHOLD`` is spooled to the
+    shared directory and only its beginning is kept in the database.
+
+    :param task: A taskStandard instance with results.
+    """
+    # ``strToUnicode`` prevents the MCP server from crashing when, e.g.,
+    # stderr contains Latin-1 encoded chars, cf. #9967.
+    stdout, stdout_digest = _spool(strToUnicode(task.results["stdOut"], obstinate=True))
+    stderror, stderror_digest = _spool(strToUnicode(task.results["stdError"], obstinate=True))
+    task_journal.completed(Task(taskuuid=str(task.UUID),
+                                endtime=getUTCDate(),
+                                exitcode=task.results["exitCode"],
+                                stdout=stdout,
+                                stderror=stderror,
+                                stdout_digest=stdout_digest,
+                                stderror_digest=stderror_digest))
+
+
+def _spool(content):
+    """Spool long task output, or keep it all in the database on failure."""
+    try:
+        return output_spool.spool(django_settings.SHARED_DIRECTORY, content,
+                                  django_settings.TASK_OUTPUT_SPOOL_THRESHOLD,
+                                  django_settings.TASK_OUTPUT_PREVIEW_SIZE)
+    except (IOError, OSError):
+        LOGGER.warning('Unable to spool task output', exc_info=True)
+        return content, ''
+
+
+def sweep_spooled_output():
+    """
+    Remove the spooled output of the tasks that no longer refer to it. Must
+    be called before any task completes, e.g. when MCPServer starts.
+    """
+    digests = set()
+    for field in ('stdout_digest', 'stderror_digest'):
+        digests.update(Task.objects.exclude(**{field: ''}).values_list(field, flat=True).distinct().iterator())
+    try:
+        removed = output_spool.sweep(django_settings.SHARED_DIRECTORY, digests)
+    except OSError:
+        LOGGER.warning('Unable to remove unused task output', exc_info=True)
+        return
+    LOGGER.info('Removed %d unused task output files', removed)
+
+
+def flush_created():
+    """Insert the buffered new tasks, before they are run."""
+    task_journal.flush_created()
+
+
+def flush():
+    """Write everything buffered."""
+    task_journal.flush()
@@ -38,7 +38,7 @@ class linkTaskManagerAssignMagicLink(LinkTaskManager):
         # GET THE MAGIC NUMBER FROM THE TASK stuff
         link = 0
         try:
-            link = TaskConfigAssignMagicLink.objects.get(id=pk).execute
+            link = self.jobChainLink.workflow.assign_magic_link_config(pk).execute
         except TaskConfigAssignMagicLink.DoesNotExist:
             pass
 
@@ -29,6 +29,7 @@ import threading
 import time
 
 from linkTaskManager import LinkTaskManager
+import events
 import jobChain
 from utils import log_exceptions
 
@@ -39,7 +40,7 @@ from archivematicaFunctions import unicodeToStr
 from databaseFunctions import auto_close_db
 from abilities import choice_is_available
 
-from main.models import MicroServiceChainChoice, UserProfile, Job
+from main.models import UserProfile, Job
 from django.conf import settings as django_settings
 
 waitingOnTimer = "waitingOnTimer"
@@ -55,8 +56,7 @@ class linkTaskManagerChoice(LinkTaskManager):
         self.choices = []
         self.delayTimerLock = threading.Lock()
         self.delayTimer = None
-        choices = MicroServiceChainChoice.objects.filter(
-            choiceavailableatlink_id=str(jobChainLink.pk))
+        choices = jobChainLink.workflow.chain_choices(jobChainLink.pk)
         for choice in choices:
             if choice_is_available(choice, django_settings):
                 self.choices.append((choice.chainavailable_id,
@@ -73,6 +73,7 @@ class linkTaskManagerChoice(LinkTaskManager):
                 self.jobChainLink.setExitMessage(Job.STATUS_AWAITING_DECISION)
             choicesAvailableForUnits[self.jobChainLink.UUID] = self
             choicesAvailableForUnitsLock.release()
+            events.choices_available(self)
 
     def checkForPreconfiguredXML(self):
         desiredChoice = None
@@ -22,21 +22,20 @@
 # @author Joseph Perry <joseph@artefactual.com>
 
 from linkTaskManager import LinkTaskManager
+import journal
+import scheduler
 from taskStandard import taskStandard
 import os
-import threading
 
 import archivematicaFunctions
-import databaseFunctions
 from dicts import ReplacementDict
-from main.models import StandardTaskConfig
 
 
 class linkTaskManagerDirectories(LinkTaskManager):
     def __init__(self, jobChainLink, pk, unit):
         super(linkTaskManagerDirectories, self).__init__(jobChainLink, pk, unit)
         self.tasks = []
-        stc = StandardTaskConfig.objects.get(id=str(pk))
+        stc = self.jobChainLink.workflow.standard_task_config(pk)
         filterSubDir = stc.filter_subdir
         self.requiresOutputLock = stc.requires_output_lock
         standardOutputFile = stc.stdout_file
@@ -67,11 +66,9 @@ class linkTaskManagerDirectories(LinkTaskManager):
         arguments, standardOutputFile, standardErrorFile = commandReplacementDic.replace(arguments, standardOutputFile, standardErrorFile)
 
         self.task = taskStandard(self, execute, arguments, standardOutputFile, standardErrorFile, UUID=self.UUID)
-        databaseFunctions.logTaskCreatedSQL(self, commandReplacementDic, self.UUID, arguments)
-        t = threading.Thread(target=self.task.performTask)
-        t.daemon = True
-        t.start()
+        journal.log_task_created(self, commandReplacementDic, self.UUID, arguments)
+        scheduler.submit_task(self.task.performTask, priority=scheduler.PRIORITY_HIGH)
 
     def taskCompletedCallBackFunction(self, task):
-        databaseFunctions.logTaskCompletedSQL(task)
+        journal.log_task_completed(task)
         self.jobChainLink.linkProcessingComplete(task.results["exitCode"], self.jobChainLink.passVar)
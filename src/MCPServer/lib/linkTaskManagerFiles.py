@@ -25,15 +25,16 @@ import ast
 import logging
 import os
 import threading
-import time
 import uuid
 
 from linkTaskManager import LinkTaskManager
-from taskStandard import taskStandard
+import events
+import journal
+import scheduler
+from taskStandard import taskBatch, taskStandard
 import archivematicaFunctions
-import databaseFunctions
 from dicts import ReplacementDict
-from main.models import StandardTaskConfig, UnitVariable
+from main.models import UnitVariable
 
 from django.conf import settings as django_settings
 
@@ -44,11 +45,12 @@ class linkTaskManagerFiles(LinkTaskManager):
     def __init__(self, jobChainLink, pk, unit):
         super(linkTaskManagerFiles, self).__init__(jobChainLink, pk, unit)
         self.tasks = {}
+        self.taskCount = 0
         self.tasksLock = threading.Lock()
         self.exitCode = 0
         self.clearToNextLink = False
 
-        stc = StandardTaskConfig.objects.get(id=str(pk))
+        stc = self.jobChainLink.workflow.standard_task_config(pk)
         # These three may be concatenated/compared with other strings,
         # so they need to be bytestrings here
         filterFileEnd = str(stc.filter_file_end) if stc.filter_file_end else ''
@@ -86,6 +88,7 @@ class linkTaskManagerFiles(LinkTaskManager):
         for key, value in SIPReplacementDic.items():
             SIPReplacementDic[key] = archivematicaFunctions.escapeForCommand(value)
         self.tasksLock.acquire()
+        batch = []
         for file, fileUnit in unit.fileList.items():
             if filterFileEnd:
                 if not file.endswith(filterFileEnd):
@@ -124,23 +127,36 @@ class linkTaskManagerFiles(LinkTaskManager):
             UUID = str(uuid.uuid4())
             task = taskStandard(self, execute, arguments, standardOutputFile, standardErrorFile, outputLock=outputLock, UUID=UUID)
             self.tasks[UUID] = task
-            databaseFunctions.logTaskCreatedSQL(self, commandReplacementDic, UUID, arguments)
-            t = threading.Thread(target=task.performTask)
-            t.daemon = True
-            while(django_settings.LIMIT_TASK_THREADS <= threading.activeCount()):
-                self.tasksLock.release()
-                time.sleep(django_settings.LIMIT_TASK_THREADS_SLEEP)
-                self.tasksLock.acquire()
-            t.start()
+            self.taskCount += 1
+            journal.log_task_created(self, commandReplacementDic, UUID, arguments)
+            batch.append(task)
+            if len(batch) >= django_settings.TASK_BATCH_SIZE:
+                self.performBatch(batch)
+                batch = []
+
+        if batch:
+            self.performBatch(batch)
 
         self.clearToNextLink = True
+        events.task_counts(self.jobChainLink, self.taskCount, len(self.tasks))
         self.tasksLock.release()
         if self.tasks == {}:
             self.jobChainLink.linkProcessingComplete(self.exitCode)
 
+    def performBatch(self, tasks):
+        """
+        Queue the submission of ``tasks`` to gearman. A batch of one task is
+        submitted as a regular task.
+        """
+        if len(tasks) == 1:
+            target = tasks[0].performTask
+        else:
+            target = taskBatch(tasks).performTask
+        scheduler.submit_task(target)
+
     def taskCompletedCallBackFunction(self, task):
         self.exitCode = max(self.exitCode, abs(task.results["exitCode"]))
-        databaseFunctions.logTaskCompletedSQL(task)
+        journal.log_task_completed(task)
 
         self.tasksLock.acquire()
         if task.UUID in self.tasks:
@@ -149,6 +165,8 @@ class linkTaskManagerFiles(LinkTaskManager):
             LOGGER.warning('Task UUID %s not in task list %s', task.UUID, self.tasks)
             exit(1)
 
+        if self.clearToNextLink is True:
+            events.task_counts(self.jobChainLink, self.taskCount, len(self.tasks))
         if self.clearToNextLink is True and self.tasks == {}:
             LOGGER.debug('Proceeding to next link %s', self.jobChainLink.UUID)
             self.jobChainLink.linkProcessingComplete(self.exitCode, self.jobChainLink.passVar)
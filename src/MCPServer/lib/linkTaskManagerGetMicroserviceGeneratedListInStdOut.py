@@ -24,15 +24,14 @@
 # Stdlib, alphabetical by import source
 import logging
 import os
-import threading
 
 # This project,  alphabetical by import source
 from linkTaskManager import LinkTaskManager
+import journal
+import scheduler
 from taskStandard import taskStandard
 import archivematicaFunctions
-import databaseFunctions
 from dicts import ChoicesDict, ReplacementDict
-from main.models import StandardTaskConfig
 
 LOGGER = logging.getLogger('archivematica.mcp.server')
 
@@ -41,7 +40,7 @@ class linkTaskManagerGetMicroserviceGeneratedListInStdOut(LinkTaskManager):
     def __init__(self, jobChainLink, pk, unit):
         super(linkTaskManagerGetMicroserviceGeneratedListInStdOut, self).__init__(jobChainLink, pk, unit)
         self.tasks = []
-        stc = StandardTaskConfig.objects.get(id=str(pk))
+        stc = self.jobChainLink.workflow.standard_task_config(pk)
         filterSubDir = stc.filter_subdir
         self.requiresOutputLock = stc.requires_output_lock
         standardOutputFile = stc.stdout_file
@@ -77,13 +76,11 @@ class linkTaskManagerGetMicroserviceGeneratedListInStdOut(LinkTaskManager):
             self, execute, arguments, standardOutputFile, standardErrorFile,
             UUID=self.UUID, alwaysCapture=True)
 
-        databaseFunctions.logTaskCreatedSQL(self, commandReplacementDic, self.UUID, arguments)
-        t = threading.Thread(target=self.task.performTask)
-        t.daemon = True
-        t.start()
+        journal.log_task_created(self, commandReplacementDic, self.UUID, arguments)
+        scheduler.submit_task(self.task.performTask, priority=scheduler.PRIORITY_HIGH)
 
     def taskCompletedCallBackFunction(self, task):
-        databaseFunctions.logTaskCompletedSQL(task)
+        journal.log_task_completed(task)
         try:
             choices = ChoicesDict.fromstring(task.results["stdOut"])
         except Exception:
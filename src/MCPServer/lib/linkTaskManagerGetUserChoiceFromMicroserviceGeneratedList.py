@@ -28,10 +28,11 @@ import os
 
 # This project,  alphabetical by import source
 from linkTaskManager import LinkTaskManager
+import events
 from linkTaskManagerChoice import choicesAvailableForUnits, choicesAvailableForUnitsLock
 
 from dicts import ReplacementDict, ChoicesDict
-from main.models import StandardTaskConfig, UserProfile, Job
+from main.models import UserProfile, Job
 
 from django.conf import settings as django_settings
 
@@ -42,7 +43,7 @@ class linkTaskManagerGetUserChoiceFromMicroserviceGeneratedList(LinkTaskManager)
     def __init__(self, jobChainLink, pk, unit):
         super(linkTaskManagerGetUserChoiceFromMicroserviceGeneratedList, self).__init__(jobChainLink, pk, unit)
         self.choices = []
-        stc = StandardTaskConfig.objects.get(id=str(pk))
+        stc = self.jobChainLink.workflow.standard_task_config(pk)
         key = stc.execute
 
         choiceIndex = 0
@@ -77,6 +78,7 @@ class linkTaskManagerGetUserChoiceFromMicroserviceGeneratedList(LinkTaskManager)
             self.jobChainLink.setExitMessage(Job.STATUS_AWAITING_DECISION)
             choicesAvailableForUnits[self.jobChainLink.UUID] = self
             choicesAvailableForUnitsLock.release()
+            events.choices_available(self)
 
     def checkForPreconfiguredXML(self):
         """ Check the processing XML file for a pre-selected choice.
@@ -30,6 +30,7 @@ import time
 
 from utils import choice_unifier
 from linkTaskManager import LinkTaskManager
+import events
 from linkTaskManagerChoice import choicesAvailableForUnits, choicesAvailableForUnitsLock, waitingOnTimer
 
 from dicts import ReplacementDict
@@ -44,7 +45,7 @@ class linkTaskManagerReplacementDicFromChoice(LinkTaskManager):
         super(linkTaskManagerReplacementDicFromChoice, self).__init__(jobChainLink, pk, unit)
 
         self.choices = []
-        dicts = MicroServiceChoiceReplacementDic.objects.filter(choiceavailableatlink=str(jobChainLink.pk))
+        dicts = jobChainLink.workflow.replacement_dic_choices(jobChainLink.pk)
         for i, dic in enumerate(dicts):
             self.choices.append((i, dic.description, dic.replacementdic))
 
@@ -59,9 +60,9 @@ class linkTaskManagerReplacementDicFromChoice(LinkTaskManager):
         # DashboardSettings does not belong to MCPServer. We currently have
         # direct access to the database but that may not be always possible.
         try:
-            mscl = MicroServiceChainLink.objects.get(id=jobChainLink.pk)
-            task_id = mscl.defaultnextchainlink.currenttask.tasktypepkreference
-            stc = StandardTaskConfig.objects.get(id=task_id)
+            mscl = jobChainLink.workflow.link(jobChainLink.pk)
+            next_link = jobChainLink.workflow.link(mscl.defaultnextchainlink_id)
+            stc = jobChainLink.workflow.standard_task_config(next_link.currenttask.tasktypepkreference)
         except (MicroServiceChainLink.DoesNotExist, StandardTaskConfig.DoesNotExist, AttributeError):
             pass
         else:
@@ -88,6 +89,7 @@ class linkTaskManagerReplacementDicFromChoice(LinkTaskManager):
             self.jobChainLink.setExitMessage(Job.STATUS_AWAITING_DECISION)
             choicesAvailableForUnits[self.jobChainLink.UUID] = self
             choicesAvailableForUnitsLock.release()
+            events.choices_available(self)
 
     def checkForPreconfiguredXML(self):
         ret = None
@@ -111,9 +113,9 @@ class linkTaskManagerReplacementDicFromChoice(LinkTaskManager):
                         desiredChoice = preconfiguredChoice.find("goToChain").text
                         desiredChoice = choice_unifier.get(
                             desiredChoice, desiredChoice)
-                        dic = MicroServiceChoiceReplacementDic.objects.get(
-                            id=desiredChoice,
-                            choiceavailableatlink=this_choice_point)
+                        dic = self.jobChainLink.workflow.replacement_dic(desiredChoice)
+                        if dic.choiceavailableatlink_id != this_choice_point:
+                            raise MicroServiceChoiceReplacementDic.DoesNotExist()
                         ret = dic.replacementdic
                         try:
                             # <delay unitAtime="yes">30</delay>
@@ -25,14 +25,12 @@ from linkTaskManager import LinkTaskManager
 
 choicesAvailableForUnits = {}
 
-from main.models import TaskConfigSetUnitVariable
-
 
 class linkTaskManagerSetUnitVariable(LinkTaskManager):
     def __init__(self, jobChainLink, pk, unit):
         super(linkTaskManagerSetUnitVariable, self).__init__(jobChainLink, pk, unit)
         # GET THE MAGIC NUMBER FROM THE TASK stuff
-        var = TaskConfigSetUnitVariable.objects.get(id=pk)
+        var = self.jobChainLink.workflow.set_unit_variable_config(pk)
 
         # Update the unit
         # set the magic number
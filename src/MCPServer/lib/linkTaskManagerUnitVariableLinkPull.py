@@ -25,13 +25,13 @@ from linkTaskManager import LinkTaskManager
 
 choicesAvailableForUnits = {}
 
-from main.models import TaskConfigUnitVariableLinkPull, Job
+from main.models import Job
 
 
 class linkTaskManagerUnitVariableLinkPull(LinkTaskManager):
     def __init__(self, jobChainLink, pk, unit):
         super(linkTaskManagerUnitVariableLinkPull, self).__init__(jobChainLink, pk, unit)
-        var = TaskConfigUnitVariableLinkPull.objects.get(id=pk)
+        var = self.jobChainLink.workflow.unit_variable_link_pull_config(pk)
         link = self.unit.getmicroServiceChainLink(var.variable, var.variablevalue, var.defaultmicroservicechainlink_id)
 
         # Update the unit
@@ -0,0 +1,150 @@
+#!/usr/bin/env python2
+
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage MCPServer
+
+"""
+Fixed-size thread pools used by MCPServer to run units and tasks.
+
+Instead of starting a thread per unit or per task and sleeping while too many
+threads are alive, work is put on a priority queue consumed by a fixed number
+of worker threads. Work of the same priority runs in submission order.
+
+``unit_executor`` runs ``createUnitAndJobChain`` for units found in the
+watched directories and ``task_executor`` submits tasks to Gearman. New units
+are only accepted while the number of pending tasks is below
+``MAX_PENDING_TASKS`` so that the units already being processed get the
+workers first.
+"""
+
+import itertools
+import logging
+import Queue
+import threading
+import time
+
+from django.conf import settings as django_settings
+
+LOGGER = logging.getLogger('archivematica.mcp.server')
+
+# Tasks that gate the progress of a whole unit, e.g. "one instance" tasks, go
+# before the tasks run for each file of a unit.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+
+
+class Executor(object):
+    """A fixed number of worker threads consuming a priority queue."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self._queue = Queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self._started = False
+        self._busy = 0
+        self._submitted = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name='{}-{}'.format(self.name, i + 1))
+            t.daemon = True
+            t.start()
+        self._started = True
+
+    def submit(self, fn, args=(), kwargs=None, priority=PRIORITY_NORMAL):
+        """Queue ``fn(*args, **kwargs)`` to be run by a worker thread."""
+        with self._lock:
+            if not self._started:
+                self._start()
+            self._submitted += 1
+        self._queue.put((priority, next(self._sequence), time.time(), fn, args, kwargs or {}))
+
+    def _work(self):
+        while True:
+            _, _, queued_at, fn, args, kwargs = self._queue.get()
+            wait = time.time() - queued_at
+            with self._lock:
+                self._busy += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+                self._capacity.notify_all()
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                LOGGER.exception('Uncaught exception in %s executor', self.name)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
+                    self._capacity.notify_all()
+
+    def pending(self):
+        """Number of submitted calls not started yet."""
+        return self._queue.qsize()
+
+    def wait_for_capacity(self, max_pending):
+        """Block until fewer than ``max_pending`` calls are waiting to start."""
+        with self._lock:
+            while self._queue.qsize() >= max_pending:
+                self._capacity.wait()
+
+    def stats(self):
+        """Return a dict describing the state of the executor."""
+        with self._lock:
+            started = self._completed + self._busy
+            return {
+                'name': self.name,
+                'workers': self.workers,
+                'busy': self._busy,
+                'pending': self._queue.qsize(),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'average_wait': self._total_wait / started if started else 0.0,
+                'max_wait': self._max_wait,
+            }
+
+
+unit_executor = Executor('unit', django_settings.LIMIT_UNIT_THREADS)
+task_executor = Executor('task', django_settings.LIMIT_TASK_THREADS)
+
+
+def submit_unit(fn, args=(), kwargs=None):
+    """
+    Queue the processing of a new unit, waiting first until the task queue
+    has drained below ``MAX_PENDING_TASKS``.
+    """
+    task_executor.wait_for_capacity(django_settings.MAX_PENDING_TASKS)
+    unit_executor.submit(fn, args, kwargs)
+
+
+def submit_task(fn, args=(), kwargs=None, priority=PRIORITY_NORMAL):
+    """Queue the submission of a task to Gearman."""
+    task_executor.submit(fn, args, kwargs, priority=priority)
+
+
+def stats():
+    """Return the stats of every executor, for monitoring."""
+    return [unit_executor.stats(), task_executor.stats()]
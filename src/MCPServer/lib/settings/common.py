@@ -34,6 +34,9 @@ CONFIG_MAPPING = {
     'rejected_directory': {'section': 'MCPServer', 'option': 'rejectedDirectory', 'type': 'string'},
     'wait_on_auto_approve': {'section': 'MCPServer', 'option': 'waitOnAutoApprove', 'type': 'int'},
     'watch_directory_interval': {'section': 'MCPServer', 'option': 'watchDirectoriesPollInterval', 'type': 'int'},
+    'watch_directory_method': {'section': 'MCPServer', 'option': 'watchDirectoriesMethod', 'type': 'string'},
+    'watch_directory_settle_delay': {'section': 'MCPServer', 'option': 'watchDirectoriesSettleDelay', 'type': 'float'},
+    'watch_directory_rescan_interval': {'section': 'MCPServer', 'option': 'watchDirectoriesRescanInterval', 'type': 'int'},
     'secret_key': {'section': 'MCPServer', 'option': 'django_secret_key', 'type': 'string'},
     'search_enabled': [
         {'section': 'MCPServer', 'option': 'disable_search_indexing', 'type': 'iboolean'},
@@ -43,8 +46,15 @@ CONFIG_MAPPING = {
     # [Protocol]
     'limit_task_threads': {'section': 'Protocol', 'option': 'limitTaskThreads', 'type': 'int'},
     'limit_task_threads_sleep': {'section': 'Protocol', 'option': 'limitTaskThreadsSleep', 'type': 'float'},
+    'limit_unit_threads': {'section': 'Protocol', 'option': 'limitUnitThreads', 'type': 'int'},
+    'max_pending_tasks': {'section': 'Protocol', 'option': 'maxPendingTasks', 'type': 'int'},
     'limit_gearman_conns': {'section': 'Protocol', 'option': 'limitGearmanConnections', 'type': 'int'},
     'reserved_as_task_processing_threads': {'section': 'Protocol', 'option': 'reservedAsTaskProcessingThreads', 'type': 'int'},
+    'task_batch_size': {'section': 'Protocol', 'option': 'taskBatchSize', 'type': 'int'},
+    'task_journal_batch_size': {'section': 'Protocol', 'option': 'taskJournalBatchSize', 'type': 'int'},
+    'task_journal_flush_interval': {'section': 'Protocol', 'option': 'taskJournalFlushInterval', 'type': 'float'},
+    'task_output_spool_threshold': {'section': 'Protocol', 'option': 'taskOutputSpoolThreshold', 'type': 'int'},
+    'task_output_preview_size': {'section': 'Protocol', 'option': 'taskOutputPreviewSize', 'type': 'int'},
 
     # [client]
     'db_engine': {'section': 'client', 'option': 'engine', 'type': 'string'},
@@ -62,6 +72,9 @@ sharedDirectory = /var/archivematica/sharedDirectory/
 processingDirectory = /var/archivematica/sharedDirectory/currentlyProcessing/
 rejectedDirectory = %%sharedPath%%rejected/
 watchDirectoriesPollInterval = 1
+watchDirectoriesMethod = inotify
+watchDirectoriesSettleDelay = 0.5
+watchDirectoriesRescanInterval = 60
 processingXMLFile = processingMCP.xml
 waitOnAutoApprove = 0
 search_enabled = true
@@ -71,7 +84,14 @@ delimiter = <!&\delimiter/&!>
 limitGearmanConnections = 10000
 limitTaskThreads = 75
 limitTaskThreadsSleep = 0.2
+limitUnitThreads = 8
+maxPendingTasks = 1000
 reservedAsTaskProcessingThreads = 8
+taskBatchSize = 1
+taskJournalBatchSize = 100
+taskJournalFlushInterval = 1.0
+taskOutputSpoolThreshold = 65536
+taskOutputPreviewSize = 4096
 
 [client]
 user = archivematica
@@ -163,8 +183,18 @@ PROCESSING_XML_FILE = config.get('processing_xml_file')
 GEARMAN_SERVER = config.get('gearman_server')
 WAIT_ON_AUTO_APPROVE = config.get('wait_on_auto_approve')
 WATCH_DIRECTORY_INTERVAL = config.get('watch_directory_interval')
+WATCH_DIRECTORY_METHOD = config.get('watch_directory_method')
+WATCH_DIRECTORY_SETTLE_DELAY = config.get('watch_directory_settle_delay')
+WATCH_DIRECTORY_RESCAN_INTERVAL = config.get('watch_directory_rescan_interval')
 LIMIT_TASK_THREADS = config.get('limit_task_threads')
 LIMIT_TASK_THREADS_SLEEP = config.get('limit_task_threads_sleep')
+LIMIT_UNIT_THREADS = config.get('limit_unit_threads')
+MAX_PENDING_TASKS = config.get('max_pending_tasks')
 LIMIT_GEARMAN_CONNS = config.get('limit_gearman_conns')
 RESERVED_AS_TASK_PROCESSING_THREADS = config.get('reserved_as_task_processing_threads')
+TASK_BATCH_SIZE = config.get('task_batch_size')
+TASK_JOURNAL_BATCH_SIZE = config.get('task_journal_batch_size')
+TASK_JOURNAL_FLUSH_INTERVAL = config.get('task_journal_flush_interval')
+TASK_OUTPUT_SPOOL_THRESHOLD = config.get('task_output_spool_threshold')
+TASK_OUTPUT_PREVIEW_SIZE = config.get('task_output_preview_size')
 SEARCH_ENABLED = config.get('search_enabled')
@@ -25,13 +25,12 @@ import cPickle
 import gearman
 import logging
 import os
-import threading
-import time
 import uuid
 
+import dispatcher
+import journal
 from utils import log_exceptions
 
-from django.conf import settings as django_settings
 from django.utils import timezone
 
 from databaseFunctions import auto_close_db
@@ -47,7 +46,28 @@ LOGGER = logging.getLogger('archivematica.mcp.server')
 # Variables used for the task are defined in the Job's configuration/module (The xml file)
 
 
-limitGearmanConnectionsSemaphore = threading.Semaphore(value=django_settings.LIMIT_GEARMAN_CONNS)
+def submit_job(execute, data, unique, callback):
+    """
+    Submit a job to Gearman without waiting for it to complete.
+
+    ``callback`` is called with the finished ``gearman.job.GearmanJobRequest``.
+    """
+    # The MCPClient records the start of the task in its row
+    journal.flush_created()
+    dispatcher.submit_job(execute, data, unique, callback)
+
+
+def failed_job_results(job_request):
+    """Return task results describing why ``job_request`` did not complete."""
+    if job_request.timed_out:
+        message = "Task %s timed out!"
+    elif job_request.state == gearman.client.JOB_UNKNOWN:
+        message = "Task %s connection failed!"
+    else:
+        message = "Task %s failed!"
+    message = message % job_request.job.unique
+    LOGGER.error(message)
+    return {"exitCode": -1, "stdOut": "", "stdError": message}
 
 
 class taskStandard():
@@ -67,58 +87,33 @@ class taskStandard():
         self.outputLock = outputLock
         self.alwaysCapture = alwaysCapture
 
+    def job_data(self):
+        """Return the data sent to the MCPClient to run this task."""
+        return {
+            "createdDate": timezone.now().isoformat(' '),
+            "arguments": self.arguments,
+            # tells worker to always capture stdout
+            "alwaysCapture": self.alwaysCapture,
+        }
+
     @log_exceptions
     @auto_close_db
     def performTask(self):
-        limitGearmanConnectionsSemaphore.acquire()
-        gm_client = gearman.GearmanClient([django_settings.GEARMAN_SERVER])
-        data = {"createdDate": timezone.now().isoformat(' ')}
-        data["arguments"] = self.arguments
-        data["alwaysCapture"] = self.alwaysCapture  # tells worker to always capture stdout
+        data = self.job_data()
         LOGGER.info('Executing %s %s', self.execute, data)
-        completed_job_request = None
-        failMaxSleep = 60
-        failSleepInitial = 1
-        failSleep = failSleepInitial
-        failSleepIncrementor = 2
-        while completed_job_request is None:
-            try:
-                completed_job_request = gm_client.submit_job(
-                    self.execute.lower(), cPickle.dumps(data), self.UUID)
-            except gearman.errors.ServerUnavailable:
-                completed_job_request = None
-                time.sleep(failSleep)
-                if failSleep == failSleepInitial:
-                    LOGGER.exception('Error submitting job. Retrying.')
-                if failSleep < failMaxSleep:
-                    failSleep += failSleepIncrementor
-        limitGearmanConnectionsSemaphore.release()
-        self.check_request_status(completed_job_request)
-        gm_client.shutdown()
-        LOGGER.debug('Finished performing task %s', self.UUID)
+        submit_job(self.execute, data, self.UUID, self.check_request_status)
 
+    @log_exceptions
+    @auto_close_db
     def check_request_status(self, job_request):
+        LOGGER.debug('Finished performing task %s', self.UUID)
         if job_request.complete:
             self.results = cPickle.loads(job_request.result)
             LOGGER.debug('Task %s finished! Result %s - %s', job_request.job.unique, job_request.state, self.results)
             self.writeOutputs()
-            self.linkTaskManager.taskCompletedCallBackFunction(self)
-        elif job_request.timed_out:
-            LOGGER.error('Task %s timed out!', job_request.unique)
-            self.results['exitCode'] = -1
-            self.results["stdError"] = "Task %s timed out!" % job_request.unique
-            self.linkTaskManager.taskCompletedCallBackFunction(self)
-
-        elif job_request.state == gearman.client.JOB_UNKNOWN:
-            LOGGER.error('Task %s connection failed!', job_request.unique)
-            self.results["stdError"] = "Task %s connection failed!" % job_request.unique
-            self.results['exitCode'] = -1
-            self.linkTaskManager.taskCompletedCallBackFunction(self)
         else:
-            LOGGER.error('Task %s failed!', job_request.unique)
-            self.results["stdError"] = "Task %s failed!" % job_request.unique
-            self.results['exitCode'] = -1
-            self.linkTaskManager.taskCompletedCallBackFunction(self)
+            self.results = failed_job_results(job_request)
+        self.linkTaskManager.taskCompletedCallBackFunction(self)
 
     def outputFileIsWritable(self, fileName):
         """
@@ -178,3 +173,53 @@ class taskStandard():
         if self.results['exitCode']:
             return self.results['exitCode']
         return stdoutStatus + stderrStatus
+
+
+class taskBatch(object):
+    """
+    A group of tasks running the same command, handed to gearman as a
+    single job.
+
+    The MCPClient runs the tasks of a batch one after the other and returns
+    the results of each one, which are then dispatched to the owning
+    linkTaskManager as if every task had been submitted on its own.
+    """
+
+    def __init__(self, tasks):
+        self.UUID = str(uuid.uuid4())
+        self.tasks = tasks
+        self.execute = tasks[0].execute
+
+    @log_exceptions
+    @auto_close_db
+    def performTask(self):
+        data = {"tasks": []}
+        for task in self.tasks:
+            task_data = task.job_data()
+            task_data["uuid"] = task.UUID
+            data["tasks"].append(task_data)
+        LOGGER.info('Executing %s for a batch of %d tasks (%s)', self.execute, len(self.tasks), self.UUID)
+        submit_job(self.execute, data, self.UUID, self.check_request_status)
+
+    @log_exceptions
+    @auto_close_db
+    def check_request_status(self, job_request):
+        LOGGER.debug('Finished performing batch %s', self.UUID)
+        if job_request.complete:
+            results = cPickle.loads(job_request.result)
+            LOGGER.debug('Batch %s finished! Result %s', job_request.job.unique, job_request.state)
+        else:
+            results = failed_job_results(job_request)
+        for task in self.tasks:
+            if "taskResults" in results:
+                task.results = results["taskResults"].get(task.UUID, {
+                    "exitCode": -1,
+                    "stdOut": "",
+                    "stdError": "Task %s missing from batch results!" % task.UUID,
+                })
+            else:
+                # The whole batch failed, e.g. the client could not run it
+                task.results = dict(results)
+            if job_request.complete:
+                task.writeOutputs()
+            task.linkTaskManager.taskCompletedCallBackFunction(task)
@@ -25,6 +25,7 @@ import logging
 import os
 
 import archivematicaFunctions
+from dicts import ReplacementDict
 
 from unitFile import unitFile
 
@@ -38,13 +39,41 @@ LOGGER = logging.getLogger('archivematica.mcp.server')
 class unit:
     """A class to inherit from, to over-ride methods, defininging a processing object at the Job level"""
 
+    # Context used to build replacement dicts without querying the database
+    # for every file: the SIP or Transfer row of the unit, refreshed by
+    # reload(), and its File rows keyed by UUID, loaded by reloadFileList()
+    # and dropped by reload() at the next link, which files may have been
+    # moved or removed by.
+    model = None
+    fileModels = {}
+
     def __init__(self, currentPath, UUID):
         self.currentPath = currentPath.__str__()
         self.UUID = UUID
 
+    def setModel(self, model, currentPath):
+        """Keep the SIP or Transfer row loaded by reload()."""
+        self.fileModels = {}
+        self.currentPath = currentPath
+        self.model = model
+
+    def getFileReplacementDic(self, fileUUID):
+        """Return the replacement dict of a file of the unit."""
+        file_ = self.fileModels.get(fileUUID)
+        if file_ is None or self.model is None:
+            return ReplacementDict.frommodel(type_='file', file_=fileUUID)
+        # Point the file to the unit row so that ReplacementDict.frommodel
+        # finds the SIP or Transfer without a query
+        if self.unitType == "Transfer":
+            file_.transfer = self.model
+        else:
+            file_.sip = self.model
+        return ReplacementDict.frommodel(type_='file', file_=file_)
+
     def reloadFileList(self):
         """Match files to their UUID's via their location and the File table's currentLocation"""
         self.fileList = {}
+        self.fileModels = {}
         # currentPath must be a string to return all filenames as bytestrings,
         # and to safely concatenate with other bytestrings
         currentPath = os.path.join(self.currentPath.replace("%sharedPath%", django_settings.SHARED_DIRECTORY, 1), "").encode('utf-8')
@@ -67,6 +96,7 @@ class unit:
                 if currentlocation in self.fileList:
                     self.fileList[currentlocation].UUID = f.uuid
                     self.fileList[currentlocation].fileGrpUse = f.filegrpuse
+                    self.fileModels[f.uuid] = f
                 else:
                     LOGGER.warning('%s %s has file (%s) %s in the database, but file does not exist in the file system',
                                    self.unitType, self.UUID, f.uuid, f.currentlocation)
@@ -117,6 +147,6 @@ class unit:
             var = UnitVariable.objects.get(unittype=self.unitType,
                                            unituuid=self.UUID,
                                            variable=variable)
-            return var.microservicechainlink
+            return var.microservicechainlink_id
         except UnitVariable.DoesNotExist:
             return defaultMicroServiceChainLink
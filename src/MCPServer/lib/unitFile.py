@@ -47,6 +47,8 @@ class unitFile(object):
     def getReplacementDic(self, target=None):
         if target is not None and self.owningUnit:
             return self.owningUnit.getReplacementDic(self.owningUnit.currentPath)
+        elif self.UUID != "None" and self.owningUnit:
+            return self.owningUnit.getFileReplacementDic(self.UUID)
         elif self.UUID != "None":
             return ReplacementDict.frommodel(
                 type_='file',
@@ -69,7 +69,7 @@ class unitSIP(unit):
     def reload(self):
         sip = SIP.objects.get(uuid=self.UUID)
         self.createdTime = sip.createdtime
-        self.currentPath = sip.currentpath
+        self.setModel(sip, sip.currentpath)
         self.aipFilename = sip.aip_filename or ""
         self.sipType = sip.sip_type
 
@@ -77,7 +77,7 @@ class unitSIP(unit):
         """ Return a dict with all of the replacement strings for this unit and the value to replace with. """
         ret = ReplacementDict.frommodel(
             type_='sip',
-            sip=self.UUID
+            sip=self.model or self.UUID
         )
         ret["%AIPFilename%"] = self.aipFilename
         ret["%unitType%"] = self.unitType
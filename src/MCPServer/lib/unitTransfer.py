@@ -69,10 +69,10 @@ class unitTransfer(unit):
         return 'unitTransfer: <UUID: {u.UUID}, path: {u.currentPath}>'.format(u=self)
 
     def updateLocation(self, newLocation):
-        self.currentPath = newLocation
         transfer = Transfer.objects.get(uuid=self.UUID)
         transfer.currentlocation = newLocation
         transfer.save()
+        self.setModel(transfer, newLocation)
 
     def setMagicLink(self, link, exitStatus=""):
         """Assign a link to the unit to process when loaded.
@@ -94,12 +94,12 @@ class unitTransfer(unit):
 
     def reload(self):
         transfer = Transfer.objects.get(uuid=self.UUID)
-        self.currentPath = transfer.currentlocation
+        self.setModel(transfer, transfer.currentlocation)
 
     def getReplacementDic(self, target):
         ret = ReplacementDict.frommodel(
             type_='transfer',
-            sip=self.UUID
+            sip=self.model or self.UUID
         )
         ret["%unitType%"] = self.unitType
         return ret
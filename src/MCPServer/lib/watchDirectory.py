@@ -21,8 +21,12 @@
 # @subpackage MCPServer
 # @author Joseph Perry <joseph@artefactual.com>
 # @thanks to http://timgolden.me.uk/python/win32_how_do_i/watch_directory_for_changes.html
+import ctypes
+import ctypes.util
+import errno
 import logging
 import os
+import select
 import time
 import threading
 
@@ -33,9 +37,102 @@ from utils import log_exceptions
 
 LOGGER = logging.getLogger('archivematica.mcp.server')
 
+# Values from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+METHOD_INOTIFY = 'inotify'
+METHOD_POLL = 'poll'
+
+_libc = None
+
+
+def _get_libc():
+    """Return the C library if it provides inotify, None otherwise."""
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+        except (OSError, AttributeError):
+            libc = False
+        _libc = libc
+    return _libc or None
+
+
+class Inotify(object):
+    """
+    Minimal inotify(7) binding: tells when something changed in a directory,
+    without reporting what. The directory is listed again anyway to find the
+    added entries, so the events themselves are only read and discarded.
+    """
+
+    def __init__(self, directory, mask=WATCH_MASK):
+        libc = _get_libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if libc.inotify_add_watch(self.fd, unicodeToStr(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err))
+
+    def _drain(self):
+        """Discard the pending events; returns True if there were any."""
+        drained = False
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    return drained
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return drained
+                raise
+            drained = True
+
+    def wait(self, timeout):
+        """
+        Block until an event is received or ``timeout`` seconds have passed.
+        Returns True if events were received.
+        """
+        try:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return False
+            raise
+        return bool(readable) and self._drain()
+
+    def close(self):
+        os.close(self.fd)
+
 
 class archivematicaWatchDirectory:
-    """Watches for new files/directories to process in a watched directory. Directories are defined in the WatchedDirectoriesTable."""
+    """Watches for new files/directories to process in a watched directory. Directories are defined in the WatchedDirectoriesTable.
+
+    The directory is listed again whenever it may have changed: every
+    ``interval`` seconds with the "poll" method, or when inotify reports a
+    change with the "inotify" method. inotify is not told about changes made
+    from other NFS clients, so with it the directory is also listed every
+    ``rescan_interval`` seconds. Entries are only reported once they have not
+    changed for ``settle_delay`` seconds, so that a directory being copied
+    into the watched directory is not picked up half-written. This walks the
+    whole tree of the new directories, so should only be used where they
+    are copied rather than renamed into the watched directory.
+    """
 
     def __init__(self, directory,
                  variablesAdded=None,
@@ -45,7 +142,10 @@ class archivematicaWatchDirectory:
                  alertOnDirectories=True,
                  alertOnFiles=True,
                  interval=1,
-                 threaded=True):
+                 threaded=True,
+                 method=METHOD_POLL,
+                 settle_delay=0,
+                 rescan_interval=60):
         self.run = False
         self.variablesAdded = variablesAdded
         self.callBackFunctionAdded = callBackFunctionAdded
@@ -55,6 +155,10 @@ class archivematicaWatchDirectory:
         self.alertOnDirectories = alertOnDirectories
         self.alertOnFiles = alertOnFiles
         self.interval = interval
+        self.method = method
+        self.settle_delay = settle_delay
+        self.rescan_interval = rescan_interval
+        self.inotify = None
 
         if not os.path.isdir(directory):
             os.makedirs(directory, mode=770)
@@ -66,31 +170,108 @@ class archivematicaWatchDirectory:
         else:
             self.start()
 
+    def _start_inotify(self):
+        if self.method != METHOD_INOTIFY:
+            return
+        try:
+            self.inotify = Inotify(self.directory)
+        except OSError as e:
+            # E.g. inotify is unavailable, or the max_user_watches or
+            # max_user_instances limits were reached
+            LOGGER.warning('Unable to watch %s with inotify (%s); polling it every %s seconds instead',
+                           self.directory, e, self.interval)
+
+    def wait(self, timeout=None):
+        """
+        Wait until the directory may have changed, or at most ``timeout``
+        seconds if given.
+        """
+        if self.inotify is None:
+            time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+            return
+        if timeout is not None:
+            # Entries are settling: their signature is checked on time
+            # whatever happens in the directory meanwhile
+            self.inotify.wait(timeout)
+            return
+        if not self.inotify.wait(self.rescan_interval):
+            return
+        # Coalesce bursts of events, e.g. a directory copied file by file,
+        # into a single listing, without reacting later than polling would
+        deadline = time.time() + self.interval
+        while self.run and self.settle_delay and time.time() < deadline:
+            if not self.inotify.wait(min(self.settle_delay, deadline - time.time())):
+                break
+
+    def _signature(self, path):
+        """
+        Stat data changing when an entry is written to. For a directory, it
+        covers everything in it, so that writes to nested files and
+        directories keep it unsettled.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        signature = [st.st_mtime, st.st_size, 0]
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for name in dirnames + filenames:
+                    try:
+                        st = os.lstat(os.path.join(dirpath, name))
+                    except OSError:
+                        # Removed meanwhile: the entry is still changing
+                        continue
+                    signature[0] = max(signature[0], st.st_mtime)
+                    signature[1] += st.st_size
+                    signature[2] += 1
+        return tuple(signature)
+
     @log_exceptions
     @auto_close_db
     def start(self):
         """Based on polling example: http://timgolden.me.uk/python/win32_how_do_i/watch_directory_for_changes.html"""
         self.run = True
-        LOGGER.info('Watching directory %s (Files: %s)', self.directory, self.alertOnFiles)
-        before = dict([(f, None) for f in os.listdir(self.directory)])
+        self._start_inotify()
+        LOGGER.info('Watching directory %s (Files: %s, inotify: %s)', self.directory, self.alertOnFiles, self.inotify is not None)
+        directory = unicodeToStr(self.directory)
+        before = set(os.listdir(self.directory))
+        # Added entries waiting to settle: their last signature and since
+        # when it has not changed
+        unsettled = {}
         while self.run:
-            time.sleep(self.interval)
-            after = dict([(f, None) for f in os.listdir(self.directory)])
+            now = time.time()
+            timeout = None
+            if unsettled:
+                timeout = max(0, min(since for _, since in unsettled.values()) + self.settle_delay - now)
+            self.wait(timeout)
+            after = set(os.listdir(self.directory))
             added = [f for f in after if f not in before]
             removed = [f for f in before if f not in after]
             if added:
                 LOGGER.debug('Added %s', added)
                 for i in added:
-                    i = unicodeToStr(i)
-                    directory = unicodeToStr(self.directory)
-                    self.event(os.path.join(directory, i), self.variablesAdded, self.callBackFunctionAdded)
+                    unsettled[unicodeToStr(i)] = (None, None)
+            now = time.time()
+            for i, (signature, since) in list(unsettled.items()):
+                path = os.path.join(directory, i)
+                current = self._signature(path)
+                if current is None:
+                    del unsettled[i]
+                elif current != signature and self.settle_delay:
+                    unsettled[i] = (current, now)
+                elif not self.settle_delay or now - since >= self.settle_delay:
+                    del unsettled[i]
+                    self.event(path, self.variablesAdded, self.callBackFunctionAdded)
             if removed:
                 LOGGER.debug('Removed %s', removed)
                 for i in removed:
                     i = unicodeToStr(i)
-                    directory = unicodeToStr(self.directory)
                     self.event(os.path.join(directory, i), self.variablesRemoved, self.callBackFunctionRemoved)
             before = after
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
 
     def event(self, path, variables, function):
         if not function:
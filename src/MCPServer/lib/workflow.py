@@ -0,0 +1,171 @@
+#!/usr/bin/env python2
+
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+# @package Archivematica
+# @subpackage MCPServer
+
+"""
+In-memory copy of the workflow: the chains, links, exit codes, choices and
+task configurations that the chain engine follows.
+
+The workflow does not change while MCPServer runs, so it is loaded from the
+database once, the first time it is needed, instead of for every link of
+every unit. ``get_workflow`` returns the current ``Workflow``, which must be
+treated as read-only, and ``reload_workflow`` replaces it with a fresh copy,
+e.g. after the workflow tables have been changed. Links already running keep
+the copy they started with.
+"""
+
+import collections
+import logging
+import threading
+
+from main.models import (
+    MicroServiceChain,
+    MicroServiceChainChoice,
+    MicroServiceChainLink,
+    MicroServiceChainLinkExitCode,
+    MicroServiceChoiceReplacementDic,
+    StandardTaskConfig,
+    TaskConfigAssignMagicLink,
+    TaskConfigSetUnitVariable,
+    TaskConfigUnitVariableLinkPull,
+)
+
+LOGGER = logging.getLogger('archivematica.mcp.server')
+
+
+def _get(rows, model, pk):
+    """Return ``rows[pk]``, raising model.DoesNotExist like ``objects.get``."""
+    try:
+        return rows[str(pk)]
+    except KeyError:
+        raise model.DoesNotExist('{} {} does not exist'.format(model.__name__, pk))
+
+
+class Workflow(object):
+    """The workflow tables, loaded with one query each."""
+
+    def __init__(self):
+        self._chains = {c.id: c for c in MicroServiceChain.objects.all()}
+        self._links = {l.id: l for l in MicroServiceChainLink.objects.select_related('currenttask')}
+
+        # Exit codes listed more than once for a link are ambiguous and
+        # lead to the default next link
+        self._exit_codes = {}
+        for exit_code in MicroServiceChainLinkExitCode.objects.all():
+            key = (exit_code.microservicechainlink_id, exit_code.exitcode)
+            self._exit_codes[key] = None if key in self._exit_codes else exit_code
+
+        self._chain_choices = collections.defaultdict(list)
+        for choice in MicroServiceChainChoice.objects.order_by('pk'):
+            # Set the related objects that are used from the cache
+            if choice.chainavailable_id in self._chains:
+                choice.chainavailable = self._chains[choice.chainavailable_id]
+            if choice.choiceavailableatlink_id in self._links:
+                choice.choiceavailableatlink = self._links[choice.choiceavailableatlink_id]
+            self._chain_choices[choice.choiceavailableatlink_id].append(choice)
+
+        self._replacement_dics = {}
+        self._replacement_dic_choices = collections.defaultdict(list)
+        for dic in MicroServiceChoiceReplacementDic.objects.order_by('pk'):
+            self._replacement_dics[dic.id] = dic
+            self._replacement_dic_choices[dic.choiceavailableatlink_id].append(dic)
+
+        self._standard_task_configs = {c.id: c for c in StandardTaskConfig.objects.all()}
+        self._assign_magic_link_configs = {c.id: c for c in TaskConfigAssignMagicLink.objects.all()}
+        self._set_unit_variable_configs = {c.id: c for c in TaskConfigSetUnitVariable.objects.all()}
+        self._unit_variable_link_pull_configs = {c.id: c for c in TaskConfigUnitVariableLinkPull.objects.all()}
+
+    def chain(self, pk):
+        return _get(self._chains, MicroServiceChain, pk)
+
+    def link(self, pk):
+        """Return the MicroServiceChainLink ``pk``, with its currenttask."""
+        return _get(self._links, MicroServiceChainLink, pk)
+
+    def exit_code(self, link_pk, exit_code):
+        """
+        Return the MicroServiceChainLinkExitCode of a link for an exit code,
+        or None if there is none or it is ambiguous.
+        """
+        try:
+            exit_code = int(exit_code)
+        except (TypeError, ValueError):
+            return None
+        return self._exit_codes.get((str(link_pk), exit_code))
+
+    def chain_choices(self, link_pk):
+        """Return the MicroServiceChainChoices available at a link."""
+        return list(self._chain_choices.get(str(link_pk), []))
+
+    def replacement_dic(self, pk):
+        return _get(self._replacement_dics, MicroServiceChoiceReplacementDic, pk)
+
+    def replacement_dic_choices(self, link_pk):
+        """Return the MicroServiceChoiceReplacementDics available at a link."""
+        return list(self._replacement_dic_choices.get(str(link_pk), []))
+
+    def standard_task_config(self, pk):
+        return _get(self._standard_task_configs, StandardTaskConfig, pk)
+
+    def assign_magic_link_config(self, pk):
+        return _get(self._assign_magic_link_configs, TaskConfigAssignMagicLink, pk)
+
+    def set_unit_variable_config(self, pk):
+        return _get(self._set_unit_variable_configs, TaskConfigSetUnitVariable, pk)
+
+    def unit_variable_link_pull_config(self, pk):
+        return _get(self._unit_variable_link_pull_configs, TaskConfigUnitVariableLinkPull, pk)
+
+    def stats(self):
+        """Return the number of rows of each kind, for logging."""
+        return {
+            'chains': len(self._chains),
+            'links': len(self._links),
+            'exit_codes': len(self._exit_codes),
+            'standard_task_configs': len(self._standard_task_configs),
+        }
+
+
+_workflow = None
+_workflow_lock = threading.Lock()
+
+
+def get_workflow():
+    """Return the current Workflow, loading it the first time."""
+    if _workflow is None:
+        with _workflow_lock:
+            if _workflow is None:
+                _load()
+    return _workflow
+
+
+def reload_workflow():
+    """Load the workflow from the database again, and return it."""
+    with _workflow_lock:
+        return _load()
+
+
+def _load():
+    global _workflow
+    workflow = Workflow()
+    _workflow = workflow
+    LOGGER.info('Workflow loaded: %s', workflow.stats())
+    return workflow
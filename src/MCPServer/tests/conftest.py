@@ -0,0 +1,18 @@
+import os
+import sys
+
+from django.conf import settings
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(THIS_DIR, '../lib')))
+
+# MCPServer settings read when its modules are imported; the tests run with
+# the settings of the dashboard
+settings.GEARMAN_SERVER = 'localhost:4730'
+settings.LIMIT_TASK_THREADS = 75
+settings.LIMIT_UNIT_THREADS = 8
+settings.MAX_PENDING_TASKS = 1000
+settings.TASK_JOURNAL_BATCH_SIZE = 100
+settings.TASK_JOURNAL_FLUSH_INTERVAL = 5
+settings.TASK_OUTPUT_SPOOL_THRESHOLD = 0
+settings.TASK_OUTPUT_PREVIEW_SIZE = 4096
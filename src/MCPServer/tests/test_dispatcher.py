@@ -0,0 +1,63 @@
+from gearman.constants import JOB_PENDING, JOB_UNKNOWN
+import gearman.errors
+
+import dispatcher
+
+
+class FakeClient(object):
+    """Accepts ``accepted`` requests, then finds the server unavailable."""
+
+    def __init__(self, accepted):
+        self.accepted = accepted
+        self.submitted = []
+
+    def submit_multiple_requests(self, requests, wait_until_complete, poll_timeout):
+        for request in requests:
+            if request.state != JOB_UNKNOWN:
+                continue
+            if len(self.submitted) == self.accepted:
+                raise gearman.errors.ServerUnavailable('Found no valid connections')
+            request.connection_attempts += 1
+            request.state = JOB_PENDING
+            self.submitted.append(request.gearman_job.unique)
+        return requests
+
+
+def test_send_retries_only_unsent_jobs():
+    d = dispatcher.Dispatcher(['localhost:4730'], max_in_flight=10)
+    d._started = True
+    for i in range(5):
+        d.submit('task', {'number': i}, 'unique-%d' % i, callback=None)
+    client = FakeClient(accepted=2)
+    in_flight = {}
+
+    queued = list(d._queue)
+    d._queue.clear()
+    assert d._send(client, queued, in_flight, log_errors=False) is False
+    assert sorted(request.gearman_job.unique for request in in_flight) == ['unique-0', 'unique-1']
+    assert [request.gearman_job.unique for request, _ in d._queue] == ['unique-2', 'unique-3', 'unique-4']
+
+    client.accepted = 5
+    queued = list(d._queue)
+    d._queue.clear()
+    assert d._send(client, queued, in_flight) is True
+    assert client.submitted == ['unique-0', 'unique-1', 'unique-2', 'unique-3', 'unique-4']
+    assert len(in_flight) == 5
+    assert not d._queue
+    assert d.stats()['sent'] == 5
+
+
+def test_send_does_not_resend_lost_jobs():
+    d = dispatcher.Dispatcher(['localhost:4730'], max_in_flight=10)
+    d._started = True
+    d.submit('task', {}, 'lost', callback=None)
+    queued = list(d._queue)
+    d._queue.clear()
+    request = queued[0][0]
+    # Sent, then its connection was lost before the job was accepted
+    request.connection_attempts = 1
+
+    in_flight = {}
+    assert d._send(FakeClient(accepted=0), queued, in_flight, log_errors=False) is False
+    assert list(in_flight) == [request]
+    assert not d._queue
@@ -0,0 +1,89 @@
+# -*- coding: utf8
+from django.test import TestCase
+from django.utils import timezone
+
+import databaseFunctions
+import journal
+from main import models
+
+JOB_UUID = '2b5e2f3a-7b0e-4d6a-9d3b-5c1f0e8a9b7c'
+
+
+def task_uuid(i):
+    return '00000000-0000-0000-0000-%012d' % i
+
+
+class TestTaskJournal(TestCase):
+
+    def setUp(self):
+        models.Job.objects.create(jobuuid=JOB_UUID, createdtime=timezone.now(), sipuuid='unit')
+        models.Task.objects.bulk_create(
+            models.Task(taskuuid=task_uuid(i), job_id=JOB_UUID, createdtime=timezone.now())
+            for i in range(12))
+
+    def completed_task(self, i, **fields):
+        values = dict(taskuuid=task_uuid(i), endtime=timezone.now(), exitcode=i % 2,
+                      stdout=u'output %d' % i, stderror=u'', stdout_digest='', stderror_digest='')
+        values.update(fields)
+        return models.Task(**values)
+
+    def test_every_task_is_updated(self):
+        task_journal = journal.TaskJournal(batch_size=5, flush_interval=60)
+        for i in range(12):
+            task_journal.completed(self.completed_task(i))
+        task_journal.flush()
+
+        for task in models.Task.objects.all():
+            i = int(task.taskuuid[-12:])
+            assert task.exitcode == i % 2
+            assert task.stdout == u'output %d' % i
+            assert task.endtime is not None
+
+    def test_failed_flush_is_retried(self):
+        task_journal = journal.TaskJournal(batch_size=5, flush_interval=60)
+        # Flushed by the test rather than by the journal thread
+        task_journal._started = True
+        for i in range(12):
+            task_journal.completed(self.completed_task(i))
+
+        update_tasks = journal._update_tasks
+        closed = []
+
+        def fail_third_batch(tasks):
+            if tasks[0].taskuuid == task_uuid(10):
+                raise Exception('MySQL server has gone away')
+            update_tasks(tasks)
+
+        def close_old_connections():
+            closed.append(True)
+
+        self.addCleanup(setattr, journal, '_update_tasks', update_tasks)
+        self.addCleanup(setattr, databaseFunctions, 'close_old_connections',
+                        databaseFunctions.close_old_connections)
+        journal._update_tasks = fail_third_batch
+        databaseFunctions.close_old_connections = close_old_connections
+
+        # The error is logged, and the connection closed if unusable
+        task_journal._flush_pending()
+        assert closed == [True]
+        assert models.Task.objects.filter(exitcode__isnull=False).count() == 10
+        # Only the tasks that were not written are kept
+        assert [task.taskuuid for task in task_journal._completed] == [task_uuid(10), task_uuid(11)]
+
+        journal._update_tasks = update_tasks
+        task_journal._flush_pending()
+        assert closed == [True, True]
+        assert models.Task.objects.filter(exitcode__isnull=False).count() == 12
+        assert task_journal._completed == []
+
+    def test_updates_are_bounded(self):
+        tasks = [self.completed_task(i, stderror=u'é' * 10) for i in range(12)]
+        batches = list(journal._update_batches(tasks, max_rows=5, max_bytes=1000))
+        assert [len(batch) for batch in batches] == [5, 5, 2]
+        # 28 or 29 bytes of output per task
+        batches = list(journal._update_batches(tasks, max_rows=5, max_bytes=60))
+        assert [len(batch) for batch in batches] == [2, 2, 2, 2, 2, 2]
+        # Tasks with more output than that are updated alone
+        batches = list(journal._update_batches(tasks, max_rows=5, max_bytes=10))
+        assert [len(batch) for batch in batches] == [1] * 12
+        assert [task for batch in batches for task in batch] == tasks
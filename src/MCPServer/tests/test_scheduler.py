@@ -0,0 +1,118 @@
+import threading
+import time
+
+import scheduler
+
+TIMEOUT = 5
+
+
+class BlockedExecutor(object):
+    """An executor with one worker, kept busy until ``release`` is called."""
+
+    def __init__(self):
+        self.executor = scheduler.Executor('test', 1)
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.executor.submit(self._block)
+        assert self.started.wait(TIMEOUT)
+
+    def _block(self):
+        self.started.set()
+        self.released.wait(TIMEOUT)
+
+    def release(self):
+        self.released.set()
+
+
+def wait_for_completion(executor, completed):
+    """Wait until ``completed`` calls have returned."""
+    deadline = time.time() + TIMEOUT
+    while executor.stats()['completed'] < completed and time.time() < deadline:
+        time.sleep(0.01)
+    assert executor.stats()['completed'] == completed
+
+
+def test_priority_then_submission_order():
+    blocked = BlockedExecutor()
+    executor = blocked.executor
+    calls = []
+    executor.submit(calls.append, args=('first',))
+    executor.submit(calls.append, args=('second',))
+    executor.submit(calls.append, args=('urgent',), priority=scheduler.PRIORITY_HIGH)
+    executor.submit(calls.append, args=('third',))
+    assert executor.pending() == 4
+    blocked.release()
+
+    wait_for_completion(executor, 5)
+    assert calls == ['urgent', 'first', 'second', 'third']
+
+
+def test_exceptions_do_not_stop_workers():
+    executor = scheduler.Executor('test', 1)
+    calls = []
+    executor.submit(lambda: 1 / 0)
+    executor.submit(calls.append, args=('after',))
+
+    wait_for_completion(executor, 2)
+    assert calls == ['after']
+
+
+def test_empty_executor():
+    executor = scheduler.Executor('test', 2)
+    assert executor.pending() == 0
+    # Returns at once, without starting the workers
+    executor.wait_for_capacity(1)
+    assert executor.stats() == {
+        'name': 'test',
+        'workers': 2,
+        'busy': 0,
+        'pending': 0,
+        'submitted': 0,
+        'completed': 0,
+        'average_wait': 0.0,
+        'max_wait': 0.0,
+    }
+    assert not executor._started
+
+
+def test_wait_for_capacity_until_calls_start():
+    blocked = BlockedExecutor()
+    executor = blocked.executor
+    executor.submit(lambda: None)
+    executor.submit(lambda: None)
+
+    waited = threading.Event()
+
+    def wait():
+        executor.wait_for_capacity(2)
+        waited.set()
+
+    t = threading.Thread(target=wait)
+    t.daemon = True
+    t.start()
+    assert not waited.wait(0.1)
+    blocked.release()
+    assert waited.wait(TIMEOUT)
+
+
+def test_units_wait_for_pending_tasks(monkeypatch, settings):
+    blocked = BlockedExecutor()
+    unit_executor = scheduler.Executor('unit', 1)
+    monkeypatch.setattr(scheduler, 'task_executor', blocked.executor)
+    monkeypatch.setattr(scheduler, 'unit_executor', unit_executor)
+    settings.MAX_PENDING_TASKS = 1
+    scheduler.submit_task(lambda: None)
+
+    units = []
+    t = threading.Thread(target=scheduler.submit_unit, args=(units.append,), kwargs={'args': ('unit',)})
+    t.daemon = True
+    t.start()
+    t.join(0.1)
+    assert t.is_alive()
+    assert unit_executor.stats()['submitted'] == 0
+
+    blocked.release()
+    t.join(TIMEOUT)
+    assert not t.is_alive()
+    wait_for_completion(unit_executor, 1)
+    assert units == ['unit']
@@ -0,0 +1,110 @@
+import os
+
+from django.test import TestCase
+import pytest
+
+import dicts
+from dicts import ReplacementDict
+from main import models
+from unitSIP import unitSIP
+from unitTransfer import unitTransfer
+
+TRANSFER_UUID = '9b7a4a8e-45fa-4a1f-8ad6-6b0b1f1e2e6c'
+SIP_UUID = 'c8d4f2b1-3e5a-4f6b-9c7d-8e9f0a1b2c3d'
+FILE_UUIDS = ['f0000000-0000-0000-0000-000000000001', 'f0000000-0000-0000-0000-000000000002']
+
+
+class UnitTestCase(object):
+    """Files of a unit on disk and in the database."""
+
+    @pytest.fixture(autouse=True)
+    def shared_directory(self, tmpdir, settings):
+        self.shared_path = str(tmpdir) + '/'
+        settings.SHARED_DIRECTORY = self.shared_path
+        dicts.setup(shared_directory=self.shared_path,
+                    processing_directory=None, watch_directory=None, rejected_directory=None)
+
+    def create_files(self, unit_path, path_string, **unit):
+        unit_dir = unit_path.replace('%sharedPath%', self.shared_path, 1)
+        os.makedirs(os.path.join(unit_dir, 'objects', 'sub'))
+        for file_uuid, name in zip(FILE_UUIDS, ('objects/a.txt', 'objects/sub/b.txt')):
+            with open(os.path.join(unit_dir, name), 'w') as f:
+                f.write(name)
+            models.File.objects.create(
+                uuid=file_uuid, originallocation='%transferDirectory%' + name,
+                currentlocation=path_string + name, filegrpuse='original', **unit)
+
+    def assert_file_dicts_match_queries(self, unit):
+        file_units = {f.UUID: f for f in unit.fileList.values()}
+        assert sorted(file_units) == FILE_UUIDS
+        # Built from the rows already loaded
+        with self.assertNumQueries(0):
+            rds = {file_uuid: f.getReplacementDic() for file_uuid, f in file_units.items()}
+        for file_uuid, rd in rds.items():
+            assert rd == ReplacementDict.frommodel(type_='file', file_=file_uuid)
+
+    def load(self, unit):
+        # Like jobChainLink at the start of a link over every file
+        unit.reload()
+        unit.reloadFileList()
+
+    def test_moved_and_removed_files(self):
+        unit = self.unit()
+        self.load(unit)
+        moved = models.File.objects.get(uuid=FILE_UUIDS[0])
+        moved.currentlocation = moved.currentlocation.replace('a.txt', 'c.txt')
+        moved.save()
+        models.File.objects.filter(uuid=FILE_UUIDS[1]).delete()
+
+        # At the next link, the rows loaded before are not used anymore
+        unit.reload()
+        rd = unit.getFileReplacementDic(FILE_UUIDS[0])
+        assert rd == ReplacementDict.frommodel(type_='file', file_=FILE_UUIDS[0])
+        assert rd['%fileName%'] == 'c'
+        with pytest.raises(models.File.DoesNotExist):
+            unit.getFileReplacementDic(FILE_UUIDS[1])
+
+
+class TestTransfer(UnitTestCase, TestCase):
+
+    def unit(self):
+        path = '%sharedPath%currentlyProcessing/transfer-' + TRANSFER_UUID + '/'
+        transfer = models.Transfer.objects.create(uuid=TRANSFER_UUID, currentlocation=path)
+        self.create_files(path, '%transferDirectory%', transfer=transfer)
+        return unitTransfer(path, TRANSFER_UUID)
+
+    def test_file_dicts(self):
+        unit = self.unit()
+        self.load(unit)
+        self.assert_file_dicts_match_queries(unit)
+        rd = unit.getReplacementDic(unit.currentPath)
+        assert rd['%SIPUUID%'] == TRANSFER_UUID
+        assert rd['%unitType%'] == 'Transfer'
+
+    def test_moved_transfer(self):
+        unit = self.unit()
+        self.load(unit)
+        moved = '%sharedPath%currentlyProcessing/moved-' + TRANSFER_UUID + '/'
+        os.rename(unit.currentPath.replace('%sharedPath%', self.shared_path, 1),
+                  moved.replace('%sharedPath%', self.shared_path, 1))
+        unit.updateLocation(moved)
+        self.load(unit)
+        self.assert_file_dicts_match_queries(unit)
+        assert unit.getReplacementDic(unit.currentPath)['%SIPDirectory%'] == moved.replace('%sharedPath%', self.shared_path, 1)
+
+
+class TestSIP(UnitTestCase, TestCase):
+
+    def unit(self):
+        path = '%sharedPath%currentlyProcessing/sip-' + SIP_UUID + '/'
+        sip = models.SIP.objects.create(uuid=SIP_UUID, currentpath=path)
+        self.create_files(path, '%SIPDirectory%', sip=sip)
+        return unitSIP(path, SIP_UUID)
+
+    def test_file_dicts(self):
+        unit = self.unit()
+        self.load(unit)
+        self.assert_file_dicts_match_queries(unit)
+        rd = unit.getReplacementDic(unit.currentPath)
+        assert rd['%SIPUUID%'] == SIP_UUID
+        assert rd['%unitType%'] == 'SIP'
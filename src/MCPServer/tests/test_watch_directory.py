@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+import pytest
+
+import watchDirectory
+
+TIMEOUT = 5
+
+
+class Watcher(object):
+    """Watches a directory, recording the paths added to it."""
+
+    def __init__(self, directory, **kwargs):
+        self.added = []
+        self.event = threading.Event()
+        kwargs.setdefault('interval', 0.05)
+        self.watcher = watchDirectory.archivematicaWatchDirectory(
+            directory, callBackFunctionAdded=self._added, **kwargs)
+        deadline = time.time() + TIMEOUT
+        while not self.watcher.run and time.time() < deadline:
+            time.sleep(0.01)
+        # Entries found by the first listing are not reported
+        time.sleep(0.1)
+
+    def _added(self, path, variables):
+        self.added.append(path)
+        self.event.set()
+
+    def wait(self, timeout=TIMEOUT):
+        return self.event.wait(timeout)
+
+    def stop(self):
+        self.watcher.stop()
+
+
+@pytest.fixture
+def watched(tmpdir):
+    return str(tmpdir.mkdir('watched'))
+
+
+def test_poll(watched):
+    watcher = Watcher(watched, method=watchDirectory.METHOD_POLL)
+    try:
+        assert watcher.watcher.inotify is None
+        os.mkdir(os.path.join(watched, 'transfer'))
+        assert watcher.wait()
+        assert watcher.added == [os.path.join(watched, 'transfer')]
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.skipif(watchDirectory._get_libc() is None, reason='inotify is not available')
+def test_inotify(watched):
+    # Found on the inotify event, long before the next listing
+    watcher = Watcher(watched, method=watchDirectory.METHOD_INOTIFY, interval=60, rescan_interval=60)
+    try:
+        assert watcher.watcher.inotify is not None
+        os.mkdir(os.path.join(watched, 'transfer'))
+        assert watcher.wait()
+        assert watcher.added == [os.path.join(watched, 'transfer')]
+    finally:
+        watcher.stop()
+
+
+def test_poll_without_inotify(watched, monkeypatch):
+    def unavailable(directory):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(watchDirectory, 'Inotify', unavailable)
+
+    watcher = Watcher(watched, method=watchDirectory.METHOD_INOTIFY, rescan_interval=60)
+    try:
+        assert watcher.watcher.inotify is None
+        os.mkdir(os.path.join(watched, 'transfer'))
+        assert watcher.wait()
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.parametrize('method', [watchDirectory.METHOD_POLL, watchDirectory.METHOD_INOTIFY])
+def test_entries_settle(watched, method):
+    watcher = Watcher(watched, method=method, settle_delay=0.3, rescan_interval=60)
+    try:
+        transfer = os.path.join(watched, 'transfer')
+        os.makedirs(os.path.join(transfer, 'objects'))
+        # Written to for longer than the settle delay, deep in the tree
+        with open(os.path.join(transfer, 'objects', 'file'), 'w') as f:
+            for _ in range(6):
+                f.write('content' * 1000)
+                f.flush()
+                written = time.time()
+                assert not watcher.wait(0.1)
+
+        assert watcher.wait()
+        assert time.time() - written >= 0.3
+        assert watcher.added == [transfer]
+    finally:
+        watcher.stop()
+
+
+def test_removed_before_settling(watched):
+    watcher = Watcher(watched, method=watchDirectory.METHOD_POLL, settle_delay=0.2)
+    try:
+        os.mkdir(os.path.join(watched, 'partial'))
+        time.sleep(0.1)
+        os.rmdir(os.path.join(watched, 'partial'))
+        os.mkdir(os.path.join(watched, 'transfer'))
+        assert watcher.wait()
+        assert watcher.added == [os.path.join(watched, 'transfer')]
+    finally:
+        watcher.stop()
@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+import workflow
+from main import models
+
+# Links of the workflow loaded by the migrations: "Parse external METS", at
+# the end of a transfer, and the link it leads to
+PARSE_EXTERNAL_METS = '675acd22-828d-4949-adc7-1888240f5e3d'
+CREATE_TRANSFER_METADATA_XML = 'db99ab43-04d7-44ab-89ec-e09d7bbdc39d'
+
+
+class TestWorkflow(TestCase):
+
+    def setUp(self):
+        self.workflow = workflow.Workflow()
+
+    def test_links_follow_their_rows(self):
+        link = self.workflow.link(PARSE_EXTERNAL_METS)
+        assert link.currenttask.description == 'Parse external METS'
+        assert link.defaultnextchainlink_id == CREATE_TRANSFER_METADATA_XML
+        stc = self.workflow.standard_task_config(link.currenttask.tasktypepkreference)
+        assert stc.execute == 'parseExternalMETS'
+        exit_code = self.workflow.exit_code(PARSE_EXTERNAL_METS, 0)
+        assert exit_code.nextmicroservicechainlink_id == CREATE_TRANSFER_METADATA_XML
+        # Exit codes are given as strings by the clients
+        assert self.workflow.exit_code(PARSE_EXTERNAL_METS, '0') == exit_code
+        assert self.workflow.exit_code(PARSE_EXTERNAL_METS, 1) is None
+        assert self.workflow.exit_code(PARSE_EXTERNAL_METS, 'error') is None
+
+    def test_every_transition_matches_the_database(self):
+        links = models.MicroServiceChainLink.objects.all()
+        assert links
+        for link in links:
+            cached = self.workflow.link(link.pk)
+            assert cached.currenttask_id == link.currenttask_id
+            assert cached.defaultnextchainlink_id == link.defaultnextchainlink_id
+        for row in models.MicroServiceChainLinkExitCode.objects.all():
+            rows = models.MicroServiceChainLinkExitCode.objects.filter(
+                microservicechainlink_id=row.microservicechainlink_id, exitcode=row.exitcode)
+            exit_code = self.workflow.exit_code(row.microservicechainlink_id, row.exitcode)
+            if rows.count() == 1:
+                assert exit_code.nextmicroservicechainlink_id == row.nextmicroservicechainlink_id
+            else:
+                assert exit_code is None
+
+    def test_choices_follow_their_rows(self):
+        choice = models.MicroServiceChainChoice.objects.order_by('pk').first()
+        link_pk = choice.choiceavailableatlink_id
+        expected = list(models.MicroServiceChainChoice.objects.filter(
+            choiceavailableatlink_id=link_pk).order_by('pk'))
+        with self.assertNumQueries(0):
+            choices = self.workflow.chain_choices(link_pk)
+            chains = [c.chainavailable.description for c in choices]
+        assert choices == expected
+        assert chains == [c.chainavailable.description for c in expected]
+
+    def test_missing_rows(self):
+        with self.assertRaises(models.MicroServiceChainLink.DoesNotExist):
+            self.workflow.link('00000000-0000-0000-0000-000000000000')
+        with self.assertRaises(models.StandardTaskConfig.DoesNotExist):
+            self.workflow.standard_task_config('00000000-0000-0000-0000-000000000000')
+        assert self.workflow.chain_choices('00000000-0000-0000-0000-000000000000') == []
+
+    def test_reload(self):
+        # Loaded again by the next test needing it
+        self.addCleanup(setattr, workflow, '_workflow', None)
+        current = workflow.get_workflow()
+        assert workflow.get_workflow() is current
+        models.MicroServiceChainLink.objects.filter(id=PARSE_EXTERNAL_METS).update(defaultnextchainlink=None)
+        assert current.link(PARSE_EXTERNAL_METS).defaultnextchainlink_id == CREATE_TRANSFER_METADATA_XML
+
+        reloaded = workflow.reload_workflow()
+        assert workflow.get_workflow() is reloaded
+        assert reloaded.link(PARSE_EXTERNAL_METS).defaultnextchainlink_id is None
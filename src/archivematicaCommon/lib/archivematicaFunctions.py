@@ -23,7 +23,6 @@
 
 from __future__ import print_function
 import collections
-import hashlib
 import locale
 import os
 import pprint
@@ -33,6 +32,7 @@ from uuid import uuid4
 from lxml import etree
 
 from main.models import DashboardSetting
+import hashing
 from namespaces import NSMAP
 
 
@@ -163,20 +163,11 @@ def get_file_checksum(filename, algorithm='sha256'):
     """
     Perform a checksum on the specified file.
 
-    This function reads in files incrementally to avoid memory exhaustion.
-    See: http://stackoverflow.com/questions/1131220/get-md5-hash-of-a-files-without-open-it-in-python
-
     :param filename: The path to the file we want to check
     :param algorithm: Which algorithm to use for hashing, e.g. 'md5'
     :return: Returns a checksum string for the specified file.
     """
-    h = hashlib.new(algorithm)
-
-    with open(filename, 'rb') as f:
-        for chunk in iter(lambda: f.read(1024 * h.block_size), b''):
-            h.update(chunk)
-
-    return h.hexdigest()
+    return hashing.hash_file(filename, [algorithm]).digests[algorithm]
 
 
 def find_metadata_files(sip_path, filename, only_transfers=False):
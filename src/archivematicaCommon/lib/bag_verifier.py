@@ -0,0 +1,559 @@
+# -*- coding: UTF-8 -*-
+"""
+Verification of BagIt bags in a single pass over their contents.
+
+Checking a bag with the BagIt Java tool takes one command per check
+(validity, completeness, Payload-Oxum, payload manifests and tag manifests)
+and each of them reads the whole payload again. ``verify_bag`` walks the bag
+once, reads every file once computing the digests of all its manifests at the
+same time, on a pool of threads, and returns a ``BagReport`` listing the
+problems found by each check.
+
+``verify_archive`` does the same for a bag in a tar or 7z archive, reading
+the members of the archive as they are decompressed instead of extracting
+them to disk.
+
+See also src/MCPClient/lib/clientScripts/verifyAIP.py and verifyBAG.py where
+this is used.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import os
+import re
+import subprocess
+import tarfile
+import urllib
+from multiprocessing.pool import ThreadPool
+
+import hashing
+
+DATA_DIRECTORY = 'data'
+BAGIT_TXT = 'bagit.txt'
+BAG_INFO_TXT = 'bag-info.txt'
+
+# Files are read in chunks of this many bytes
+CHUNK_SIZE = hashing.BUFFER_SIZE
+
+# The names of the checks, in the order they are reported
+CHECK_VALID = 'valid'
+CHECK_COMPLETE = 'complete'
+CHECK_OXUM = 'payload oxum'
+CHECK_PAYLOAD_MANIFESTS = 'payload manifests'
+CHECK_TAG_MANIFESTS = 'tag manifests'
+CHECKS = (CHECK_VALID, CHECK_COMPLETE, CHECK_OXUM, CHECK_PAYLOAD_MANIFESTS, CHECK_TAG_MANIFESTS)
+
+MANIFEST_RE = re.compile(r'^(tag)?manifest-([a-z0-9]+)\.txt$')
+
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2')
+SEVENZIP_EXTENSIONS = ('.7z',)
+SEVENZIP = '7z'
+
+BagProblem = collections.namedtuple('BagProblem', 'check path message')
+
+
+class BagReport(object):
+    """
+    The outcome of the verification of a bag.
+
+    :ivar list problems: ``BagProblem`` tuples, in the order they were found.
+    :ivar list checks: The checks that were run, a subset of ``CHECKS``: the
+        Payload-Oxum and tag manifests are only checked if the bag has them.
+    :ivar list algorithms: The algorithms of the payload manifests.
+    :ivar int files: Number of payload files.
+    :ivar int bytes: Total size of the payload files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.problems = []
+        self.checks = []
+        self.algorithms = []
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, check, path, message):
+        self.problems.append(BagProblem(check, path, message))
+
+    @property
+    def valid(self):
+        return not self.problems
+
+    def failed(self, check):
+        """Return the problems found by ``check``."""
+        return [p for p in self.problems if p.check == check]
+
+    def lines(self):
+        """Describe the outcome of every check, for printing."""
+        lines = []
+        for check in self.checks:
+            problems = self.failed(check)
+            lines.append('{} test: {}'.format('Failed' if problems else 'Passed', check))
+            for problem in problems:
+                if problem.path:
+                    lines.append('  {}: {}'.format(problem.path, problem.message))
+                else:
+                    lines.append('  {}'.format(problem.message))
+        lines.append('{} payload files, {} bytes, manifests: {}'.format(
+            self.files, self.bytes, ', '.join(self.algorithms) or 'none'))
+        return lines
+
+    def __str__(self):
+        return '\n'.join(self.lines())
+
+
+def parse_tags(lines):
+    """
+    Parse the lines of a tag file like bagit.txt or bag-info.txt.
+
+    :return: OrderedDict of lists of values, keyed by label.
+    """
+    tags = collections.OrderedDict()
+    label = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        if line[0] in ' \t' and label is not None:
+            # Continuation of a long value
+            tags[label][-1] += ' ' + line.strip()
+            continue
+        label, _, value = line.partition(':')
+        label = label.strip()
+        tags.setdefault(label, []).append(value.strip())
+    return tags
+
+
+def parse_manifest(lines):
+    """
+    Parse the lines of a manifest.
+
+    :return: dict of lowercase digests keyed by path relative to the bag,
+        and list of the lines that could not be parsed.
+    """
+    entries = {}
+    invalid = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            invalid.append(line)
+            continue
+        digest, path = parts
+        # Legacy manifests may use the binary mode marker of md5sum
+        path = path.lstrip('*')
+        # Line breaks and percent signs are percent-encoded since BagIt 1.0
+        if '%' in path:
+            path = urllib.unquote(path)
+        entries[os.path.normpath(path)] = digest.lower()
+    return entries, invalid
+
+
+def hash_fileobj(f, algorithms, chunk_size=CHUNK_SIZE, threads=None):
+    """
+    Return a dict of the hex digests of what is read from ``f``, keyed by
+    algorithm, and the number of bytes read.
+    """
+    result = hashing.hash_fileobj(f, algorithms, buffer_size=chunk_size, threads=threads)
+    return result.digests, result.size
+
+
+def hash_file(path, algorithms, chunk_size=CHUNK_SIZE):
+    """Return a dict of the hex digests of ``path``, keyed by algorithm."""
+    return hashing.hash_file(path, algorithms, buffer_size=chunk_size).digests
+
+
+class BagContents(object):
+    """
+    What is needed to verify a bag: its tag files, and the size and digests
+    of its files.
+
+    The digests can be computed from any source, e.g. the members of an
+    archive, as long as they are computed for ``algorithms_for(path)``.
+    """
+
+    def __init__(self):
+        self.tag_files = {}
+        self.sizes = {}
+        self.digests = {}
+        self.has_data_directory = False
+
+    def add_tag_file(self, path, data):
+        """Keep the contents of a tag file at the root of the bag."""
+        self.tag_files[path] = data
+
+    def add_file(self, path, size, digests=None):
+        if is_payload(path):
+            self.has_data_directory = True
+        self.sizes[path] = size
+        self.digests[path] = digests or {}
+
+    def _manifests(self, tag):
+        manifests = {}
+        for name in self.tag_files:
+            match = MANIFEST_RE.match(name)
+            if match and bool(match.group(1)) == tag:
+                manifests[match.group(2)] = name
+        return manifests
+
+    def payload_manifests(self):
+        """Return the names of the payload manifests, keyed by algorithm."""
+        return self._manifests(tag=False)
+
+    def tag_manifests(self):
+        """Return the names of the tag manifests, keyed by algorithm."""
+        return self._manifests(tag=True)
+
+    def tag_manifest_entries(self):
+        entries = set()
+        for name in self.tag_manifests().values():
+            entries.update(parse_manifest(self.tag_files[name].splitlines())[0])
+        return entries
+
+    def algorithms_for(self, path, tag_manifest_entries=None):
+        """
+        Return the algorithms the digests of ``path`` must be computed for.
+        Only meaningful once the manifests have been added.
+        """
+        if is_payload(path):
+            return _supported(self.payload_manifests())
+        if tag_manifest_entries is None:
+            tag_manifest_entries = self.tag_manifest_entries()
+        if path in tag_manifest_entries:
+            return _supported(self.tag_manifests())
+        return []
+
+    def digests_of_tag_file(self, path, algorithms):
+        """Hash a tag file from the contents already read."""
+        digests = {}
+        for algorithm in algorithms:
+            digests[algorithm] = hashlib.new(algorithm, self.tag_files[path]).hexdigest()
+        return digests
+
+    def check(self, report):
+        """Run the checks on the contents, adding the problems to ``report``."""
+        payload = sorted(path for path in self.sizes if is_payload(path))
+        report.files = len(payload)
+        report.bytes = sum(self.sizes[path] for path in payload)
+        payload_manifests = self.payload_manifests()
+        tag_manifests = self.tag_manifests()
+        report.algorithms = sorted(payload_manifests)
+        report.checks = [CHECK_VALID, CHECK_COMPLETE]
+
+        # Validity of the structure of the bag
+        if BAGIT_TXT not in self.tag_files:
+            report.add(CHECK_VALID, BAGIT_TXT, 'missing bag declaration')
+        else:
+            declaration = parse_tags(self.tag_files[BAGIT_TXT].splitlines())
+            for label in ('BagIt-Version', 'Tag-File-Character-Encoding'):
+                if label not in declaration:
+                    report.add(CHECK_VALID, BAGIT_TXT, 'missing {}'.format(label))
+        if not self.has_data_directory:
+            report.add(CHECK_VALID, DATA_DIRECTORY, 'missing payload directory')
+        if not payload_manifests:
+            report.add(CHECK_VALID, None, 'no payload manifest')
+        for algorithm in sorted(set(payload_manifests) | set(tag_manifests)):
+            if not _supported([algorithm]):
+                report.add(CHECK_VALID, None, 'unsupported algorithm {}'.format(algorithm))
+
+        # Completeness and payload manifests
+        payload_entries = {}
+        for algorithm, name in sorted(payload_manifests.items()):
+            entries, invalid = parse_manifest(self.tag_files[name].splitlines())
+            for line in invalid:
+                report.add(CHECK_VALID, name, 'invalid line {!r}'.format(line))
+            payload_entries[algorithm] = entries
+        self._check_manifests(report, CHECK_PAYLOAD_MANIFESTS, payload_manifests, payload_entries)
+        listed = set()
+        for entries in payload_entries.values():
+            listed.update(entries)
+        for path in payload:
+            for algorithm, name in sorted(payload_manifests.items()):
+                if path not in payload_entries[algorithm]:
+                    report.add(CHECK_COMPLETE, path, 'not listed in {}'.format(name))
+        for path in sorted(listed):
+            if not is_payload(path):
+                report.add(CHECK_VALID, path, 'payload manifest entry outside of the payload directory')
+            elif path not in self.sizes:
+                report.add(CHECK_COMPLETE, path, 'missing from the payload')
+        report.checks.append(CHECK_PAYLOAD_MANIFESTS)
+
+        # Payload-Oxum
+        bag_info = parse_tags(self.tag_files.get(BAG_INFO_TXT, '').splitlines())
+        if 'Payload-Oxum' in bag_info:
+            report.checks.insert(2, CHECK_OXUM)
+            oxum = bag_info['Payload-Oxum'][0]
+            found = '{}.{}'.format(report.bytes, report.files)
+            if not re.match(r'^\d+\.\d+$', oxum):
+                report.add(CHECK_OXUM, BAG_INFO_TXT, 'invalid Payload-Oxum {!r}'.format(oxum))
+            elif oxum != found:
+                report.add(CHECK_OXUM, BAG_INFO_TXT, 'Payload-Oxum is {}, found {}'.format(oxum, found))
+
+        # Tag manifests
+        if tag_manifests:
+            report.checks.append(CHECK_TAG_MANIFESTS)
+            tag_entries = {}
+            for algorithm, name in sorted(tag_manifests.items()):
+                entries, invalid = parse_manifest(self.tag_files[name].splitlines())
+                for line in invalid:
+                    report.add(CHECK_VALID, name, 'invalid line {!r}'.format(line))
+                tag_entries[algorithm] = entries
+            self._check_manifests(report, CHECK_TAG_MANIFESTS, tag_manifests, tag_entries)
+        return report
+
+    def _check_manifests(self, report, check, manifests, entries_by_algorithm):
+        for algorithm in _supported(manifests):
+            name = manifests[algorithm]
+            for path, expected in sorted(entries_by_algorithm[algorithm].items()):
+                if path not in self.sizes:
+                    if check == CHECK_TAG_MANIFESTS:
+                        report.add(check, path, 'missing, listed in {}'.format(name))
+                    continue
+                found = self.digests[path].get(algorithm)
+                if found is None:
+                    report.add(check, path, '{} digest was not computed'.format(algorithm))
+                elif found != expected:
+                    report.add(check, path, '{} digest is {}, expected {} by {}'.format(algorithm, found, expected, name))
+
+
+def is_payload(path):
+    return path.startswith(DATA_DIRECTORY + os.sep)
+
+
+def _supported(algorithms):
+    """Return the algorithms hashlib provides, sorted."""
+    supported = []
+    for algorithm in sorted(algorithms):
+        try:
+            hashlib.new(algorithm)
+        except ValueError:
+            continue
+        supported.append(algorithm)
+    return supported
+
+
+def verify_bag(path, workers=4):
+    """
+    Verify the bag at ``path``.
+
+    :param str path: Path of the bag directory.
+    :param int workers: Number of threads hashing files; hashlib releases the
+        GIL while hashing so they run in parallel.
+    :return: BagReport
+    """
+    report = BagReport(path)
+    contents = BagContents()
+    files = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            relative_path = os.path.relpath(full_path, path)
+            try:
+                size = os.path.getsize(full_path)
+            except OSError as e:
+                report.add(CHECK_VALID, relative_path, 'unreadable: {}'.format(e))
+                continue
+            files.append((relative_path, full_path, size))
+            if dirpath == path:
+                with open(full_path, 'rb') as f:
+                    contents.add_tag_file(relative_path, f.read())
+    if os.path.isdir(os.path.join(path, DATA_DIRECTORY)):
+        contents.has_data_directory = True
+
+    tag_manifest_entries = contents.tag_manifest_entries()
+    algorithms = {
+        relative_path: contents.algorithms_for(relative_path, tag_manifest_entries)
+        for relative_path, _, _ in files
+    }
+
+    def hash_one(item):
+        relative_path, full_path, size = item
+        if relative_path in contents.tag_files:
+            return relative_path, size, contents.digests_of_tag_file(relative_path, algorithms[relative_path]), None
+        try:
+            return relative_path, size, hash_file(full_path, algorithms[relative_path]), None
+        except (IOError, OSError) as e:
+            return relative_path, size, {}, e
+
+    # Hash the largest files first so that one of them is not left last
+    files.sort(key=lambda item: item[2], reverse=True)
+    pool = ThreadPool(max(1, workers))
+    try:
+        for relative_path, size, digests, error in pool.imap_unordered(hash_one, files):
+            if error is not None:
+                report.add(CHECK_VALID, relative_path, 'unreadable: {}'.format(error))
+            contents.add_file(relative_path, size, digests)
+    finally:
+        pool.close()
+        pool.join()
+    return contents.check(report)
+
+
+class StreamingNotSupported(Exception):
+    """The archive cannot be verified without extracting it."""
+
+
+class _LimitedReader(object):
+    """Reads at most ``size`` bytes from a stream holding several files."""
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.remaining = size
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+
+def _tar_members(path):
+    """
+    Yield the path, size and file object of the members of a tar archive,
+    decompressing it on the fly. The file object is None for directories.
+    """
+    try:
+        archive = tarfile.open(path, 'r|*')
+    except (tarfile.TarError, IOError) as e:
+        raise StreamingNotSupported('cannot read {} as a tar archive: {}'.format(path, e))
+    try:
+        for member in archive:
+            if member.isdir():
+                yield member.name, None, None
+            elif member.isfile():
+                yield member.name, member.size, archive.extractfile(member)
+            else:
+                raise StreamingNotSupported('{} is not a regular file'.format(member.name))
+    finally:
+        archive.close()
+
+
+def parse_7z_listing(listing):
+    """
+    Parse the technical listing of a 7z archive (``7z l -slt``).
+
+    :return: List of (path, size, is_directory) tuples, in the order of the
+        archive.
+    """
+    entries = []
+    _, _, listing = listing.partition('\n----------\n')
+    for block in listing.split('\n\n'):
+        properties = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition(' = ')
+            if sep:
+                properties[key] = value
+        if 'Path' not in properties:
+            continue
+        is_directory = properties.get('Folder') == '+' or 'D' in properties.get('Attributes', '').split('_')[0]
+        entries.append((properties['Path'], int(properties.get('Size') or 0), is_directory))
+    return entries
+
+
+def _7z_members(path):
+    """
+    Yield the path, size and file object of the members of a 7z archive.
+
+    ``7z x -so`` writes the contents of all the files of the archive one after
+    the other in the order of its listing, so the listing gives the size of
+    each file in the stream.
+    """
+    try:
+        listing = subprocess.check_output([SEVENZIP, 'l', '-slt', '--', path])
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise StreamingNotSupported('cannot list {}: {}'.format(path, e))
+    entries = parse_7z_listing(listing)
+    with open(os.devnull, 'wb') as devnull:
+        process = subprocess.Popen([SEVENZIP, 'x', '-so', '-bd', '-y', '--', path],
+                                   stdout=subprocess.PIPE, stderr=devnull)
+    try:
+        for name, size, is_directory in entries:
+            if is_directory:
+                yield name, None, None
+            else:
+                yield name, size, _LimitedReader(process.stdout, size)
+        trailing = process.stdout.read(1)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if trailing or returncode != 0:
+        raise IOError('7z failed to extract {} (exit code {})'.format(path, returncode))
+
+
+def archive_members(path):
+    """
+    Yield the path, size and file object of the members of the archive at
+    ``path``, raising StreamingNotSupported if it is not a tar or 7z archive.
+    """
+    name = os.path.basename(path).lower()
+    if name.endswith(TAR_EXTENSIONS):
+        return _tar_members(path)
+    if name.endswith(SEVENZIP_EXTENSIONS):
+        return _7z_members(path)
+    raise StreamingNotSupported('{} is not a tar or 7z archive'.format(path))
+
+
+def verify_archive(path, algorithms=('sha256',)):
+    """
+    Verify the bag in the archive at ``path`` without extracting it.
+
+    The bag must be the only top-level directory of the archive. The
+    manifests may come after the files they list in the archive, so until
+    they are read the files are hashed with ``algorithms``, which should be
+    those the bag was created with. If a manifest uses another algorithm
+    for a file already read, the archive has to be extracted to be verified
+    and StreamingNotSupported is raised.
+
+    :param str path: Path of a tar (possibly compressed with gzip or bzip2)
+        or 7z archive.
+    :param list algorithms: Algorithms the files are expected to be hashed
+        with.
+    :return: BagReport
+    """
+    report = BagReport(path)
+    contents = BagContents()
+    algorithms = set(_supported(algorithms))
+    root = None
+    try:
+        for name, size, f in archive_members(path):
+            name = os.path.normpath(name)
+            top, _, relative_path = name.partition(os.sep)
+            if root is None:
+                root = top
+            elif top != root:
+                raise StreamingNotSupported('{} has several top-level entries'.format(path))
+            if f is None:
+                if relative_path == DATA_DIRECTORY:
+                    contents.has_data_directory = True
+                continue
+            if not relative_path:
+                raise StreamingNotSupported('{} is not a directory'.format(name))
+            if os.sep not in relative_path:
+                # Tag files are small and needed to know what to check
+                data = f.read()
+                contents.add_tag_file(relative_path, data)
+                contents.add_file(relative_path, len(data))
+                continue
+            needed = set(contents.payload_manifests() if is_payload(relative_path) else contents.tag_manifests())
+            digests, read = hash_fileobj(f, _supported(needed | algorithms),
+                                         threads=size >= hashing.THREADS_THRESHOLD)
+            if read != size:
+                report.add(CHECK_VALID, relative_path, 'truncated, read {} of {} bytes'.format(read, size))
+            contents.add_file(relative_path, size, digests)
+    except (IOError, OSError, tarfile.TarError, EOFError) as e:
+        report.add(CHECK_VALID, None, 'cannot read the archive: {}'.format(e))
+
+    tag_manifest_entries = contents.tag_manifest_entries()
+    for relative_path in contents.sizes:
+        needed = contents.algorithms_for(relative_path, tag_manifest_entries)
+        if relative_path in contents.tag_files:
+            contents.digests[relative_path] = contents.digests_of_tag_file(relative_path, needed)
+        elif report.valid and not set(needed) <= set(contents.digests[relative_path]):
+            raise StreamingNotSupported('{} was not hashed with {}'.format(
+                relative_path, ', '.join(sorted(set(needed) - set(contents.digests[relative_path])))))
+    return contents.check(report)
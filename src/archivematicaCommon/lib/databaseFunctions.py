@@ -22,6 +22,8 @@
 # @author Joseph Perry <joseph@artefactual.com>
 from __future__ import print_function
 
+import calendar
+from decimal import Decimal
 from functools import wraps
 import logging
 import os
@@ -34,7 +36,7 @@ from archivematicaFunctions import strToUnicode
 from django.db import close_old_connections
 from django.db.models import Q
 from django.utils import timezone
-from main.models import Agent, Derivation, Event, File, FPCommandOutput, Job, SIP, Task, Transfer, UnitVariable
+from main.models import Agent, Derivation, Event, File, FPCommandOutput, Job, SIP, Task, Transfer, UnitStatus, UnitVariable
 
 LOGGER = logging.getLogger('archivematica.common')
 
@@ -113,26 +115,38 @@ def getAMAgentsForFile(fileUUID):
 
     :returns: A list of Agent IDs
     """
-    agents = []
-
     try:
         f = File.objects.get(uuid=fileUUID)
     except File.DoesNotExist:
         LOGGER.warning('File with UUID %s does not exist in database; unable to fetch Agents', fileUUID)
         return []
 
+    return getAMAgentsForUnit(sipUUID=f.sip_id, transferUUID=f.transfer_id)
+
+
+def getAMAgentsForUnit(sipUUID=None, transferUUID=None):
+    """
+    Fetches the IDs for the Archivematica agents associated with the files of
+    a SIP or transfer; see getAMAgentsForFile.
+
+    :param str sipUUID: The UUID of the SIP containing the files, if any.
+    :param str transferUUID: The UUID of the transfer containing the files, if any.
+    :returns: A list of Agent IDs
+    """
+    agents = []
+
     # Fetch Agent for the User
-    if f.sip:
+    if sipUUID:
         try:
-            var = UnitVariable.objects.get(unittype='SIP', unituuid=f.sip_id,
+            var = UnitVariable.objects.get(unittype='SIP', unituuid=sipUUID,
                                            variable='activeAgent')
             agents.append(int(var.variablevalue))
         except UnitVariable.DoesNotExist:
             pass
-    if f.transfer and not agents:  # agent hasn't been found yet
+    if transferUUID and not agents:  # agent hasn't been found yet
         try:
             var = UnitVariable.objects.get(unittype='Transfer',
-                                           unituuid=f.transfer_id,
+                                           unituuid=transferUUID,
                                            variable='activeAgent')
             agents.append(int(var.variablevalue))
         except UnitVariable.DoesNotExist:
@@ -178,6 +192,89 @@ def insertIntoEvents(fileUUID, eventIdentifierUUID="", eventType="", eventDateTi
     event.agents.add(*agents)
 
 
+def _getAMAgentsForFiles(fileUUIDs, batchSize=500):
+    """
+    Fetches the IDs of the Archivematica agents of many files, once for each
+    unit containing them; see getAMAgentsForFile.
+
+    :returns: A dict of lists of Agent IDs, keyed by file UUID
+    """
+    fileUUIDs = list(fileUUIDs)
+    fileUnits = {}
+    for i in range(0, len(fileUUIDs), batchSize):
+        rows = File.objects.filter(uuid__in=fileUUIDs[i:i + batchSize]).values_list('uuid', 'sip_id', 'transfer_id')
+        for fileUUID, sipUUID, transferUUID in rows:
+            fileUnits[fileUUID] = (sipUUID, transferUUID)
+
+    unitAgents = {}
+    fileAgents = {}
+    for fileUUID in fileUUIDs:
+        if fileUUID not in fileUnits:
+            LOGGER.warning('File with UUID %s does not exist in database; unable to fetch Agents', fileUUID)
+            fileAgents[fileUUID] = []
+            continue
+        unit = fileUnits[fileUUID]
+        if unit not in unitAgents:
+            unitAgents[unit] = getAMAgentsForUnit(sipUUID=unit[0], transferUUID=unit[1])
+        fileAgents[fileUUID] = unitAgents[unit]
+    return fileAgents
+
+
+def insertIntoEventsInBulk(events, sipUUID=None, transferUUID=None, agents=None, batchSize=500):
+    """
+    Creates many entries in the Events table at once, with a few queries for
+    all of them rather than several for each.
+
+    :param list events: A dict for each event, with the keyword arguments
+                        accepted by insertIntoEvents (fileUUID, eventType...)
+                        except agents.
+    :param str sipUUID: The UUID of the SIP containing the files, if they are
+                        all in the same SIP; used to fetch the Agents.
+    :param str transferUUID: The UUID of the transfer containing the files, if
+                             they are all in the same transfer; used to fetch
+                             the Agents.
+    :param list agents: List of Agent IDs to associate with every event. If
+                        None provided, automatically fetches Agents
+                        representing Archivematica once for each unit.
+    :param int batchSize: The number of rows written by each INSERT.
+    """
+    if not events:
+        return
+    utcDate = getUTCDate()
+
+    fileUUIDs = set(event['fileUUID'] for event in events)
+    if agents:
+        fileAgents = dict.fromkeys(fileUUIDs, agents)
+    elif sipUUID or transferUUID:
+        fileAgents = dict.fromkeys(fileUUIDs, getAMAgentsForUnit(sipUUID=sipUUID, transferUUID=transferUUID))
+    else:
+        fileAgents = _getAMAgentsForFiles(fileUUIDs, batchSize)
+
+    records = []
+    for event in events:
+        records.append(Event(
+            event_id=event.get('eventIdentifierUUID') or str(uuid.uuid4()),
+            file_uuid_id=event['fileUUID'],
+            event_type=event.get('eventType', ''),
+            event_datetime=utcDate if event.get('eventDateTime') is None else event['eventDateTime'],
+            event_detail=event.get('eventDetail', ''),
+            event_outcome=event.get('eventOutcome', ''),
+            event_outcome_detail=event.get('eventOutcomeDetailNote', '')))
+    Event.objects.bulk_create(records, batch_size=batchSize)
+
+    # bulk_create does not set the primary keys of the new rows, which the
+    # agents through table refers to; fetch them by event UUID.
+    eventPKs = {}
+    eventIDs = [record.event_id for record in records]
+    for i in range(0, len(eventIDs), batchSize):
+        eventPKs.update(Event.objects.filter(event_id__in=eventIDs[i:i + batchSize]).values_list('event_id', 'pk'))
+    EventAgent = Event.agents.through
+    links = [EventAgent(event_id=eventPKs[record.event_id], agent_id=agent)
+             for record in records
+             for agent in set(fileAgents[record.file_uuid_id])]
+    EventAgent.objects.bulk_create(links, batch_size=batchSize)
+
+
 def insertIntoDerivations(sourceFileUUID, derivedFileUUID, relatedEventUUID=None):
     """Creates a new entry in the Derivations table using the supplied
     arguments. The two files in this relationship should already exist in the
@@ -271,12 +368,10 @@ def logJobCreatedSQL(job):
     :param jobChainLink job: A jobChainLink instance.
     :returns None:
     """
-    unitUUID = job.unit.UUID
+    unitUUID = getJobUnitUUID(job)
     # microseconds are always 6 digits
     # The number returned may have a leading 0 which needs to be preserved
     decDate = getDeciDate("." + str(job.createdDate.microsecond).zfill(6))
-    if job.unit.owningUnit is not None:
-        unitUUID = job.unit.owningUnit.UUID
     Job.objects.create(jobuuid=job.UUID,
                        jobtype=job.description,
                        directory=job.unit.currentPath,
@@ -288,10 +383,38 @@ def logJobCreatedSQL(job):
                        createdtimedec=decDate,
                        microservicechainlink_id=str(job.pk),
                        subjobof=str(job.subJobOf))
+    if job.subJobOf:
+        UnitStatus.objects.job_created(unitUUID, job.unit.__class__.__name__)
+    else:
+        timestamp = calendar.timegm(job.createdDate.utctimetuple()) + Decimal(decDate)
+        UnitStatus.objects.job_created(unitUUID, job.unit.__class__.__name__,
+                                       directory=job.unit.currentPath, timestamp=timestamp)
 
     # TODO -un hardcode executing exeCommand
 
 
+def logJobStatusSQL(job, status_code):
+    """
+    Sets the status (Job.currentstep) of a job.
+
+    :param jobChainLink job: A jobChainLink instance.
+    :param int status_code: One of the Job.STATUS values.
+    :returns None:
+    """
+    Job.objects.filter(jobuuid=job.UUID).update(currentstep=status_code)
+    UnitStatus.objects.changed([getJobUnitUUID(job)])
+
+
+def getJobUnitUUID(job):
+    """
+    Returns the UUID of the unit the jobs of a jobChainLink are logged under,
+    i.e. the SIP of a DIP.
+    """
+    if job.unit.owningUnit is not None:
+        return job.unit.owningUnit.UUID
+    return job.unit.UUID
+
+
 def fileWasRemoved(fileUUID, utcDate=None, eventDetail="", eventOutcomeDetailNote="", eventOutcome=""):
     """
     Logs the removal of a file from the database.
@@ -34,6 +34,12 @@ from main import models
 
 config = {}
 
+# Compiled patterns matching the keys of a ReplacementDict, keyed by the
+# frozenset of the keys: the dicts built for every file of a unit share the
+# same keys.
+_patterns = {}
+_PATTERNS_CACHE_SIZE = 256
+
 
 def setup(shared_directory, processing_directory, watch_directory, rejected_directory):
     config['shared_directory'] = shared_directory
@@ -42,6 +48,25 @@ def setup(shared_directory, processing_directory, watch_directory, rejected_dire
     config['rejected_directory'] = rejected_directory
 
 
+def _keys_pattern(keys):
+    """
+    Return a regex matching any of ``keys``, compiled once per key set, and a
+    dict mapping the bytestring form of each key to the key.
+    """
+    keys = frozenset(keys)
+    cached = _patterns.get(keys)
+    if cached is None:
+        if len(_patterns) >= _PATTERNS_CACHE_SIZE:
+            _patterns.clear()
+        originals = {unicodeToStr(key): key for key in keys if key}
+        # Longest keys first, so that a key that is the prefix of another one
+        # does not hide it
+        alternatives = sorted((re.escape(key) for key in originals), key=len, reverse=True)
+        cached = re.compile('|'.join(alternatives)), originals
+        _patterns[keys] = cached
+    return cached
+
+
 def replace_string_values(string, **kwargs):
     """
     Replace standard Archivematica variables in a string given data from
@@ -202,13 +227,22 @@ class ReplacementDict(dict):
         contains Unicode characters is "%originalLocation%", and Archivematica
         does not use this variable in any place where precise fidelity of the
         original string is required.
+
+        All the keys are replaced in a single pass over each string, with a
+        regex built from the keys and cached for dicts with the same keys.
+        Values are inserted as they are: keys they contain are not replaced.
         """
+        if not any(self):
+            return [unicodeToStr(orig) for orig in strings]
+        pattern, originals = _keys_pattern(self)
+
+        def substitute(match):
+            return unicodeToStr(self[originals[match.group(0)]])
+
         ret = []
         for orig in strings:
             if orig is not None:
-                orig = unicodeToStr(orig)
-                for key, value in self.items():
-                    orig = orig.replace(key, unicodeToStr(value))
+                orig = pattern.sub(substitute, unicodeToStr(orig))
             ret.append(orig)
         return ret
 
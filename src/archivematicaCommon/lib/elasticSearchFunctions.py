@@ -43,14 +43,20 @@ from archivematicaFunctions import get_dashboard_uuid
 import namespaces as ns
 import version
 
-from externals import xmltodict
-
 from elasticsearch import Elasticsearch, ImproperlyConfigured
+from elasticsearch.helpers import scan
 
 
 logger = logging.getLogger('archivematica.common')
 
-MAX_QUERY_SIZE = 50000  # TODO Check that this is a reasonable number
+# Number of hits fetched per shard and request by scan_all_results
+SCAN_PAGE_SIZE = 500
+# How long the search context of scan_all_results is kept between requests
+SCAN_SCROLL = '1m'
+# Unanalyzed copy of the relative path of transfer files, for prefix queries
+RELATIVE_PATH_UNANALYZED = 'relative_path.relative_path_unanalyzed'
+# METS files bigger than this (in bytes) are indexed without loading them
+METS_STREAMING_THRESHOLD = 256 * 1024 * 1024
 MATCH_ALL_QUERY = {
     "query": {
         "match_all": {}
@@ -104,21 +110,46 @@ class TooManyResultsError(ElasticsearchError):
     pass
 
 
+class BulkIndexError(ElasticsearchError):
+    """
+    Some documents could not be indexed by ``bulk_index``. ``indexed`` is the
+    number of documents that were indexed and ``errors`` a list of
+    ``(document, error)`` tuples for the ones that were not.
+    """
+    def __init__(self, message, indexed, errors):
+        super(BulkIndexError, self).__init__(message)
+        self.indexed = indexed
+        self.errors = errors
+
+
 _es_hosts = None
 _es_client = None
 DEFAULT_TIMEOUT = 10
+DEFAULT_BULK_CHUNK_SIZE = 500
+DEFAULT_BULK_MAX_BYTES = 10 * 1024 * 1024
+_bulk_chunk_size = DEFAULT_BULK_CHUNK_SIZE
+_bulk_max_bytes = DEFAULT_BULK_MAX_BYTES
 
 
-def setup(hosts, timeout=DEFAULT_TIMEOUT):
+def setup(hosts, timeout=DEFAULT_TIMEOUT,
+          bulk_chunk_size=DEFAULT_BULK_CHUNK_SIZE,
+          bulk_max_bytes=DEFAULT_BULK_MAX_BYTES):
     """
     Initialize Elasticsearch client and share it as the attribute _es_client in
     the current module. An additional attribute _es_hosts is defined containing
     the Elasticsearch hosts (expected types are: string, list or tuple).
+
+    ``bulk_chunk_size`` and ``bulk_max_bytes`` are the default limits of the
+    requests sent by ``bulk_index``.
     """
     global _es_hosts
     global _es_client
+    global _bulk_chunk_size
+    global _bulk_max_bytes
 
     _es_hosts = hosts
+    _bulk_chunk_size = bulk_chunk_size
+    _bulk_max_bytes = bulk_max_bytes
     _es_client = Elasticsearch(**{
         'hosts': _es_hosts,
         'timeout': timeout,
@@ -127,7 +158,9 @@ def setup(hosts, timeout=DEFAULT_TIMEOUT):
 
 
 def setup_reading_from_conf(settings):
-    setup(settings.ELASTICSEARCH_SERVER, settings.ELASTICSEARCH_TIMEOUT)
+    setup(settings.ELASTICSEARCH_SERVER, settings.ELASTICSEARCH_TIMEOUT,
+          bulk_chunk_size=settings.ELASTICSEARCH_BULK_CHUNK_SIZE,
+          bulk_max_bytes=settings.ELASTICSEARCH_BULK_MAX_BYTES)
 
 
 def get_host():
@@ -213,13 +246,16 @@ def create_transfers_index(client):
         raise ElasticsearchError('The transfer index mapping is incorrect. The "transfers" index should be re-created.')
 
 
-def search_all_results(client, body, index=None, doc_type=None, **query_params):
+def scan_all_results(client, body, index=None, doc_type=None, page_size=SCAN_PAGE_SIZE, source=None, **query_params):
     """
-    Performs client.search with the size set to MAX_QUERY_SIZE.
+    Yields every hit of client.search, in no particular order.
+
+    The hits are fetched `page_size` at a time from each shard through the
+    scroll API, so none are left out however many there are, and only a
+    page of them is held in memory at once.
 
-    By default search_raw returns only 10 results.  Since we usually want all
-    results, this is a wrapper that fetches MAX_QUERY_SIZE results and logs a
-    warning if more results were available.
+    :param list source: Names of the fields of `_source` to return, or False
+        not to return `_source` at all.
     """
     if isinstance(index, list):
         index = ','.join(index)
@@ -227,17 +263,18 @@ def search_all_results(client, body, index=None, doc_type=None, **query_params):
     if isinstance(doc_type, list):
         doc_type = ','.join(doc_type)
 
-    results = client.search(
-        body=body,
+    if source is not None:
+        query_params['_source'] = ','.join(source) if source else False
+
+    return scan(
+        client,
+        query=body,
         index=index,
         doc_type=doc_type,
-        size=MAX_QUERY_SIZE,
+        size=page_size,
+        scroll=SCAN_SCROLL,
         **query_params)
 
-    if results['hits']['total'] > MAX_QUERY_SIZE:
-        logger.warning('Number of items in backlog (%s) exceeds maximum amount fetched (%s)', results['hits']['total'], MAX_QUERY_SIZE)
-    return results
-
 
 def get_type_mapping(client, index, type):
     return client.indices.get_mapping(index, doc_type=type)[index]['mappings']
@@ -254,6 +291,17 @@ def transfer_mapping_is_correct(client):
     return mapping['transferfile']['properties']['accessionid']['index'] == 'not_analyzed'
 
 
+def transfer_file_paths_are_prefixable(client):
+    """
+    Whether the relative paths of transfer files are also indexed unanalyzed,
+    as RELATIVE_PATH_UNANALYZED, so that the files in a directory can be
+    found with a prefix query. Transfers indexes created before that need to
+    be recreated for it.
+    """
+    mapping = get_type_mapping(client, 'transfers', 'transferfile')
+    return 'fields' in mapping['transferfile']['properties']['relative_path']
+
+
 def aip_mapping_is_correct(client):
     try:
         # mapping already created
@@ -341,7 +389,7 @@ def set_up_mapping_aip_index(client):
 def set_up_mapping_transfer_index(client):
     transferfile_mapping = {
         'filename': {'type': 'string'},
-        'relative_path': {'type': 'string'},
+        'relative_path': _sortable_string_field_specification('relative_path'),
         'fileuuid': MACHINE_READABLE_FIELD_SPEC,
         'sipuuid': MACHINE_READABLE_FIELD_SPEC,
         'accessionid': MACHINE_READABLE_FIELD_SPEC,
@@ -418,8 +466,7 @@ def index_aip(client, uuid, name, filePath, pathToMETS, size=None, aips_in_aic=N
         is_part_of = dublincore.findtext('dcterms:isPartOf', namespaces=ns.NSMAP)
 
     # convert METS XML to dict
-    xml = ElementTree.tostring(root)
-    mets_data = rename_dict_keys_with_child_dicts(normalize_dict_values(xmltodict.parse(xml)))
+    mets_data = rename_dict_keys_with_child_dicts(normalize_dict_values(element_to_dict(root)))
 
     # Pull the create time from the METS header
     mets_hdr = root.find("mets:metsHdr", namespaces=ns.NSMAP)
@@ -468,6 +515,87 @@ def try_to_index(client, data, index, doc_type, wait_between_tries=10, max_tries
     raise
 
 
+def _bulk_chunks(client, documents, index, doc_type, chunk_size, max_chunk_bytes):
+    """
+    Group ``documents`` into bulk request bodies of at most ``chunk_size``
+    documents and, unless a single document is bigger, ``max_chunk_bytes``.
+
+    Yields ``(body, documents)`` tuples. Documents are serialized as soon as
+    they are consumed, so callers may reuse their dicts between documents.
+    """
+    action = client.transport.serializer.dumps({
+        'index': {'_index': index, '_type': doc_type}
+    })
+    lines, chunk, size = [], [], 0
+    for document in documents:
+        data = client.transport.serializer.dumps(document)
+        document_size = len(action) + len(data) + 2  # Plus newlines
+        if chunk and (len(chunk) >= chunk_size or size + document_size > max_chunk_bytes):
+            yield '\n'.join(lines) + '\n', chunk
+            lines, chunk, size = [], [], 0
+        lines.extend((action, data))
+        chunk.append(document)
+        size += document_size
+    if chunk:
+        yield '\n'.join(lines) + '\n', chunk
+
+
+def bulk_index(client, documents, index, doc_type, chunk_size=None,
+               max_chunk_bytes=None, wait_between_tries=10, max_tries=10):
+    """
+    Index an iterable of documents using the Elasticsearch bulk API.
+
+    The cluster health is checked once, before the first request. A request
+    that fails as a whole is retried like in ``try_to_index``. Documents
+    rejected individually do not stop the indexing: once every document has
+    been sent, a ``BulkIndexError`` listing them is raised.
+
+    :param client: The ElasticSearch client
+    :param documents: Iterable of dicts; it may be a generator, which is only
+                      consumed one chunk at a time.
+    :param str index: The index the documents are added to
+    :param str doc_type: The type of the documents
+    :param int chunk_size: Maximum number of documents per request, defaults
+                           to the ``bulk_chunk_size`` given to ``setup()``
+    :param int max_chunk_bytes: Maximum size of a request, defaults to the
+                                ``bulk_max_bytes`` given to ``setup()``
+    :return: The number of documents indexed
+    """
+    if max_tries < 1:
+        raise ValueError("max_tries must be 1 or greater")
+    chunk_size = chunk_size or _bulk_chunk_size
+    max_chunk_bytes = max_chunk_bytes or _bulk_max_bytes
+
+    indexed = 0
+    errors = []
+    for i, (body, chunk) in enumerate(_bulk_chunks(client, documents, index, doc_type, chunk_size, max_chunk_bytes)):
+        if i == 0:
+            wait_for_cluster_yellow_status(client, wait_between_tries, max_tries)
+        for attempt in xrange(1, max_tries + 1):
+            try:
+                response = client.bulk(body=body)
+                break
+            except Exception as e:
+                print("ERROR: error trying to bulk index.")
+                print(e)
+                if attempt == max_tries:
+                    raise
+                time.sleep(wait_between_tries)
+
+        for document, item in zip(chunk, response['items']):
+            result = item['index']
+            if 200 <= result.get('status', 500) < 300:
+                indexed += 1
+                continue
+            errors.append((document, result.get('error', 'status {}'.format(result.get('status')))))
+
+    if errors:
+        raise BulkIndexError(
+            '{} document(s) could not be indexed in {}/{}'.format(len(errors), index, doc_type),
+            indexed, errors)
+    return indexed
+
+
 def get_aip_data(client, uuid, fields=None):
     search_params = {
         'body': {
@@ -487,6 +615,9 @@ def get_aip_data(client, uuid, fields=None):
 def index_files(client, index, type_, uuid, pathToArchive, identifiers=[], sipName=None, status=''):
     """
     Only used in clientScripts/* and prints to stdout/stderr.
+
+    Returns 1 if the directory does not exist or if some of the files could
+    not be indexed, 0 otherwise.
     """
     # Stop if transfer file does not exist
     if not os.path.exists(pathToArchive):
@@ -498,66 +629,308 @@ def index_files(client, index, type_, uuid, pathToArchive, identifiers=[], sipNa
     # Use METS file if indexing an AIP
     metsFilePath = os.path.join(pathToArchive, 'METS.{}.xml'.format(uuid))
 
+    exit_code = 0
+
     # Index AIP
     if os.path.isfile(metsFilePath):
-        files_indexed = index_mets_file_metadata(
-            client,
-            uuid,
-            metsFilePath,
-            index,
-            type_,
-            sipName,
-            identifiers=identifiers
-        )
+        try:
+            files_indexed = index_mets_file_metadata(
+                client,
+                uuid,
+                metsFilePath,
+                index,
+                type_,
+                sipName,
+                identifiers=identifiers
+            )
+        except BulkIndexError as e:
+            files_indexed, exit_code = e.indexed, 1
 
     # Index transfer
     else:
-        files_indexed = index_transfer_files(
-            client,
-            uuid,
-            pathToArchive,
-            index,
-            type_,
-            status=status
-        )
+        try:
+            files_indexed = index_transfer_files(
+                client,
+                uuid,
+                pathToArchive,
+                index,
+                type_,
+                status=status
+            )
+        except BulkIndexError as e:
+            files_indexed, exit_code = e.indexed, 1
 
         index_transfer(client, uuid, files_indexed, status=status)
 
     print(type_ + ' UUID: ' + uuid)
     print('Files indexed: ' + str(files_indexed))
-    return 0
+    return exit_code
+
+
+def _print_bulk_index_errors(error, path_field):
+    for document, reason in error.errors:
+        print('ERROR: unable to index {}: {}'.format(document.get(path_field), reason), file=sys.stderr)
 
 
 def _extract_transfer_metadata(doc):
-    return [xmltodict.parse(ElementTree.tostring(el))['transfer_metadata']
+    return [element_to_dict(el)['transfer_metadata']
             for el in doc.findall("mets:amdSec/mets:sourceMD/mets:mdWrap/mets:xmlData/transfer_metadata", namespaces=ns.NSMAP)]
 
 
-def index_mets_file_metadata(client, uuid, metsFilePath, index, type_, sipName, identifiers=[]):
-    # parse XML
-    tree = ElementTree.parse(metsFilePath)
-    root = tree.getroot()
+# Boundaries at which expat splits the character data it reports.
+_CHARACTER_DATA_BOUNDARIES = re.compile(u'(\n|[&<>]|[^\x00-\x7f])')
 
-    # TODO add a conditional to toggle this
-    remove_tool_output_from_mets(tree)
 
-    # get SIP-wide dmdSec
-    dmdSec = root.findall("mets:dmdSec/mets:mdWrap/mets:xmlData", namespaces=ns.NSMAP)
-    dmdSecData = {}
-    for item in dmdSec:
-        xml = ElementTree.tostring(item)
-        dmdSecData = xmltodict.parse(xml)
+def _character_data(text):
+    """
+    Returns `text` as xmltodict collects it from ElementTree.tostring()
+    output: expat reports newlines, escaped characters and non-ASCII
+    characters (serialized as character references) separately, and
+    xmltodict drops the pieces that are only whitespace.
+    """
+    if not text:
+        return ''
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return ''.join(piece for piece in _CHARACTER_DATA_BOUNDARIES.split(text) if piece.strip())
+
+
+def _push_dict_value(item, key, value):
+    if key not in item:
+        item[key] = value
+    elif isinstance(item[key], list):
+        item[key].append(value)
+    else:
+        item[key] = [item[key], value]
+
+
+# Prefixes that ElementTree.tostring() gives to these namespaces. Other
+# namespaces are numbered (ns0, ns1...) in the order in which they are found,
+# and the mappings of the aips index use the resulting names.
+_WELL_KNOWN_PREFIXES = {
+    'http://www.w3.org/XML/1998/namespace': 'xml',
+    'http://www.w3.org/1999/xhtml': 'html',
+    'http://www.w3.org/1999/02/22-rdf-syntax-ns#': 'rdf',
+    'http://schemas.xmlsoap.org/wsdl/': 'wsdl',
+    'http://www.w3.org/2001/XMLSchema': 'xs',
+    'http://www.w3.org/2001/XMLSchema-instance': 'xsi',
+    'http://purl.org/dc/elements/1.1/': 'dc',
+}
 
-    # Extract isPartOf (for AIPs) or identifier (for AICs) from DublinCore
-    dublincore = root.find('mets:dmdSec/mets:mdWrap/mets:xmlData/dcterms:dublincore', namespaces=ns.NSMAP)
-    aic_identifier = None
-    is_part_of = None
-    if dublincore is not None:
-        aip_type = dublincore.findtext('dc:type', namespaces=ns.NSMAP) or dublincore.findtext('dcterms:type', namespaces=ns.NSMAP)
-        if aip_type == "Archival Information Collection":
-            aic_identifier = dublincore.findtext('dc:identifier', namespaces=ns.NSMAP) or dublincore.findtext('dcterms:identifier', namespaces=ns.NSMAP)
-        elif aip_type == "Archival Information Package":
-            is_part_of = dublincore.findtext('dcterms:isPartOf', namespaces=ns.NSMAP)
+
+def _qualified_names(element):
+    """
+    Returns the prefixed names of the tags and attributes of `element` and
+    its descendants, and the prefixes of their namespaces by URI, as
+    ElementTree.tostring() writes them.
+    """
+    qnames = {}
+    namespaces = {}
+    for el in element.iter():
+        for name in [el.tag] + el.keys():
+            if name in qnames:
+                continue
+            if name[:1] != '{':
+                qnames[name] = name
+                continue
+            uri, local_name = name[1:].rsplit('}', 1)
+            prefix = namespaces.get(uri)
+            if prefix is None:
+                prefix = _WELL_KNOWN_PREFIXES.get(uri, 'ns%d' % len(namespaces))
+                if prefix != 'xml':
+                    namespaces[uri] = prefix
+            qnames[name] = prefix + ':' + local_name
+    return qnames, namespaces
+
+
+def element_to_dict(element):
+    """
+    Converts an ElementTree element to a dict.
+
+    The result is the same as ``xmltodict.parse(ElementTree.tostring(element))``,
+    including the namespace prefixes and declarations, but the element is
+    walked once instead of being serialized and parsed again.
+    """
+    qnames, namespaces = _qualified_names(element)
+
+    def convert(el):
+        # Attribute values go through the same normalization as in expat
+        item = dict(('@' + qnames[key], value.replace('\r', ' ').replace('\t', ' '))
+                    for key, value in el.items())
+        if el is element:
+            for uri, prefix in namespaces.items():
+                item['@xmlns:' + prefix] = uri
+        data = _character_data(el.text)
+        for child in el:
+            _push_dict_value(item, qnames[child.tag], convert(child))
+            data += _character_data(child.tail)
+        if not item:
+            return data or None
+        if data:
+            item['#text'] = data
+        return item
+
+    return {qnames[element.tag]: convert(element)}
+
+
+def _iterparse_mets_sections(path):
+    """
+    Yields the top-level sections (metsHdr, dmdSec, amdSec, fileSec...) of
+    the METS file at `path` one at a time, each fully parsed. Sections are
+    discarded once the caller is done with them, so only one of them is in
+    memory at any time.
+    """
+    depth = 0
+    for event, elem in ElementTree.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            if depth == 0:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield elem
+            del root[:]
+
+
+def _scan_mets_sections(sections, keep_amdsecs=True):
+    """
+    Walks the top-level `sections` of a METS document once and collects what
+    is needed to index its files.
+
+    Returns a dict with the SIP-wide ``dmdSec`` data, the ``AICID`` and
+    ``isPartOf`` values of the first Dublin Core record, the
+    ``transferMetadata``, the ``files`` to index as (ID, ADMID, path)
+    tuples and, if `keep_amdsecs`, the ``amdSecs`` elements by ID.
+    """
+    summary = {
+        'dmdSec': {},
+        'AICID': None,
+        'isPartOf': None,
+        'transferMetadata': [],
+        'files': [],
+        'amdSecs': {},
+    }
+    dublincore_found = False
+    original_files = []
+    metadata_files = []
+    for section in sections:
+        if section.tag == ns.metsBNS + 'dmdSec':
+            for item in section.findall("mets:mdWrap/mets:xmlData", namespaces=ns.NSMAP):
+                summary['dmdSec'] = element_to_dict(item)
+            dublincore = section.find('mets:mdWrap/mets:xmlData/dcterms:dublincore', namespaces=ns.NSMAP)
+            if dublincore is not None and not dublincore_found:
+                dublincore_found = True
+                # Extract isPartOf (for AIPs) or identifier (for AICs)
+                aip_type = dublincore.findtext('dc:type', namespaces=ns.NSMAP) or dublincore.findtext('dcterms:type', namespaces=ns.NSMAP)
+                if aip_type == "Archival Information Collection":
+                    summary['AICID'] = dublincore.findtext('dc:identifier', namespaces=ns.NSMAP) or dublincore.findtext('dcterms:identifier', namespaces=ns.NSMAP)
+                elif aip_type == "Archival Information Package":
+                    summary['isPartOf'] = dublincore.findtext('dcterms:isPartOf', namespaces=ns.NSMAP)
+        elif section.tag == ns.metsBNS + 'amdSec':
+            summary['transferMetadata'].extend(
+                element_to_dict(el)['transfer_metadata']
+                for el in section.findall("mets:sourceMD/mets:mdWrap/mets:xmlData/transfer_metadata", namespaces=ns.NSMAP))
+            if keep_amdsecs:
+                summary['amdSecs'][section.get('ID')] = section
+        elif section.tag == ns.metsBNS + 'fileSec':
+            # Index all files in a fileGrp with USE='original' or USE='metadata'
+            for use, files in (('original', original_files), ('metadata', metadata_files)):
+                for file_ in section.findall("mets:fileGrp[@USE='{}']/mets:file".format(use), namespaces=ns.NSMAP):
+                    filePath = file_.find('mets:FLocat', namespaces=ns.NSMAP).attrib['{http://www.w3.org/1999/xlink}href']
+                    files.append((file_.attrib['ID'], file_.attrib.get('ADMID'), filePath))
+    summary['files'] = original_files + metadata_files
+    return summary
+
+
+def _mets_file_document(fileData, fileID, amdSec, filePath):
+    """
+    Returns the document indexed for the METS file with ID `fileID`, given
+    the data shared by all the files of the AIP and the file's amdSec.
+    """
+    indexData = fileData.copy()  # Deep copy of dict, not of dict contents
+
+    # Get file UUID.  If and ADMID exists, look in the amdSec for the UUID,
+    # otherwise parse it out of the file ID.
+    # 'Original' files have ADMIDs, 'Metadata' files don't
+    amdSecData = {}
+    if amdSec is None:
+        # Parse UUID from file ID
+        fileUUID = None
+        uuix_regex = r'\w{8}-?\w{4}-?\w{4}-?\w{4}-?\w{12}'
+        uuids = re.findall(uuix_regex, fileID)
+        # Multiple UUIDs may be returned - if they are all identical, use that
+        # UUID, otherwise use None.
+        # To determine all UUIDs are identical, use the size of the set
+        if len(set(uuids)) == 1:
+            fileUUID = uuids[0]
+    else:
+        fileUUID = amdSec.findtext("mets:techMD/mets:mdWrap/mets:xmlData/premis:object/premis:objectIdentifier/premis:objectIdentifierValue", namespaces=ns.NSMAP)
+
+        # Index amdSec information
+        amdSecData = rename_dict_keys_with_child_dicts(normalize_dict_values(element_to_dict(amdSec)))
+
+    indexData['FILEUUID'] = fileUUID
+    indexData['METS'] = dict(fileData['METS'], amdSec=amdSecData)
+
+    # Get file path and extension
+    indexData['filePath'] = filePath
+    _, fileExtension = os.path.splitext(filePath)
+    if fileExtension:
+        indexData['fileExtension'] = fileExtension[1:].lower()
+
+    return indexData
+
+
+def _streamed_mets_file_documents(metsFilePath, fileData, files):
+    """
+    Yields the documents of `files` reading the amdSecs of the METS file one
+    at a time, in the order in which they appear.
+    """
+    files_by_admid = {}
+    for fileID, admID, filePath in files:
+        files_by_admid.setdefault(admID, []).append((fileID, filePath))
+
+    for section in _iterparse_mets_sections(metsFilePath):
+        if section.tag != ns.metsBNS + 'amdSec' or section.get('ID') not in files_by_admid:
+            continue
+        toolNodes = section.findall("mets:techMD/mets:mdWrap/mets:xmlData/premis:object/premis:objectCharacteristics/premis:objectCharacteristicsExtension", namespaces=ns.NSMAP)
+        for node in toolNodes:
+            node.clear()
+        for fileID, filePath in files_by_admid.pop(section.get('ID')):
+            yield _mets_file_document(fileData, fileID, section, filePath)
+
+    # Files without an amdSec, e.g. metadata files
+    for admID_files in files_by_admid.values():
+        for fileID, filePath in admID_files:
+            yield _mets_file_document(fileData, fileID, None, filePath)
+
+
+def index_mets_file_metadata(client, uuid, metsFilePath, index, type_, sipName, identifiers=[], stream=None):
+    """
+    Indexes the original and metadata files described in the METS file of
+    the AIP with UUID `uuid`, using the bulk API.
+
+    METS files bigger than METS_STREAMING_THRESHOLD, or any METS file if
+    `stream` is True, are read twice with iterparse instead of being loaded
+    in memory: once to find the files to index and once to index them along
+    with their amdSecs.
+
+    Returns the number of files indexed. Raises ``BulkIndexError`` if some
+    of them could not be indexed.
+    """
+    if stream is None:
+        stream = os.path.getsize(metsFilePath) > METS_STREAMING_THRESHOLD
+
+    if stream:
+        summary = _scan_mets_sections(_iterparse_mets_sections(metsFilePath), keep_amdsecs=False)
+    else:
+        # parse XML
+        tree = ElementTree.parse(metsFilePath)
+
+        # TODO add a conditional to toggle this
+        remove_tool_output_from_mets(tree)
+
+        summary = _scan_mets_sections(tree.getroot())
 
     # establish structure to be indexed for each file item
     fileData = {
@@ -568,64 +941,30 @@ def index_mets_file_metadata(client, uuid, metsFilePath, index, type_, sipName,
         'indexedAt': time.time(),
         'filePath': '',
         'fileExtension': '',
-        'isPartOf': is_part_of,
-        'AICID': aic_identifier,
+        'isPartOf': summary['isPartOf'],
+        'AICID': summary['AICID'],
         'METS': {
-            'dmdSec': rename_dict_keys_with_child_dicts(normalize_dict_values(dmdSecData)),
+            'dmdSec': rename_dict_keys_with_child_dicts(normalize_dict_values(summary['dmdSec'])),
             'amdSec': {},
         },
         'origin': get_dashboard_uuid(),
         'identifiers': identifiers,
-        'transferMetadata': _extract_transfer_metadata(root),
+        'transferMetadata': summary['transferMetadata'],
     }
+    files = summary['files']
 
-    # Index all files in a fileGrup with USE='original' or USE='metadata'
-    original_files = root.findall("mets:fileSec/mets:fileGrp[@USE='original']/mets:file", namespaces=ns.NSMAP)
-    metadata_files = root.findall("mets:fileSec/mets:fileGrp[@USE='metadata']/mets:file", namespaces=ns.NSMAP)
-    files = original_files + metadata_files
-
-    # Index AIC METS file if it exists
-    for file_ in files:
-        indexData = fileData.copy()  # Deep copy of dict, not of dict contents
-
-        # Get file UUID.  If and ADMID exists, look in the amdSec for the UUID,
-        # otherwise parse it out of the file ID.
-        # 'Original' files have ADMIDs, 'Metadata' files don't
-        admID = file_.attrib.get('ADMID', None)
-        if admID is None:
-            # Parse UUID from file ID
-            fileUUID = None
-            uuix_regex = r'\w{8}-?\w{4}-?\w{4}-?\w{4}-?\w{12}'
-            uuids = re.findall(uuix_regex, file_.attrib['ID'])
-            # Multiple UUIDs may be returned - if they are all identical, use that
-            # UUID, otherwise use None.
-            # To determine all UUIDs are identical, use the size of the set
-            if len(set(uuids)) == 1:
-                fileUUID = uuids[0]
-        else:
-            amdSecInfo = root.find("mets:amdSec[@ID='{}']".format(admID), namespaces=ns.NSMAP)
-            fileUUID = amdSecInfo.findtext("mets:techMD/mets:mdWrap/mets:xmlData/premis:object/premis:objectIdentifier/premis:objectIdentifierValue", namespaces=ns.NSMAP)
-
-            # Index amdSec information
-            xml = ElementTree.tostring(amdSecInfo)
-            indexData['METS']['amdSec'] = rename_dict_keys_with_child_dicts(normalize_dict_values(xmltodict.parse(xml)))
-
-        indexData['FILEUUID'] = fileUUID
-
-        # Get file path from FLocat and extension
-        filePath = file_.find('mets:FLocat', namespaces=ns.NSMAP).attrib['{http://www.w3.org/1999/xlink}href']
-        indexData['filePath'] = filePath
-        _, fileExtension = os.path.splitext(filePath)
-        if fileExtension:
-            indexData['fileExtension'] = fileExtension[1:].lower()
-
-        # index data
-        wait_for_cluster_yellow_status(client)
-        try_to_index(client, indexData, index, type_)
+    if stream:
+        documents = _streamed_mets_file_documents(metsFilePath, fileData, files)
+    else:
+        amdSecs = summary['amdSecs']
+        documents = (_mets_file_document(fileData, fileID, amdSecs.get(admID), filePath)
+                     for fileID, admID, filePath in files)
 
-        # Reset fileData['METS']['amdSec'], since it is updated in the loop
-        # above. See http://stackoverflow.com/a/3975388 for explanation
-        fileData['METS']['amdSec'] = {}
+    try:
+        bulk_index(client, documents, index, type_)
+    except BulkIndexError as e:
+        _print_bulk_index_errors(e, 'filePath')
+        raise
 
     print('Indexed AIP files and corresponding METS XML.')
 
@@ -746,7 +1085,8 @@ def index_transfer_files(client, uuid, pathToTransfer, index, type_, status=''):
     """
     Indexes files in the Transfer with UUID `uuid` at path `pathToTransfer`.
 
-    Returns the number of files indexed.
+    Returns the number of files indexed. Raises ``BulkIndexError`` if some of
+    them could not be indexed.
 
     client: ElasticSearch client
     uuid: UUID of the Transfer in the DB
@@ -754,7 +1094,6 @@ def index_transfer_files(client, uuid, pathToTransfer, index, type_, status=''):
         trailing / but not including objects/
     index, type: index and type in ElasticSearch
     """
-    files_indexed = 0
     ingest_date = str(datetime.datetime.today())[0:10]
 
     # Some files should not be indexed
@@ -774,64 +1113,70 @@ def index_transfer_files(client, uuid, pathToTransfer, index, type_, status=''):
     # Get dashboard UUID
     dashboard_uuid = get_dashboard_uuid()
 
-    for filepath in list_files_in_dir(pathToTransfer):
-        if os.path.isfile(filepath):
-            # Get file UUID
-            file_uuid = ''
-            modification_date = ''
-            relative_path = filepath.replace(pathToTransfer, '%transferDirectory%')
-            try:
-                f = File.objects.get(currentlocation=relative_path,
-                                     transfer_id=uuid)
-                file_uuid = f.uuid
-                formats = _get_file_formats(f)
-                bulk_extractor_reports = _list_bulk_extractor_reports(pathToTransfer, file_uuid)
-                if f.modificationtime is not None:
-                    modification_date = f.modificationtime.strftime('%Y-%m-%d')
-            except File.DoesNotExist:
+    def documents():
+        for filepath in list_files_in_dir(pathToTransfer):
+            if os.path.isfile(filepath):
+                # Get file UUID
                 file_uuid = ''
-                formats = []
-                bulk_extractor_reports = []
-
-            # Get file path info
-            relative_path = relative_path.replace('%transferDirectory%', transfer_name + '/')
-            file_extension = os.path.splitext(filepath)[1][1:].lower()
-            filename = os.path.basename(filepath)
-            # Size in megabytes
-            size = os.path.getsize(filepath) / (1024 * 1024)
-            create_time = os.stat(filepath).st_ctime
-
-            if filename not in ignore_files:
-                print('Indexing {} (UUID: {})'.format(relative_path, file_uuid))
-
-                # TODO Index Backlog Location UUID?
-                indexData = {
-                    'filename': filename,
-                    'relative_path': relative_path,
-                    'fileuuid': file_uuid,
-                    'sipuuid': uuid,
-                    'accessionid': accession_id,
-                    'status': status,
-                    'origin': dashboard_uuid,
-                    'ingestdate': ingest_date,
-                    'created': create_time,
-                    'modification_date': modification_date,
-                    'size': size,
-                    'tags': [],
-                    'file_extension': file_extension,
-                    'bulk_extractor_reports': bulk_extractor_reports,
-                    'format': formats,
-                }
-
-                wait_for_cluster_yellow_status(client)
-                try_to_index(client, indexData, index, type_)
-
-                files_indexed = files_indexed + 1
-            else:
-                print('Skipping indexing {}'.format(relative_path))
-
-    if files_indexed > 0:
-        client.indices.refresh()
+                modification_date = ''
+                relative_path = filepath.replace(pathToTransfer, '%transferDirectory%')
+                try:
+                    f = File.objects.get(currentlocation=relative_path,
+                                         transfer_id=uuid)
+                    file_uuid = f.uuid
+                    formats = _get_file_formats(f)
+                    bulk_extractor_reports = _list_bulk_extractor_reports(pathToTransfer, file_uuid)
+                    if f.modificationtime is not None:
+                        modification_date = f.modificationtime.strftime('%Y-%m-%d')
+                except File.DoesNotExist:
+                    file_uuid = ''
+                    formats = []
+                    bulk_extractor_reports = []
+
+                # Get file path info
+                relative_path = relative_path.replace('%transferDirectory%', transfer_name + '/')
+                file_extension = os.path.splitext(filepath)[1][1:].lower()
+                filename = os.path.basename(filepath)
+                # Size in megabytes
+                size = os.path.getsize(filepath) / (1024 * 1024)
+                create_time = os.stat(filepath).st_ctime
+
+                if filename not in ignore_files:
+                    print('Indexing {} (UUID: {})'.format(relative_path, file_uuid))
+
+                    # TODO Index Backlog Location UUID?
+                    indexData = {
+                        'filename': filename,
+                        'relative_path': relative_path,
+                        'fileuuid': file_uuid,
+                        'sipuuid': uuid,
+                        'accessionid': accession_id,
+                        'status': status,
+                        'origin': dashboard_uuid,
+                        'ingestdate': ingest_date,
+                        'created': create_time,
+                        'modification_date': modification_date,
+                        'size': size,
+                        'tags': [],
+                        'file_extension': file_extension,
+                        'bulk_extractor_reports': bulk_extractor_reports,
+                        'format': formats,
+                    }
+
+                    yield indexData
+                else:
+                    print('Skipping indexing {}'.format(relative_path))
+
+    files_indexed = 0
+    try:
+        files_indexed = bulk_index(client, documents(), index, type_)
+    except BulkIndexError as e:
+        _print_bulk_index_errors(e, 'relative_path')
+        files_indexed = e.indexed
+        raise
+    finally:
+        if files_indexed > 0:
+            client.indices.refresh()
 
     return files_indexed
 
@@ -851,8 +1196,6 @@ def list_files_in_dir(path, filepaths=[]):
 
 
 def _document_ids_from_field_query(client, index, doc_types, field, value):
-    document_ids = []
-
     # Escape /'s with \\
     searchvalue = value.replace('/', '\\/')
     query = {
@@ -862,16 +1205,15 @@ def _document_ids_from_field_query(client, index, doc_types, field, value):
             }
         }
     }
-    documents = search_all_results(
+    documents = scan_all_results(
         client,
         body=query,
-        doc_type=doc_types
+        index=index,
+        doc_type=doc_types,
+        source=False,
     )
 
-    if len(documents['hits']['hits']) > 0:
-        document_ids = [d['_id'] for d in documents['hits']['hits']]
-
-    return document_ids
+    return [d['_id'] for d in documents]
 
 
 def document_id_from_field_query(client, index, doc_types, field, value):
@@ -883,13 +1225,15 @@ def document_id_from_field_query(client, index, doc_types, field, value):
             }
         }
     }
-    documents = search_all_results(
+    document_ids = [d['_id'] for d in scan_all_results(
         client,
         body=query,
-        doc_type=doc_types
-    )
-    if len(documents['hits']['hits']) == 1:
-        document_id = documents['hits']['hits'][0]['_id']
+        index=index,
+        doc_type=doc_types,
+        source=False,
+    )]
+    if len(document_ids) == 1:
+        document_id = document_ids[0]
     return document_id
 
 
@@ -973,22 +1317,23 @@ def get_transfer_file_info(client, field, value):
             }
         }
     }
-    documents = search_all_results(client, body=query, index=indicies)
-    result_count = len(documents['hits']['hits'])
-    if result_count == 1:
-        results = documents['hits']['hits'][0]['_source']
-    elif result_count > 1:
+    result_count = 0
+    filtered_results = []
+    for document in scan_all_results(client, body=query, index=indicies):
+        result_count += 1
+        if result_count == 1:
+            results = document['_source']
         # Elasticsearch was sometimes ranking results for a different filename above
         # the actual file being queried for; in that case only consider results
         # where the value is an actual precise match.
-        filtered_results = [results for results in documents['hits']['hits']
-                            if results['_source'][field] == value]
-
+        if document['_source'][field] == value:
+            filtered_results.append(document['_source'])
+    if result_count > 1:
         result_count = len(filtered_results)
         if result_count == 1:
-            results = filtered_results[0]['_source']
+            results = filtered_results[0]
         if result_count > 1:
-            results = filtered_results[0]['_source']
+            results = filtered_results[0]
             logger.warning('get_transfer_file_info returned %s results for query %s: %s (using first result)',
                            result_count, field, value)
         elif result_count < 1:
@@ -0,0 +1,164 @@
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Log of events shared between processes through the shared directory.
+
+Publishers append events to ``tmp/events.log`` as lines of JSON, under an
+exclusive lock; once the log grows past ``MAX_SIZE`` it is renamed to
+``events.log.1`` (replacing the previous one) and a new log is started.
+Readers follow the log from where they left off, including across a
+rotation, so every reader sees every event without any database query or
+server round trip.
+
+Every event is identified by the inode of its log and its end offset in it,
+which lets a reader resume after an event it has already seen.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import fcntl
+import json
+import logging
+import os
+
+LOGGER = logging.getLogger('archivematica.common')
+
+LOG_FILE = os.path.join('tmp', 'events.log')
+# Size in bytes past which the log is rotated
+MAX_SIZE = 4 * 1024 * 1024
+
+
+def log_path(shared):
+    return os.path.join(shared, LOG_FILE)
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
+
+
+def publish(shared, event, data):
+    """
+    Append an event of type ``event`` with the JSON-serializable ``data`` to
+    the log. Errors are logged, not raised: events are not worth failing for.
+    """
+    path = log_path(shared)
+    line = json.dumps({'event': event, 'data': data}) + '\n'
+    try:
+        while True:
+            with open(path, 'ab') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                # Rotated while waiting for the lock
+                if _inode(path) != os.fstat(f.fileno()).st_ino:
+                    continue
+                if os.fstat(f.fileno()).st_size >= MAX_SIZE:
+                    os.rename(path, path + '.1')
+                    continue
+                f.write(line)
+                return
+    except (IOError, OSError):
+        LOGGER.warning('Unable to publish %s event', event, exc_info=True)
+
+
+class EventReader(object):
+    """
+    Follows the event log. ``last_event_id`` is the id of the last event
+    already seen; without it, or if it is no longer in the log, only the
+    events published from now on are read.
+    """
+
+    def __init__(self, shared, last_event_id=None):
+        self.path = log_path(shared)
+        self._file = None
+        # Whether events since ``last_event_id`` may have been missed
+        self.missed = last_event_id is not None
+        if last_event_id is not None:
+            try:
+                inode, offset = [int(value) for value in last_event_id.split(':')]
+            except ValueError:
+                inode, offset = None, 0
+            for path in (self.path, self.path + '.1'):
+                if inode is not None and _inode(path) == inode:
+                    self._open(path, offset)
+                    break
+        if self._file is None:
+            self._open(self.path, None)
+
+    def _open(self, path, offset):
+        """Open ``path`` at ``offset``, or at its end if None."""
+        if self._file is not None:
+            self._file.close()
+        try:
+            self._file = open(path, 'rb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            self._file = None
+            return
+        if offset is None:
+            self._file.seek(0, os.SEEK_END)
+        elif offset <= os.fstat(self._file.fileno()).st_size:
+            self._file.seek(offset)
+            self.missed = False
+        else:
+            self._file.seek(0, os.SEEK_END)
+        self._inode = os.fstat(self._file.fileno()).st_ino
+
+    def read(self):
+        """Return the events published since the last call, as (id, event,
+        data) tuples."""
+        events = []
+        while True:
+            if self._file is None:
+                self._open(self.path, 0)
+                if self._file is None:
+                    return events
+            events.extend(self._read_lines())
+            if _inode(self.path) in (self._inode, None):
+                return events
+            # Rotated: what was published before the rotation has been
+            # written by now, so finish the rotated log and move on
+            events.extend(self._read_lines())
+            self._open(self.path, 0)
+
+    def _read_lines(self):
+        events = []
+        while True:
+            position = self._file.tell()
+            line = self._file.readline()
+            if not line.endswith('\n'):
+                # Nothing more, or a line being written
+                self._file.seek(position)
+                return events
+            try:
+                event = json.loads(line)
+            except ValueError:
+                LOGGER.warning('Invalid event in %s: %r', self.path, line)
+                continue
+            event_id = '{}:{}'.format(self._inode, self._file.tell())
+            events.append((event_id, event['event'], event['data']))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,192 @@
+#!/usr/bin/env python2
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compute several digests of a file in a single read.
+
+Files are read in large chunks. For large files every algorithm runs on its
+own thread (hashlib releases the GIL while hashing), and the next chunk is
+read while the previous one is hashed, so hashing with md5, sha1, sha256 and
+sha512 takes about as long as the slowest of them. Files are not
+memory-mapped: reading a mapped file truncated meanwhile, e.g. by a user
+editing a transfer, raises SIGBUS and kills the process.
+
+Every call returns the time it took, so the throughput of the hardware can
+be measured; running this module reports it for the given files::
+
+    python hashing.py -a md5 -a sha256 FILE...
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import collections
+import hashlib
+import logging
+import os
+import Queue
+import stat
+import sys
+import threading
+import time
+
+LOGGER = logging.getLogger('archivematica.common')
+
+# Size of the chunks read or hashed at once
+BUFFER_SIZE = 4 * 1024 * 1024
+# Inputs smaller than this are hashed on the calling thread
+THREADS_THRESHOLD = 16 * 1024 * 1024
+# Chunks read ahead of the slowest hashing thread
+READ_AHEAD = 4
+
+
+class HashResult(collections.namedtuple('HashResult', 'digests size seconds')):
+    """The hex digests by algorithm, the number of bytes hashed and the time
+    it took."""
+
+    @property
+    def throughput(self):
+        """Bytes hashed per second."""
+        return self.size / self.seconds if self.seconds else 0.0
+
+
+def _chunks_from_fileobj(f, buffer_size):
+    return iter(lambda: f.read(buffer_size), b'')
+
+
+def _hash_chunks(chunks, hashers):
+    for chunk in chunks:
+        for hasher in hashers:
+            hasher.update(chunk)
+
+
+def _hash_chunks_threaded(chunks, hashers):
+    """Feed the chunks to one thread per hasher."""
+    queues = [Queue.Queue(maxsize=READ_AHEAD) for _ in hashers]
+    errors = []
+
+    def work(hasher, queue):
+        while True:
+            chunk = queue.get()
+            if chunk is None:
+                return
+            if not errors:
+                try:
+                    hasher.update(chunk)
+                except Exception as err:
+                    errors.append(err)
+
+    threads = [threading.Thread(target=work, args=(hasher, queue))
+               for hasher, queue in zip(hashers, queues)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        for chunk in chunks:
+            if errors:
+                break
+            for queue in queues:
+                queue.put(chunk)
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _regular_file_size(f):
+    """Return the size of ``f`` if it is a regular file read from its
+    start, or None."""
+    # Wrappers like ``gzip.GzipFile`` expose the descriptor of what they read
+    if not isinstance(f, file) or f.tell() != 0:
+        return None
+    st = os.fstat(f.fileno())
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_size
+
+
+def hash_fileobj(f, algorithms, buffer_size=BUFFER_SIZE, threads=None):
+    """
+    Hash what is read from ``f`` with every algorithm in ``algorithms``.
+
+    :param f: A file object.
+    :param list algorithms: Names of ``hashlib`` algorithms, e.g. 'sha256'.
+    :param int buffer_size: Size of the chunks hashed at once.
+    :param bool threads: Whether to hash on worker threads; by default only
+                         regular files larger than ``THREADS_THRESHOLD``.
+    :returns: A HashResult.
+    """
+    start = time.time()
+    algorithms = list(algorithms)
+    hashers = [hashlib.new(algorithm) for algorithm in algorithms]
+    size = _regular_file_size(f)
+    if threads is None:
+        threads = size is not None and size >= THREADS_THRESHOLD
+    hash_chunks = _hash_chunks_threaded if threads else _hash_chunks
+
+    counted = []
+
+    def counting(chunks):
+        for chunk in chunks:
+            counted.append(len(chunk))
+            yield chunk
+    hash_chunks(counting(_chunks_from_fileobj(f, buffer_size)), hashers)
+    size = sum(counted)
+
+    digests = {algorithm: hasher.hexdigest() for algorithm, hasher in zip(algorithms, hashers)}
+    return HashResult(digests, size, time.time() - start)
+
+
+def hash_file(path, algorithms, buffer_size=BUFFER_SIZE, threads=None):
+    """Hash the file at ``path``; see ``hash_fileobj``."""
+    with open(path, 'rb') as f:
+        result = hash_fileobj(f, algorithms, buffer_size=buffer_size, threads=threads)
+    LOGGER.debug('Hashed %s (%d bytes) with %s in %.3fs (%.1f MB/s)', path, result.size,
+                 ', '.join(sorted(algorithms)), result.seconds, result.throughput / 1000000)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hash files and report the throughput.')
+    parser.add_argument('-a', '--algorithm', action='append', dest='algorithms',
+                        help='hashlib algorithm; may be repeated (default: sha256)')
+    parser.add_argument('--no-threads', action='store_false', dest='threads', default=None,
+                        help='hash on a single thread')
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args(argv)
+    algorithms = args.algorithms or ['sha256']
+
+    total_size = total_seconds = 0
+    for path in args.files:
+        result = hash_file(path, algorithms, threads=args.threads)
+        total_size += result.size
+        total_seconds += result.seconds
+        for algorithm in algorithms:
+            print('{}  {}  {}'.format(algorithm, result.digests[algorithm], path))
+        print('{} bytes in {:.3f}s ({:.1f} MB/s)'.format(result.size, result.seconds, result.throughput / 1000000))
+    if len(args.files) > 1:
+        total = HashResult({}, total_size, total_seconds)
+        print('Total: {} bytes in {:.3f}s ({:.1f} MB/s)'.format(total.size, total.seconds, total.throughput / 1000000))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
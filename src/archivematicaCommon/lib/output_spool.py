@@ -0,0 +1,131 @@
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Storage of large task output outside of the database.
+
+Output longer than a threshold is written gzip-compressed to the shared
+directory, under ``taskOutput/``, named after the SHA-256 digest of its
+content so that identical output is stored once. The Task row keeps the
+digest and the beginning of the output as a preview; ``open_output`` reads
+the whole output back. ``sweep`` removes the outputs no task refers to.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import hashlib
+import os
+import tempfile
+
+SPOOL_DIRECTORY = 'taskOutput'
+
+# Size of the chunks returned by iter_output
+CHUNK_SIZE = 64 * 1024
+
+
+def output_path(shared_directory, digest):
+    """Return the path of the spooled output with the given digest."""
+    return os.path.join(shared_directory, SPOOL_DIRECTORY, digest[:2], digest + '.gz')
+
+
+def store(shared_directory, content):
+    """
+    Write ``content`` to the spool, unless it is already there, and return
+    its digest.
+
+    :param str shared_directory: Path of the shared directory.
+    :param unicode content: Output of a task.
+    """
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+    digest = hashlib.sha256(content).hexdigest()
+    path = output_path(shared_directory, digest)
+    if os.path.exists(path):
+        return digest
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    # Write under a temporary name first so a partial file is never found
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=f) as gz:
+                gz.write(content)
+        os.chmod(tmp, 0o664)
+        os.rename(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+    return digest
+
+
+def spool(shared_directory, content, threshold, preview_size):
+    """
+    Spool ``content`` if it is longer than ``threshold`` characters.
+
+    :returns: The text to keep in the database, i.e. ``content`` itself or
+              its first ``preview_size`` characters, and the digest of the
+              spooled output, or an empty string if it was not spooled.
+    """
+    if not threshold or not content or len(content) <= threshold:
+        return content, ''
+    return content[:preview_size], store(shared_directory, content)
+
+
+def sweep(shared_directory, digests):
+    """
+    Remove the spooled outputs whose digest is not in ``digests``, i.e. of
+    tasks deleted since or whose results were never written, and the
+    temporary files of interrupted writes. Nothing may be spooled meanwhile.
+
+    :param str shared_directory: Path of the shared directory.
+    :param set digests: Digests of the outputs to keep.
+    :returns: The number of files removed.
+    """
+    removed = 0
+    for directory, _, filenames in os.walk(os.path.join(shared_directory, SPOOL_DIRECTORY)):
+        for filename in filenames:
+            digest, ext = os.path.splitext(filename)
+            if ext == '.gz' and digest in digests:
+                continue
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                if os.path.exists(os.path.join(directory, filename)):
+                    raise
+            else:
+                removed += 1
+    return removed
+
+
+def open_output(shared_directory, digest):
+    """Return a file object reading the spooled output with ``digest``."""
+    return gzip.open(output_path(shared_directory, digest), 'rb')
+
+
+def iter_output(shared_directory, digest, chunk_size=CHUNK_SIZE):
+    """Yield the spooled output with ``digest`` in chunks of bytes."""
+    with open_output(shared_directory, digest) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,67 @@
+#!/usr/bin/env python2
+# -*- coding: UTF-8 -*-
+"""
+Compare ReplacementDict.replace with the previous implementation, which
+called str.replace for every key.
+
+Run from the root of the repository with:
+
+    PYTHONPATH=src/archivematicaCommon/lib:src/dashboard/src \
+        python src/archivematicaCommon/tests/benchmark_dicts.py
+"""
+
+from __future__ import print_function
+
+import os
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.test')
+import django
+django.setup()
+
+from archivematicaFunctions import unicodeToStr
+from dicts import ReplacementDict
+
+KEYS = [
+    '%SIPUUID%', '%SIPName%', '%currentPath%', '%SIPDirectory%',
+    '%SIPDirectoryBasename%', '%SIPLogsDirectory%', '%SIPObjectsDirectory%',
+    '%relativeLocation%', '%fileUUID%', '%originalLocation%',
+    '%currentLocation%', '%fileDirectory%', '%fileGrpUse%', '%inputFile%',
+    '%fileFullName%', '%fileName%', '%fileExtension%', '%fileExtensionWithDot%',
+    '%tmpDirectory%', '%processingDirectory%', '%watchDirectoryPath%',
+    '%rejectedDirectory%',
+]
+
+# Arguments, standard output and standard error files of a task
+STRINGS = (
+    '"%fileUUID%" "%relativeLocation%" "%fileGrpUse%" "%SIPUUID%" "%SIPDirectory%" "%SIPLogsDirectory%"',
+    '%SIPLogsDirectory%fileFormatIdentification.log',
+    None,
+)
+
+
+def replace_sequentially(rd, *strings):
+    """ReplacementDict.replace before the keys were compiled to a regex."""
+    ret = []
+    for orig in strings:
+        if orig is not None:
+            orig = unicodeToStr(orig)
+            for key, value in rd.items():
+                orig = orig.replace(key, unicodeToStr(value))
+        ret.append(orig)
+    return ret
+
+
+def main(number=20000, repeat=5):
+    rd = ReplacementDict((key, u'/var/archivematica/sharedDirectory/currentlyProcessing/transfer-é/' + key.strip('%'))
+                         for key in KEYS)
+    assert rd.replace(*STRINGS) == replace_sequentially(rd, *STRINGS)
+    before = min(timeit.repeat(lambda: replace_sequentially(rd, *STRINGS), number=number, repeat=repeat))
+    after = min(timeit.repeat(lambda: rd.replace(*STRINGS), number=number, repeat=repeat))
+    print('{} keys, {} calls'.format(len(rd), number))
+    print('str.replace per key: {:.3f}s'.format(before))
+    print('compiled regex:      {:.3f}s ({:.1f}x)'.format(after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: UTF-8 -*-
+import os
+import tarfile
+
+import bagit
+import pytest
+
+import bag_verifier
+
+
+@pytest.fixture
+def bag(tmpdir):
+    tmpdir.join('file.txt').write('Some content')
+    tmpdir.mkdir('dir').join('other.bin').write(b'\x00' * 3000, mode='wb')
+    bagit.make_bag(str(tmpdir), checksum=['md5', 'sha256'])
+    return tmpdir
+
+
+def test_verify_valid_bag(bag):
+    report = bag_verifier.verify_bag(str(bag))
+    assert report.valid
+    assert report.checks == list(bag_verifier.CHECKS)
+    assert report.algorithms == ['md5', 'sha256']
+    assert report.files == 2
+    assert report.bytes == 3012
+    assert report.lines()[0] == 'Passed test: valid'
+
+
+def test_verify_bag_reports_every_problem(bag):
+    bag.join('data', 'file.txt').write('Other content')
+    bag.join('data', 'dir', 'other.bin').remove()
+    bag.join('data', 'unexpected.txt').write('')
+    report = bag_verifier.verify_bag(str(bag), workers=2)
+    assert not report.valid
+    assert not report.failed(bag_verifier.CHECK_VALID)
+    assert set(report.failed(bag_verifier.CHECK_COMPLETE)) == {
+        ('complete', os.path.join('data', 'dir', 'other.bin'), 'missing from the payload'),
+        ('complete', os.path.join('data', 'unexpected.txt'), 'not listed in manifest-md5.txt'),
+        ('complete', os.path.join('data', 'unexpected.txt'), 'not listed in manifest-sha256.txt'),
+    }
+    assert [p.message for p in report.failed(bag_verifier.CHECK_OXUM)] == ['Payload-Oxum is 3012.2, found 13.2']
+    mismatches = report.failed(bag_verifier.CHECK_PAYLOAD_MANIFESTS)
+    assert [p.path for p in mismatches] == [os.path.join('data', 'file.txt')] * 2
+    assert not report.failed(bag_verifier.CHECK_TAG_MANIFESTS)
+
+
+def test_verify_bag_checks_tag_manifests(bag):
+    bag.join('bag-info.txt').write('Contact-Name: Nobody\n', mode='a')
+    report = bag_verifier.verify_bag(str(bag))
+    assert [p.path for p in report.problems] == ['bag-info.txt', 'bag-info.txt']
+    assert report.failed(bag_verifier.CHECK_TAG_MANIFESTS) == report.problems
+
+
+def test_verify_bag_without_optional_tag_files(bag):
+    bag.join('bag-info.txt').remove()
+    for name in ('tagmanifest-md5.txt', 'tagmanifest-sha256.txt'):
+        bag.join(name).remove()
+    report = bag_verifier.verify_bag(str(bag))
+    assert report.valid
+    assert report.checks == [bag_verifier.CHECK_VALID, bag_verifier.CHECK_COMPLETE, bag_verifier.CHECK_PAYLOAD_MANIFESTS]
+
+
+def test_verify_invalid_bag(tmpdir):
+    tmpdir.join('file.txt').write('Not a bag')
+    report = bag_verifier.verify_bag(str(tmpdir))
+    assert {p.message for p in report.failed(bag_verifier.CHECK_VALID)} == {
+        'missing bag declaration', 'missing payload directory', 'no payload manifest'}
+
+
+def test_parse_manifest():
+    entries, invalid = bag_verifier.parse_manifest([
+        'ABCDEF  data/file.txt\n',
+        '012345 *data/with space.txt\n',
+        'fedcba data/line%0Abreak\n',
+        'nopath\n',
+    ])
+    assert entries == {
+        'data/file.txt': 'abcdef',
+        'data/with space.txt': '012345',
+        'data/line\nbreak': 'fedcba',
+    }
+    assert invalid == ['nopath']
+
+
+def _tar(bag, path, mode='w:gz'):
+    with tarfile.open(str(path), mode) as archive:
+        archive.add(str(bag), arcname='aip-uuid')
+    return str(path)
+
+
+@pytest.mark.parametrize('name, mode', [
+    ('aip.tar', 'w'),
+    ('aip.tar.gz', 'w:gz'),
+    ('aip.tar.bz2', 'w:bz2'),
+])
+def test_verify_archive(bag, tmpdir_factory, name, mode):
+    archive = _tar(bag, tmpdir_factory.mktemp('archive').join(name), mode)
+    report = bag_verifier.verify_archive(archive, algorithms=['md5'])
+    assert report.valid
+    assert report.files == 2
+    assert report.bytes == 3012
+
+
+def test_verify_archive_reports_problems(bag, tmpdir_factory):
+    bag.join('data', 'file.txt').write('Other content')
+    archive = _tar(bag, tmpdir_factory.mktemp('archive').join('aip.tar.gz'))
+    report = bag_verifier.verify_archive(archive, algorithms=['md5'])
+    assert {p.check for p in report.problems} == {bag_verifier.CHECK_OXUM, bag_verifier.CHECK_PAYLOAD_MANIFESTS}
+
+
+def test_verify_archive_requires_supported_format(tmpdir):
+    tmpdir.join('aip.zip').write('')
+    with pytest.raises(bag_verifier.StreamingNotSupported):
+        bag_verifier.verify_archive(str(tmpdir.join('aip.zip')))
+
+
+def test_parse_7z_listing():
+    listing = '\n'.join([
+        'Listing archive: aip.7z',
+        '',
+        '--',
+        'Path = aip.7z',
+        'Type = 7z',
+        '',
+        '----------',
+        'Path = aip-uuid',
+        'Size = 0',
+        'Attributes = D_ drwxr-xr-x',
+        '',
+        'Path = aip-uuid/bagit.txt',
+        'Size = 55',
+        'Attributes = A_ -rw-r--r--',
+        '',
+    ])
+    assert bag_verifier.parse_7z_listing(listing) == [
+        ('aip-uuid', 0, True),
+        ('aip-uuid/bagit.txt', 55, False),
+    ]
@@ -79,6 +79,28 @@ class TestDatabaseFunctions(TestCase):
         assert agents.get(id=2)
         assert agents.get(id=5)
 
+    # insertIntoEventsInBulk
+
+    def test_insert_into_events_in_bulk(self):
+        databaseFunctions.insertIntoEventsInBulk([
+            {'fileUUID': "88c8f115-80bc-4da4-a1e6-0158f5df13b9", 'eventIdentifierUUID': "bulk_sip_event", 'eventType': "fixity check"},
+            {'fileUUID': "1f4af873-8d60-4907-a92e-d1889e643524", 'eventIdentifierUUID': "bulk_transfer_event", 'eventType': "fixity check"},
+        ])
+        event = Event.objects.get(event_id="bulk_sip_event")
+        assert event.event_type == "fixity check"
+        assert set(event.agents.values_list('id', flat=True)) == {1, 2, 5}
+        event = Event.objects.get(event_id="bulk_transfer_event")
+        assert set(event.agents.values_list('id', flat=True)) == {1, 2, 10}
+
+    def test_insert_into_events_in_bulk_fetches_agents_once_per_unit(self):
+        events = [{'fileUUID': "88c8f115-80bc-4da4-a1e6-0158f5df13b9", 'eventIdentifierUUID': "bulk_event_{}".format(i)} for i in range(5)]
+        # Unit variable, Agents, Events insert, Events pks, agents insert
+        with self.assertNumQueries(5):
+            databaseFunctions.insertIntoEventsInBulk(events, sipUUID="742b0443-cf18-442a-94f9-6d5b4948227d")
+        for i in range(5):
+            agents = Event.objects.get(event_id="bulk_event_{}".format(i)).agents
+            assert set(agents.values_list('id', flat=True)) == {1, 2, 5}
+
     # getAccessionNumberFromTransfer
 
     def test_get_accession_number_from_transfer(self):
@@ -60,6 +60,26 @@ def test_replacementdict_replace():
     assert d.replace("%PREFIX%/bin/") == ["/usr/local/bin/"]
 
 
+def test_replacementdict_replace_multiple_strings():
+    d = ReplacementDict({"%fileUUID%": "uuid", "%fileGrpUse%": u"original", "%SIPName%": u"café"})
+    assert d.replace('"%fileUUID%" "%fileGrpUse%"', None, u"%SIPName%-%fileUUID%", "%unknown%") == \
+        ['"uuid" "original"', None, "caf\xc3\xa9-uuid", "%unknown%"]
+
+
+def test_replacementdict_replace_prefers_longest_key():
+    d = ReplacementDict({"%SIPDirectory%": "/sip/", "%SIPDirectoryBasename": "sip"})
+    assert d.replace("%SIPDirectoryBasename%/%SIPDirectory%") == ["sip%//sip/"]
+
+
+def test_replacementdict_replace_does_not_expand_values():
+    d = ReplacementDict({"%a%": "%b%", "%b%": "b", "(x)": "$1"})
+    assert d.replace("%a% %b% (x)") == ["%b% b $1"]
+
+
+def test_replacementdict_replace_empty():
+    assert ReplacementDict().replace(u"%a%", None) == ["%a%", None]
+
+
 def test_replacementdict_model_constructor_transfer():
     rd = ReplacementDict.frommodel(sip=TRANSFER, file_=FILE, type_='transfer')
 
@@ -1,10 +1,14 @@
+import json
 import os
+from xml.etree import ElementTree
 
+from elasticsearch import Elasticsearch
 import pytest
 import unittest
 import vcr
 
 import elasticSearchFunctions
+from externals import xmltodict
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -88,3 +92,129 @@ class TestElasticSearchFunctions(unittest.TestCase):
     def test_set_tags_fails_when_file_cant_be_found(self):
         with pytest.raises(elasticSearchFunctions.EmptySearchResultError):
             elasticSearchFunctions.set_file_tags(self.client, 'no_such_file', [])
+
+
+class FakeBulkClient(object):
+    """Records bulk requests and rejects documents with a ``bad`` field."""
+
+    def __init__(self):
+        self.transport = Elasticsearch().transport
+        self.cluster = self
+        self.health_checks = 0
+        self.requests = []
+
+    def health(self):
+        self.health_checks += 1
+        return {'status': 'green'}
+
+    def bulk(self, body):
+        documents = [json.loads(line) for line in body.splitlines()[1::2]]
+        self.requests.append(documents)
+        return {'items': [
+            {'index': {'status': 400, 'error': 'MapperParsingException'}}
+            if 'bad' in document else {'index': {'status': 201}}
+            for document in documents
+        ]}
+
+
+def test_bulk_index_chunks_documents():
+    client = FakeBulkClient()
+    documents = ({'number': i} for i in range(7))
+    assert elasticSearchFunctions.bulk_index(client, documents, 'aips', 'aipfile', chunk_size=3) == 7
+    assert [len(r) for r in client.requests] == [3, 3, 1]
+    assert client.health_checks == 1
+
+    client = FakeBulkClient()
+    documents = [{'text': 'x' * 100}] * 3
+    assert elasticSearchFunctions.bulk_index(client, documents, 'aips', 'aipfile', max_chunk_bytes=300) == 3
+    assert [len(r) for r in client.requests] == [1, 1, 1]
+
+
+def test_bulk_index_reports_failed_documents():
+    client = FakeBulkClient()
+    documents = [{'number': 1}, {'bad': True}, {'number': 2}]
+    with pytest.raises(elasticSearchFunctions.BulkIndexError) as excinfo:
+        elasticSearchFunctions.bulk_index(client, documents, 'aips', 'aipfile')
+    assert excinfo.value.indexed == 2
+    assert excinfo.value.errors == [({'bad': True}, 'MapperParsingException')]
+
+
+class FakeScrollClient(object):
+    """Serves ``hits`` a page of ``size`` hits at a time, like a scan."""
+
+    def __init__(self, hits):
+        self.hits = hits
+        self.search_params = None
+        self.scrolls = 0
+
+    def search(self, body, **params):
+        self.search_params = params
+        self.position = 0
+        return self._page(hits=[])
+
+    def scroll(self, scroll_id, scroll):
+        self.scrolls += 1
+        page = self.hits[self.position:self.position + self.search_params['size']]
+        self.position += len(page)
+        return self._page(hits=page)
+
+    def _page(self, hits):
+        return {
+            '_scroll_id': 'scroll',
+            '_shards': {'total': 1, 'failed': 0},
+            'hits': {'total': len(self.hits), 'hits': hits},
+        }
+
+
+def test_scan_all_results_returns_every_page():
+    hits = [{'_id': str(i)} for i in range(7)]
+    client = FakeScrollClient(hits)
+    results = elasticSearchFunctions.scan_all_results(
+        client, {'query': {'match_all': {}}}, index=['transfers'], doc_type=['transferfile'],
+        page_size=3, source=['relative_path', 'fileuuid'])
+    assert list(results) == hits
+    # Three full or partial pages, then an empty one
+    assert client.scrolls == 4
+    assert client.search_params['index'] == 'transfers'
+    assert client.search_params['_source'] == 'relative_path,fileuuid'
+
+
+def test_element_to_dict_matches_xmltodict():
+    root = ElementTree.fromstring(
+        '<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink">'
+        '<mets:file ID="file-1" ADMID="amd\t1"><mets:FLocat xlink:href="objects/caf&#233;.txt"/></mets:file>'
+        '<mets:file ID="file-2"/>'
+        '<note lang="en">first\n  line &amp; &lt;second&gt; &#160;<b>bold</b> tail\n</note>'
+        '<empty/>'
+        '</mets:mets>')
+    for element in [root] + list(root):
+        assert elasticSearchFunctions.element_to_dict(element) == xmltodict.parse(ElementTree.tostring(element))
+
+
+def test_element_to_dict_prefixes():
+    root = ElementTree.parse(os.path.join(THIS_DIR, 'fixtures', 'test-index-METS.xml')).getroot()
+    for element in root.iter():
+        assert elasticSearchFunctions.element_to_dict(element) == xmltodict.parse(ElementTree.tostring(element))
+
+
+def test_index_mets_file_metadata_streaming(monkeypatch):
+    monkeypatch.setattr(elasticSearchFunctions, 'get_dashboard_uuid', lambda: 'dashboard-uuid')
+    monkeypatch.setattr(elasticSearchFunctions.time, 'time', lambda: 1.0)
+    mets_path = os.path.join(THIS_DIR, 'fixtures', 'test-index-METS.xml')
+    documents = {}
+    for stream in (False, True):
+        client = FakeBulkClient()
+        indexed = elasticSearchFunctions.index_mets_file_metadata(
+            client, 'aip-uuid', mets_path, 'aips', 'aipfile', 'aip', stream=stream)
+        assert indexed == 3
+        documents[stream] = sorted(client.requests[0], key=lambda document: document['filePath'])
+
+    assert documents[True] == documents[False]
+    assert [document['FILEUUID'] for document in documents[True]] == [
+        '0b9cb5ad-a97b-4c35-8b09-7f2f8b8b6c5e',
+        '8f0e5d6a-3b2c-4d1e-9a8b-7c6d5e4f3a2b',
+        '5d2b7d3c-56a5-4d5e-9f6a-2a1a8b9c0d1e',
+    ]
+    assert documents[True][0]['isPartOf'] == 'AIC#1'
+    assert documents[True][0]['transferMetadata'] == [{'media_number': '42'}]
+    assert 'lots of tool output' not in json.dumps(documents[True])
@@ -0,0 +1,69 @@
+# -*- coding: UTF-8 -*-
+import pytest
+
+import event_log
+
+
+@pytest.fixture
+def shared(tmpdir):
+    tmpdir.mkdir('tmp')
+    return str(tmpdir)
+
+
+def read(reader):
+    return [(event, data) for _, event, data in reader.read()]
+
+
+def test_reader_follows_log(shared):
+    event_log.publish(shared, 'job', {'uuid': 'before'})
+    reader = event_log.EventReader(shared)
+    assert not reader.missed
+    assert read(reader) == []
+    event_log.publish(shared, 'job', {'uuid': 'after'})
+    event_log.publish(shared, 'removed', {'units': ['a']})
+    assert read(reader) == [('job', {'uuid': 'after'}), ('removed', {'units': ['a']})]
+    assert read(reader) == []
+
+
+def test_reader_starts_before_log_exists(shared):
+    reader = event_log.EventReader(shared)
+    event_log.publish(shared, 'reset', {})
+    assert read(reader) == [('reset', {})]
+
+
+def test_reader_resumes_after_last_event(shared):
+    reader = event_log.EventReader(shared)
+    event_log.publish(shared, 'job', {'uuid': '1'})
+    event_log.publish(shared, 'job', {'uuid': '2'})
+    first_id = reader.read()[0][0]
+    reader.close()
+
+    reader = event_log.EventReader(shared, last_event_id=first_id)
+    assert not reader.missed
+    assert read(reader) == [('job', {'uuid': '2'})]
+
+
+def test_reader_follows_rotation(shared, monkeypatch):
+    monkeypatch.setattr(event_log, 'MAX_SIZE', 100)
+    reader = event_log.EventReader(shared)
+    published = [('job', {'uuid': str(i) * 20}) for i in range(10)]
+    received = []
+    for i, (event, data) in enumerate(published):
+        event_log.publish(shared, event, data)
+        # Read after every other event, so that some are read from the
+        # rotated log
+        if i % 2:
+            received.extend(read(reader))
+    assert received == published
+
+
+def test_unknown_last_event_id_is_missed(shared):
+    event_log.publish(shared, 'job', {'uuid': '1'})
+    reader = event_log.EventReader(shared, last_event_id='1:2')
+    assert reader.missed
+    assert read(reader) == []
+
+
+def test_publish_without_log_directory(tmpdir):
+    # Logged, not raised
+    event_log.publish(str(tmpdir.join('missing')), 'job', {})
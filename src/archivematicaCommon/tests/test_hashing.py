@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+import gzip
+import hashlib
+import io
+
+import pytest
+
+import hashing
+
+CONTENT = b''.join(chr(i % 251) for i in range(300000))
+ALGORITHMS = ['md5', 'sha1', 'sha256', 'sha512']
+
+
+def expected(content):
+    return {algorithm: hashlib.new(algorithm, content).hexdigest() for algorithm in ALGORITHMS}
+
+
+@pytest.fixture
+def path(tmpdir):
+    path = tmpdir.join('file.bin')
+    path.write(CONTENT, mode='wb')
+    return str(path)
+
+
+@pytest.mark.parametrize('threads', [False, True])
+def test_hash_file(path, threads):
+    result = hashing.hash_file(path, ALGORITHMS, buffer_size=65536, threads=threads)
+    assert result.digests == expected(CONTENT)
+    assert result.size == len(CONTENT)
+    assert result.throughput >= 0
+
+
+@pytest.mark.parametrize('threads', [False, True])
+def test_hash_fileobj_stream(threads):
+    result = hashing.hash_fileobj(io.BytesIO(CONTENT), ALGORITHMS, buffer_size=65536, threads=threads)
+    assert result.digests == expected(CONTENT)
+    assert result.size == len(CONTENT)
+
+
+def test_hash_fileobj_leaves_file_at_end(path):
+    with open(path, 'rb') as f:
+        hashing.hash_fileobj(f, ['md5'])
+        assert f.read() == b''
+
+
+def test_hash_fileobj_reads_from_current_position(path):
+    with open(path, 'rb') as f:
+        f.read(1000)
+        result = hashing.hash_fileobj(f, ['sha256'])
+    assert result.digests == {'sha256': hashlib.sha256(CONTENT[1000:]).hexdigest()}
+
+
+def test_hash_fileobj_hashes_uncompressed_content(tmpdir):
+    path = str(tmpdir.join('file.gz'))
+    with gzip.open(path, 'wb') as f:
+        f.write(CONTENT)
+    with gzip.open(path, 'rb') as f:
+        result = hashing.hash_fileobj(f, ['md5'])
+    assert result.digests == {'md5': hashlib.md5(CONTENT).hexdigest()}
+    assert result.size == len(CONTENT)
+
+
+def test_hash_empty_file(tmpdir):
+    path = tmpdir.join('empty')
+    path.write(b'', mode='wb')
+    result = hashing.hash_file(str(path), ['md5'])
+    assert result.digests == {'md5': hashlib.md5(b'').hexdigest()}
+    assert result.size == 0
+
+
+def test_unknown_algorithm(path):
+    with pytest.raises(ValueError):
+        hashing.hash_file(path, ['nosuchhash'])
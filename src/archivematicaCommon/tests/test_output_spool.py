@@ -0,0 +1,41 @@
+# -*- coding: UTF-8 -*-
+import gzip
+import os
+
+import output_spool
+
+
+def test_spool_keeps_short_output(tmpdir):
+    assert output_spool.spool(str(tmpdir), u'short', 10, 2) == (u'short', '')
+    assert output_spool.spool(str(tmpdir), u'long output', 0, 2) == (u'long output', '')
+    assert tmpdir.listdir() == []
+
+
+def test_spool_long_output(tmpdir):
+    content = u'résumé\n' * 100
+    preview, digest = output_spool.spool(str(tmpdir), content, 10, 4)
+    assert preview == u'résu'
+    path = output_spool.output_path(str(tmpdir), digest)
+    assert path == os.path.join(str(tmpdir), 'taskOutput', digest[:2], digest + '.gz')
+    with gzip.open(path) as f:
+        assert f.read().decode('utf-8') == content
+    assert b''.join(output_spool.iter_output(str(tmpdir), digest, chunk_size=7)) == content.encode('utf-8')
+
+
+def test_store_is_content_addressed(tmpdir):
+    first = output_spool.store(str(tmpdir), u'same output')
+    second = output_spool.store(str(tmpdir), b'same output')
+    assert first == second
+    assert os.listdir(os.path.dirname(output_spool.output_path(str(tmpdir), first))) == [first + '.gz']
+
+
+def test_sweep_removes_unused_output(tmpdir):
+    kept = output_spool.store(str(tmpdir), u'kept output')
+    unused = output_spool.store(str(tmpdir), u'unused output')
+    directory = os.path.dirname(output_spool.output_path(str(tmpdir), kept))
+    tmpdir.join('taskOutput', kept[:2], 'interrupted.tmp').write('partial')
+
+    assert output_spool.sweep(str(tmpdir), {kept}) == 2
+    assert os.listdir(directory) == [kept + '.gz']
+    assert not os.path.exists(output_spool.output_path(str(tmpdir), unused))
+    assert output_spool.sweep(str(tmpdir), {kept}) == 0
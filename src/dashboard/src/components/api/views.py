@@ -35,6 +35,7 @@ from tastypie.authentication import ApiKeyAuthentication, MultiAuthentication, S
 
 # This project, alphabetical
 import archivematicaFunctions
+import event_log
 from contrib.mcp.client import MCPClient
 from components.filesystem_ajax import views as filesystem_ajax_views
 from components.unit import views as unit_views
@@ -540,6 +541,8 @@ def reingest(request, target):
     # TODO Clear DB of residual stuff related to SIP
     models.Task.objects.filter(job__sipuuid=sip_uuid).delete()
     models.Job.objects.filter(sipuuid=sip_uuid).delete()
+    models.UnitStatus.objects.filter(unit_uuid=sip_uuid).delete()
+    event_log.publish(django_settings.SHARED_DIRECTORY, 'removed', {'units': [sip_uuid]})
     models.SIP.objects.filter(uuid=sip_uuid).delete()  # Delete is cascading
     models.RightsStatement.objects.filter(metadataappliestoidentifier=sip_uuid).delete()  # Not actually a foreign key
     models.DublinCore.objects.filter(metadataappliestoidentifier=sip_uuid).delete()
@@ -267,12 +267,12 @@ def create_aic(request, *args, **kwargs):
             }
         }
         es_client = elasticSearchFunctions.get_client()
-        results = es_client.search(
+        results = elasticSearchFunctions.scan_all_results(
+            es_client,
             body=query,
             index='aips',
             doc_type='aip',
-            fields='uuid,name',
-            size=elasticSearchFunctions.MAX_QUERY_SIZE,  # return all records
+            source=['uuid', 'name'],
         )
 
         # Create files in staging directory with AIP information
@@ -295,11 +295,12 @@ def create_aic(request, *args, **kwargs):
         databaseFunctions.createSIP(mcp_destination, UUID=temp_uuid, sip_type='AIC')
 
         # Create files with filename = AIP UUID, and contents = AIP name
-        for aip in results['hits']['hits']:
-            filepath = os.path.join(destination, aip['fields']['uuid'][0])
+        for hit in results:
+            aip = hit['_source']
+            filepath = os.path.join(destination, aip['uuid'])
             with open(filepath, 'w') as f:
                 os.chmod(filepath, 0o660)
-                f.write(str(aip['fields']['name'][0]))
+                f.write(str(aip['name']))
 
         return redirect('components.ingest.views.aic_metadata_add', temp_uuid)
     else:
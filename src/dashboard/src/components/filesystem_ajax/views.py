@@ -25,7 +25,7 @@ import tempfile
 import uuid
 
 from django.conf import settings as django_settings
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 import django.http
 import django.template.defaultfilters
 from django.utils.translation import ugettext as _, ungettext
@@ -36,6 +36,7 @@ from main import models
 
 import archivematicaFunctions
 import databaseFunctions
+import elasticSearchFunctions
 import storageService as storage_service
 
 # for unciode sorting support
@@ -51,6 +52,12 @@ ORIGINAL_DIR = os.path.join(SHARED_DIRECTORY_ROOT, 'www', 'AIPsStore', 'transfer
 DEFAULT_BACKLOG_PATH = 'originals/'
 DEFAULT_ARRANGE_PATH = '/arrange/'
 
+# Transfer directories in the backlog end with the UUID of the transfer
+TRANSFER_UUID_REGEX = r'-([\w]{8}(?:-[\w]{4}){3}-[\w]{12})$'
+
+# Number of SIPArrange entries inserted per query
+ARRANGE_BATCH_SIZE = 500
+
 TRANSFER_TYPE_DIRECTORIES = {
     'standard': 'standardTransfer',
     'unzipped bag': 'baggitDirectory',
@@ -597,13 +604,61 @@ def move_files_within_arrange(sourcepath, destination):
         raise ValueError(_('You cannot drag and drop onto a file.'))
 
 
-def _get_arrange_directory_tree(backlog_uuid, original_path, arrange_path):
+def _get_backlog_file_uuids(original_path):
+    """ Returns the file and transfer UUIDs of all the files of the backlog
+    transfer original_path is in, keyed by their original_path, as indexed in
+    the transfers index.
+
+    The transfer is looked up with a single query, instead of a Storage
+    Service request per file. Returns an empty dict if the transfer can't be
+    looked up in the index.
+    """
+    if not django_settings.SEARCH_ENABLED:
+        return {}
+    transfer_dir = original_path.replace(DEFAULT_BACKLOG_PATH, '', 1).split('/', 1)[0]
+    match = re.search(TRANSFER_UUID_REGEX, transfer_dir)
+    if match is None:
+        return {}
+    query = {
+        'query': {
+            'term': {
+                'sipuuid': match.group(1),
+            }
+        }
+    }
+    try:
+        es_client = elasticSearchFunctions.get_client()
+        file_uuids = {}
+        for hit in elasticSearchFunctions.scan_all_results(
+                es_client,
+                body=query,
+                index='transfers',
+                doc_type='transferfile',
+                source=['relative_path', 'fileuuid', 'sipuuid']):
+            source = hit['_source']
+            if not source.get('fileuuid'):
+                continue
+            # relative_path starts with the name of the transfer directory
+            path_in_transfer = source['relative_path'].split('/', 1)[-1]
+            path = os.path.join(DEFAULT_BACKLOG_PATH, transfer_dir, path_in_transfer)
+            file_uuids[path] = (source['fileuuid'], source['sipuuid'])
+    except Exception:
+        logger.warning('Unable to look up the files of transfer %s in the transfers index', transfer_dir, exc_info=True)
+        return {}
+    return file_uuids
+
+
+def _get_arrange_directory_tree(backlog_uuid, original_path, arrange_path, file_uuids=None):
     """ Fetches all the children of original_path from backlog_uuid and creates
     an identical tree in arrange_path.
 
+    The UUIDs of the files are looked up in the transfers index, falling back
+    to the Storage Service for the files not found there.
+
     Helper function for copy_to_arrange.
     """
-    # TODO Use ElasticSearch, since that's where we're getting the original info from now?  Could be easier to get file UUID that way
+    if file_uuids is None:
+        file_uuids = _get_backlog_file_uuids(original_path)
     ret = []
     browse = storage_service.browse_location(backlog_uuid, original_path)
 
@@ -612,14 +667,17 @@ def _get_arrange_directory_tree(backlog_uuid, original_path, arrange_path):
     for entry in entries:
         if entry not in ('processingMCP.xml'):
             path = os.path.join(original_path, entry)
-            relative_path = path.replace(DEFAULT_BACKLOG_PATH, '', 1)
-            try:
-                file_info = storage_service.get_file_metadata(relative_path=relative_path)[0]
-            except storage_service.ResourceNotFound:
-                logger.warning('No file information returned from the Storage Service for file at relative_path: %s', relative_path)
-                raise
-            file_uuid = file_info['fileuuid']
-            transfer_uuid = file_info['sipuuid']
+            if path in file_uuids:
+                file_uuid, transfer_uuid = file_uuids[path]
+            else:
+                relative_path = path.replace(DEFAULT_BACKLOG_PATH, '', 1)
+                try:
+                    file_info = storage_service.get_file_metadata(relative_path=relative_path)[0]
+                except storage_service.ResourceNotFound:
+                    logger.warning('No file information returned from the Storage Service for file at relative_path: %s', relative_path)
+                    raise
+                file_uuid = file_info['fileuuid']
+                transfer_uuid = file_info['sipuuid']
             ret.append({
                 'original_path': path,
                 'arrange_path': os.path.join(arrange_path, entry),
@@ -640,7 +698,7 @@ def _get_arrange_directory_tree(backlog_uuid, original_path, arrange_path):
                 'file_uuid': None,
                 'transfer_uuid': None,
             })
-            ret.extend(_get_arrange_directory_tree(backlog_uuid, original_dir, arrange_dir))
+            ret.extend(_get_arrange_directory_tree(backlog_uuid, original_dir, arrange_dir, file_uuids))
 
     return ret
 
@@ -677,8 +735,7 @@ def copy_files_to_arrange(sourcepath, destination, fetch_children=False, backlog
             arrange_path = os.path.join(destination, '')
         else:
             # Strip UUID from transfer name
-            uuid_regex = r'-[\w]{8}(-[\w]{4}){3}-[\w]{12}$'
-            leaf_dir = re.sub(uuid_regex, '', leaf_dir)
+            leaf_dir = re.sub(TRANSFER_UUID_REGEX, '', leaf_dir)
             arrange_path = os.path.join(destination, leaf_dir) + '/'
             to_add.append({
                 'original_path': None,
@@ -713,20 +770,53 @@ def copy_files_to_arrange(sourcepath, destination, fetch_children=False, backlog
     logger.info('arrange_path: %s', arrange_path)
     logger.debug('files to be added: %s', to_add)
 
-    for entry in to_add:
+    _create_arrange_entries(to_add)
+
+
+def _create_arrange_entries(entries):
+    """ Creates SIPArrange entries for entries, in batches.
+
+    Files already arranged are skipped, since a file can only be in one SIP.
+    """
+    # TODO enforce uniqueness on arrange panel?
+    arranged = set()
+    original_paths = [e['original_path'] for e in entries if e['original_path'] is not None]
+    for i in range(0, len(original_paths), ARRANGE_BATCH_SIZE):
+        arranged.update(models.SIPArrange.objects.filter(
+            original_path__in=original_paths[i:i + ARRANGE_BATCH_SIZE]
+        ).values_list('original_path', flat=True))
+
+    arrange_entries = []
+    for entry in entries:
+        if entry['original_path'] is not None:
+            if entry['original_path'] in arranged:
+                logger.warning('Already arranged, not inserting: %s', entry)
+                continue
+            arranged.add(entry['original_path'])
+        arrange_entries.append(models.SIPArrange(
+            original_path=entry['original_path'],
+            arrange_path=entry['arrange_path'],
+            file_uuid=entry['file_uuid'],
+            transfer_uuid=entry['transfer_uuid'],
+        ))
+
+    for i in range(0, len(arrange_entries), ARRANGE_BATCH_SIZE):
+        batch = arrange_entries[i:i + ARRANGE_BATCH_SIZE]
         try:
-            # TODO enforce uniqueness on arrange panel?
-            models.SIPArrange.objects.create(
-                original_path=entry['original_path'],
-                arrange_path=entry['arrange_path'],
-                file_uuid=entry['file_uuid'],
-                transfer_uuid=entry['transfer_uuid'],
-            )
+            with transaction.atomic():
+                models.SIPArrange.objects.bulk_create(batch)
         except IntegrityError:
-            # FIXME Expecting this to catch duplicate original_paths, which
-            # we want to ignore since a file can only be in one SIP.  Needs
-            # to be updated not to ignore other classes of IntegrityErrors.
-            logger.exception('Integrity error inserting: %s', entry)
+            # Arranged concurrently: insert the batch one by one, to skip
+            # only the duplicates
+            for arrange_entry in batch:
+                try:
+                    with transaction.atomic():
+                        arrange_entry.save()
+                except IntegrityError:
+                    # FIXME Expecting this to catch duplicate original_paths, which
+                    # we want to ignore since a file can only be in one SIP.  Needs
+                    # to be updated not to ignore other classes of IntegrityErrors.
+                    logger.exception('Integrity error inserting: %s', arrange_entry)
 
 
 def copy_to_arrange(request, sources=None, destinations=None, fetch_children=False):
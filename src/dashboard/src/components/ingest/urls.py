@@ -42,6 +42,7 @@ urlpatterns = [
     url(r'^backlog/file/download/(?P<uuid>' + settings.UUID_REGEX + ')/', views.transfer_file_download),
     url(r'^backlog/$', views.transfer_backlog, {'ui': 'legacy'}),
     url(r'^appraisal_list/$', views.transfer_backlog, {'ui': 'appraisal'}),
+    url(r'^backlog/tree/$', views.backlog_tree),
 ]
 
 # Archivists Toolkit
@@ -17,11 +17,8 @@
 
 # Standard library, alphabetical by import source
 import base64
-import calendar
 import cPickle
-import json
 import logging
-from lxml import etree
 import os
 import requests
 import shutil
@@ -32,7 +29,6 @@ import uuid
 from django.conf import settings as django_settings
 from django.contrib import messages
 from django.core.urlresolvers import reverse
-from django.db import connection
 from django.forms.models import modelformset_factory
 from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import render, redirect
@@ -45,10 +41,11 @@ from django.views.generic import View
 
 # This project, alphabetical by import source
 from contrib import utils
-from contrib.mcp.client import MCPClient
 from components import advanced_search
 from components import helpers
 from components import decorators
+from components import status_feed
+from components.filesystem_ajax.views import DEFAULT_BACKLOG_PATH
 from components.ingest import forms as ingest_forms
 from components.ingest.views_NormalizationReport import getNormalizationReportQuery
 from main import forms, models
@@ -59,6 +56,13 @@ import storageService as storage_service
 
 logger = logging.getLogger('archivematica.dashboard')
 
+# Number of nodes per page of the backlog tree, by default and at most
+BACKLOG_TREE_PAGE_SIZE = 100
+BACKLOG_TREE_MAX_PAGE_SIZE = 1000
+
+# Fields of the backlog files used by the appraisal tab
+BACKLOG_FILE_FIELDS = ['relative_path', 'fileuuid', 'size', 'tags', 'bulk_extractor_reports', 'modification_date', 'format']
+
 """ @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
       Ingest
     @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@ """
@@ -94,68 +98,15 @@ def ingest_status(request, uuid=None):
     ``objects`` attribute that is an array of objects, each of which represents
     a single SIP. Each SIP object has a ``jobs`` attribute whose value is an
     array of objects, each of which represents a Job of the SIP.
+
+    Given the ``cursor`` of a previous response as ``since``, only the SIPs
+    changed in the meantime are returned; see ``status_feed.get_status``.
     """
-    sql = """
-        SELECT SIPUUID,
-                MAX(UNIX_TIMESTAMP(createdTime) + createdTimeDec) AS timestamp
-            FROM Jobs
-            WHERE unitType='unitSIP' AND NOT SIPUUID LIKE '%%None%%'
-            GROUP BY SIPUUID;"""
-    with connection.cursor() as cursor:
-        cursor.execute(sql)
-        sipuuids_and_timestamps = cursor.fetchall()
-    mcp_available = False
     try:
-        client = MCPClient()
-        mcp_status = etree.XML(client.list())
-        mcp_available = True
-    except Exception:
-        pass
-    objects = []
-    for sipuuid, timestamp in sipuuids_and_timestamps:
-        timestamp = float(timestamp)
-        item = {'sipuuid': sipuuid, 'timestamp': timestamp}
-        # Check if hidden (TODO: this method is slow)
-        if models.SIP.objects.is_hidden(sipuuid):
-            continue
-        jobs = models.Job.objects\
-            .filter(sipuuid=item['sipuuid'], subjobof='')\
-            .order_by('-createdtime', 'subjobof')
-        item['directory'] = utils.get_directory_name_from_job(jobs)
-        item['uuid'] = item['sipuuid']
-        item['id'] = item['sipuuid']
-        del item['sipuuid']
-        item['jobs'] = []
-        for job in jobs:
-            newJob = {}
-            item['jobs'].append(newJob)
-            newJob['uuid'] = job.jobuuid
-            newJob['type'] = job.jobtype
-            newJob['microservicegroup'] = job.microservicegroup
-            newJob['subjobof'] = job.subjobof
-            newJob['currentstep'] = job.currentstep
-            newJob['currentstep_label'] = job.get_currentstep_display()
-            newJob['timestamp'] = '%d.%s' % (calendar.timegm(job.createdtime.timetuple()), str(job.createdtimedec).split('.')[-1])
-            try:
-                mcp_status
-            except NameError:
-                pass
-            else:
-                xml_unit = mcp_status.xpath('choicesAvailableForUnit[UUID="%s"]' % job.jobuuid)
-                if xml_unit:
-                    xml_unit_choices = xml_unit[0].findall('choices/choice')
-                    choices = {}
-                    for choice in xml_unit_choices:
-                        choices[choice.find("chainAvailable").text] = choice.find("description").text
-                    newJob['choices'] = choices
-        objects.append(item)
-    response = {}
-    response['objects'] = objects
-    response['mcp'] = mcp_available
-    return HttpResponse(
-        json.dumps(response),
-        content_type='application/json'
-    )
+        since = status_feed.parse_cursor(request.GET.get('since'))
+    except ValueError:
+        return helpers.json_response({'error': True, 'message': '"since" must be a cursor.'}, status_code=400)
+    return helpers.json_response(status_feed.get_status('unitSIP', since))
 
 
 def ingest_sip_metadata_type_id():
@@ -442,19 +393,36 @@ def ingest_browse(request, browse_type, jobuuid):
     return render(request, 'ingest/aip_browse.html', locals())
 
 
+def _get_arranged_paths(prefix=None):
+    """
+    Returns the original paths of the files arranged in SIPs, along with all
+    their suffixes following a /, so that whether a backlog file is arranged
+    can be looked up by its relative path in a set.
+
+    Given the relative path `prefix` of a backlog directory, only the files
+    in it are returned.
+    """
+    arranged = set()
+    original_paths = models.SIPArrange.objects.filter(original_path__isnull=False)
+    if prefix is not None:
+        original_paths = original_paths.filter(
+            original_path__startswith=DEFAULT_BACKLOG_PATH + prefix)
+    original_paths = original_paths.values_list('original_path', flat=True)
+    for original_path in original_paths.iterator():
+        parts = original_path.split('/')
+        for i in range(len(parts)):
+            arranged.add('/'.join(parts[i:]))
+    return arranged
+
+
 def _es_results_to_directory_tree(path, return_list, not_draggable=False):
     # Helper function for transfer_backlog
     # Paths MUST be input in sorted order
     # Otherwise the same directory might end up with multiple entries
-    parts = path.split('/', 1)
-    if parts[0] in ('logs', 'metadata'):
-        not_draggable = True
-    if len(parts) == 1:  # path is a file
-        return_list.append({
-            'name': base64.b64encode(parts[0]),
-            'properties': {'not_draggable': not_draggable}})
-    else:
-        node, others = parts
+    parts = path.split('/')
+    for node in parts[:-1]:
+        if node in ('logs', 'metadata'):
+            not_draggable = True
         node = base64.b64encode(node)
         if not return_list or return_list[-1]['name'] != node:
             return_list.append({
@@ -462,19 +430,47 @@ def _es_results_to_directory_tree(path, return_list, not_draggable=False):
                 'properties': {'not_draggable': not_draggable, 'object count': 0},
                 'children': []})
         this_node = return_list[-1]
-        # Populate children list
-        _es_results_to_directory_tree(others, this_node['children'],
-                                      not_draggable=not_draggable)
-
-        # Generate count of all non-directory objects in this tree
-        object_count = sum(e['properties'].get('object count', 0) for e in this_node['children'])
-        object_count += len([e for e in this_node['children'] if not e.get('children')])
-
-        this_node['properties']['object count'] = object_count
-        this_node['properties']['display_string'] = '{} objects'.format(object_count)
+        # Count of all non-directory objects in this tree
+        this_node['properties']['object count'] += 1
+        this_node['properties']['display_string'] = '{} objects'.format(this_node['properties']['object count'])
         # If any children of a dir are draggable, the whole dir should be
         # Otherwise, directories have the draggability of their first child
         this_node['properties']['not_draggable'] = this_node['properties']['not_draggable'] and not_draggable
+        return_list = this_node['children']
+
+    if parts[-1] in ('logs', 'metadata'):
+        not_draggable = True
+    return_list.append({
+        'name': base64.b64encode(parts[-1]),
+        'properties': {'not_draggable': not_draggable}})
+
+
+def _backlog_file_record(record, not_draggable):
+    """
+    Returns the appraisal tab record of the file described by the
+    Elasticsearch record `record`.
+    """
+    child = {
+        'type': 'file',
+        'id': record['fileuuid'],
+        'title': base64.b64encode(record['relative_path'].rsplit('/', 1)[-1]),
+        'relative_path': base64.b64encode(record['relative_path']),
+        'size': record['size'],
+        'tags': record['tags'],
+        'bulk_extractor_reports': record['bulk_extractor_reports'],
+        'not_draggable': not_draggable
+    }
+
+    if record['modification_date']:
+        child['last_modified'] = record['modification_date']
+
+    if record['format']:
+        format = record['format'][0]  # TODO handle multiple format identifications
+        child['format'] = format['format']
+        child['group'] = format['group']
+        child['puid'] = format['puid']
+
+    return child
 
 
 def _es_results_to_appraisal_tab_format(record, record_map, directory_list, not_draggable=False):
@@ -527,13 +523,12 @@ def _es_results_to_appraisal_tab_format(record, record_map, directory_list, not_
             # directory_list should consist only of top-level records
             if is_transfer:
                 directory_list.append(dir_record)
+            else:
+                parent['children'].append(dir_record)
+                parent['object_count'] += 1
         else:
             dir_record = record_map[node]
 
-        if parent is not None and dir_record not in parent['children']:
-            parent['children'].append(dir_record)
-            parent['object_count'] += 1
-
         parent = dir_record
 
     dir_parts = dir.split('/')
@@ -542,30 +537,21 @@ def _es_results_to_appraisal_tab_format(record, record_map, directory_list, not_
     else:
         dir_not_draggable = not_draggable
 
-    child = {
-        'type': 'file',
-        'id': record['fileuuid'],
-        'title': base64.b64encode(fn),
-        'relative_path': base64.b64encode(record['relative_path']),
-        'size': record['size'],
-        'tags': record['tags'],
-        'bulk_extractor_reports': record['bulk_extractor_reports'],
-        'not_draggable': dir_not_draggable
-    }
-
-    if record['modification_date']:
-        child['last_modified'] = record['modification_date']
-
-    if record['format']:
-        format = record['format'][0]  # TODO handle multiple format identifications
-        child['format'] = format['format']
-        child['group'] = format['group']
-        child['puid'] = format['puid']
+    child = _backlog_file_record(record, dir_not_draggable)
 
     record_map[dir]['children'].append(child)
     record_map[dir]['object_count'] += 1
 
 
+def _backlog_filter(request, ui):
+    # GET params in SIP arrange can control whether files in metadata/ and
+    # logs/ are returned. Appraisal tab always hides these dirs and their files
+    # (for now).
+    if ui == 'appraisal' or request.GET.get('hidemetadatalogs'):
+        return elasticSearchFunctions.BACKLOG_FILTER_NO_MD_LOGS
+    return elasticSearchFunctions.BACKLOG_FILTER
+
+
 def transfer_backlog(request, ui):
     """
     AJAX endpoint to query for and return transfer backlog items.
@@ -575,12 +561,7 @@ def transfer_backlog(request, ui):
     # Get search parameters from request
     results = None
 
-    # GET params in SIP arrange can control whether files in metadata/ and
-    # logs/ are returned. Appraisal tab always hides these dirs and their files
-    # (for now).
-    backlog_filter = elasticSearchFunctions.BACKLOG_FILTER
-    if ui == 'appraisal' or request.GET.get('hidemetadatalogs'):
-        backlog_filter = elasticSearchFunctions.BACKLOG_FILTER_NO_MD_LOGS
+    backlog_filter = _backlog_filter(request, ui)
 
     if 'query' not in request.GET:
         query = elasticSearchFunctions.MATCH_ALL_QUERY.copy()
@@ -603,19 +584,17 @@ def transfer_backlog(request, ui):
 
     # perform search
     try:
-        results = elasticSearchFunctions.search_all_results(
+        results = [hit['_source'] for hit in elasticSearchFunctions.scan_all_results(
             es_client,
             body=query,
             index='transfers',
             doc_type='transferfile',
-        )
+            source=['relative_path'] if ui == 'legacy' else BACKLOG_FILE_FIELDS,
+        )]
     except:
         logger.exception('Error accessing index.')
         return HttpResponse('Error accessing index.')
 
-    # Convert results into a more workable form
-    results = elasticSearchFunctions.augment_raw_search_results(results)
-
     # Convert to a form JS can use:
     # [{'name': <filename>,
     #   'properties': {'not_draggable': False}},
@@ -632,14 +611,12 @@ def transfer_backlog(request, ui):
     # ]
     return_list = []
     directory_map = {}
+    arranged = _get_arranged_paths()
     # _es_results_to_directory_tree requires that paths MUST be sorted
     results.sort(key=lambda x: x['relative_path'])
     for path in results:
         # If a path is in SIPArrange.original_path, then it shouldn't be draggable
-        not_draggable = False
-        if models.SIPArrange.objects.filter(
-                original_path__endswith=path['relative_path']).exists():
-            not_draggable = True
+        not_draggable = path['relative_path'] in arranged
         if ui == 'legacy':
             _es_results_to_directory_tree(path['relative_path'], return_list, not_draggable=not_draggable)
         else:
@@ -657,6 +634,142 @@ def transfer_backlog(request, ui):
     return helpers.json_response(response)
 
 
+def _backlog_transfer_nodes(es_client, start, size):
+    """Returns a page of the transfers in the backlog, and their number."""
+    results = es_client.search(
+        index='transfers',
+        doc_type='transfer',
+        body={'query': {'term': {'status': 'backlog'}}},
+        from_=start,
+        size=size,
+        sort='name:asc',
+        _source='name,uuid,file_count',
+    )
+    nodes = []
+    for hit in results['hits']['hits']:
+        transfer = hit['_source']
+        name = transfer['name'].encode('utf-8')
+        nodes.append({
+            'type': 'transfer',
+            'id': transfer['uuid'],
+            'title': base64.b64encode(name),
+            'relative_path': base64.b64encode(name),
+            'not_draggable': False,
+            'file_count': transfer['file_count'],
+        })
+    return nodes, results['hits']['total']
+
+
+def _backlog_directory_nodes(es_client, transfer_uuid, path, backlog_filter):
+    """
+    Returns the directories and files in the directory of the backlog
+    transfer `transfer_uuid` with the relative path `path`, sorted by name.
+
+    A directory is draggable if any file in it is.
+    """
+    prefix = path.strip('/') + '/'
+    query = {
+        'query': {
+            'bool': {
+                'must': [
+                    {'term': {'sipuuid': transfer_uuid}},
+                ]
+            }
+        },
+        'filter': backlog_filter,
+    }
+    # Transfers indexes created before relative paths were also indexed
+    # unanalyzed can only be searched by transfer
+    if elasticSearchFunctions.transfer_file_paths_are_prefixable(es_client):
+        query['query']['bool']['must'].append(
+            {'prefix': {elasticSearchFunctions.RELATIVE_PATH_UNANALYZED: prefix}})
+    results = elasticSearchFunctions.scan_all_results(
+        es_client,
+        body=query,
+        index='transfers',
+        doc_type='transferfile',
+        source=BACKLOG_FILE_FIELDS,
+    )
+    arranged = _get_arranged_paths(prefix)
+
+    nodes = {}
+    directory_children = {}
+    for hit in results:
+        record = hit['_source']
+        not_draggable = record['relative_path'] in arranged
+        relative_path = record['relative_path'].encode('utf-8')
+        if not relative_path.startswith(prefix):
+            continue
+        path_in_transfer = relative_path.split('/', 1)[1]
+        not_draggable = not_draggable or path_in_transfer.split('/', 1)[0] in ('logs', 'metadata')
+        name, _, rest = relative_path[len(prefix):].partition('/')
+        if not rest:
+            nodes[name] = _backlog_file_record(record, not_draggable)
+            continue
+        if name not in nodes:
+            nodes[name] = {
+                'type': 'directory',
+                # have to artificially create directory IDs, since we don't assign those
+                'id': str(uuid.uuid4()),
+                'title': base64.b64encode(name),
+                'relative_path': base64.b64encode(prefix + name),
+                'not_draggable': not_draggable,
+                'object_count': 0,
+            }
+            directory_children[name] = set()
+        directory = nodes[name]
+        directory['not_draggable'] = directory['not_draggable'] and not_draggable
+        children = directory_children[name]
+        children.add(rest.split('/', 1)[0])
+        directory['object_count'] = len(children)
+
+    return [nodes[key] for key in sorted(nodes)]
+
+
+def backlog_tree(request):
+    """
+    AJAX endpoint returning a page of the children of a node of the transfer
+    backlog tree, so that large backlogs can be expanded lazily.
+
+    Without `transfer`, the nodes are the transfers in the backlog. Given the
+    UUID of a `transfer` and the base64-encoded `relative_path` of the
+    transfer or one of its directories as `path`, they are the directories
+    and files in that directory. Nodes are in the format of the appraisal
+    tab, without the children of directories.
+
+    `page` (starting at 1) and `page_size` select the page to return.
+    """
+    try:
+        page_number = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', BACKLOG_TREE_PAGE_SIZE))
+        path = base64.b64decode(request.GET.get('path', ''))
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest(_('Invalid page or path.'))
+    if page_number < 1 or not 0 < page_size <= BACKLOG_TREE_MAX_PAGE_SIZE:
+        return HttpResponseBadRequest(_('Invalid page or path.'))
+    start = (page_number - 1) * page_size
+
+    es_client = elasticSearchFunctions.get_client()
+    transfer_uuid = request.GET.get('transfer')
+    try:
+        if transfer_uuid:
+            nodes = _backlog_directory_nodes(es_client, transfer_uuid, path, _backlog_filter(request, 'tree'))
+            total = len(nodes)
+            nodes = nodes[start:start + page_size]
+        else:
+            nodes, total = _backlog_transfer_nodes(es_client, start, page_size)
+    except:
+        logger.exception('Error accessing index.')
+        return HttpResponse('Error accessing index.')
+
+    return helpers.json_response({
+        'page': page_number,
+        'page_size': page_size,
+        'total': total,
+        'objects': nodes,
+    })
+
+
 def transfer_file_download(request, uuid):
     # get file basename
     try:
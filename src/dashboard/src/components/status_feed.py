@@ -0,0 +1,134 @@
+# This file is part of Archivematica.
+#
+# Copyright 2010-2017 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Status of the transfers and SIPs shown on the dashboard.
+
+The units are read from their summaries (``UnitStatus``), which MCPServer
+updates as their jobs are created and change status. Every response carries
+a ``cursor``; given back as ``since``, only the units changed in the meantime
+are returned, along with the UUIDs of the units ``removed`` (hidden) from the
+dashboard.
+"""
+
+import calendar
+import logging
+
+from lxml import etree
+
+from contrib import utils
+from contrib.mcp.client import MCPClient
+from main import models
+
+logger = logging.getLogger('archivematica.dashboard')
+
+# Units changed this many microseconds before the latest change returned are
+# returned again with the next response, in case their changes were committed
+# late. Revisions are read from the clock of the database, so the cursor is
+# derived from them rather than from the clock of the dashboard.
+CURSOR_OVERLAP = 5 * 1000000
+
+
+def parse_cursor(value):
+    """Return the cursor given as ``since``, or None. Raise ValueError if it
+    is not a cursor."""
+    if not value:
+        return None
+    return int(value)
+
+
+def get_choices():
+    """
+    Return the choices awaiting a decision, as dicts of the descriptions of
+    the chains to choose from keyed by job UUID, and whether MCPServer could
+    be reached.
+    """
+    try:
+        mcp_status = etree.XML(MCPClient().list())
+    except Exception:
+        logger.debug('Cannot list the choices awaiting a decision', exc_info=True)
+        return {}, False
+    choices = {}
+    for unit in mcp_status.findall('choicesAvailableForUnit'):
+        choices[unit.findtext('UUID')] = {
+            choice.findtext('chainAvailable'): choice.findtext('description')
+            for choice in unit.findall('choices/choice')}
+    return choices, True
+
+
+def _job(job, choices):
+    item = {
+        'uuid': job.jobuuid,
+        'type': job.jobtype,
+        'microservicegroup': job.microservicegroup,
+        'subjobof': job.subjobof,
+        'currentstep': job.currentstep,
+        'currentstep_label': job.get_currentstep_display(),
+        'timestamp': '%d.%s' % (calendar.timegm(job.createdtime.timetuple()), str(job.createdtimedec).split('.')[-1]),
+    }
+    if job.jobuuid in choices:
+        item['choices'] = choices[job.jobuuid]
+    return item
+
+
+def get_status(unit_type, since=None):
+    """
+    Return the status of the units of ``unit_type`` (unitTransfer or unitSIP)
+    changed since the cursor ``since``, or of all of them.
+
+    :returns: A dict with the list of units (``objects``) and their jobs, the
+              UUIDs of the units ``removed`` since ``since``, whether MCPServer
+              could be reached (``mcp``) and the ``cursor`` of the response.
+    """
+    statuses = models.UnitStatus.objects.filter(unit_type=unit_type).exclude(unit_uuid__icontains='None')
+    if since is None:
+        statuses = statuses.filter(hidden=False)
+    else:
+        statuses = statuses.filter(revision__gt=since)
+    statuses = list(statuses.order_by('-timestamp'))
+
+    jobs = {}
+    visible = [status.unit_uuid for status in statuses if not status.hidden]
+    if visible:
+        for job in models.Job.objects.filter(sipuuid__in=visible, subjobof='').order_by('-createdtime', 'subjobof'):
+            jobs.setdefault(job.sipuuid, []).append(job)
+    # Listed once, for all the units
+    choices, mcp_available = get_choices()
+
+    objects = []
+    for status in statuses:
+        if status.hidden:
+            continue
+        objects.append({
+            'id': status.unit_uuid,
+            'uuid': status.unit_uuid,
+            'directory': utils.get_directory_name(status.directory or '', default=status.unit_uuid),
+            'timestamp': float(status.timestamp),
+            'jobs': [_job(job, choices) for job in jobs.get(status.unit_uuid, [])],
+        })
+    cursor = since
+    # Until the choices can be listed, the same units are returned again
+    if mcp_available and statuses:
+        cursor = max(status.revision for status in statuses) - CURSOR_OVERLAP
+        if since is not None:
+            cursor = max(cursor, since)
+    return {
+        'objects': objects,
+        'removed': [status.unit_uuid for status in statuses if status.hidden],
+        'mcp': mcp_available,
+        'cursor': cursor,
+    }
@@ -15,24 +15,21 @@
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 
-import calendar
 import json
 import logging
-from lxml import etree
 import os
 from uuid import uuid4
 
-from django.db.models import Max
 from django.conf import settings as django_settings
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.utils.translation import ugettext as _
 
-from contrib.mcp.client import MCPClient
 from contrib import utils
 
 from main import models
 from components import helpers
+from components import status_feed
 from components.ingest.forms import DublinCoreMetadataForm
 import components.decorators as decorators
 import storageService as storage_service
@@ -128,57 +125,18 @@ def component(request, uuid):
 
 
 def status(request, uuid=None):
-    # Equivalent to: "SELECT SIPUUID, MAX(createdTime) AS latest FROM Jobs GROUP BY SIPUUID
-    objects = models.Job.objects.filter(hidden=False, subjobof='', unittype__exact='unitTransfer').values('sipuuid').annotate(timestamp=Max('createdtime')).exclude(sipuuid__icontains='None').order_by('-timestamp')
-    mcp_available = False
+    """Returns the status of the transfers as a JSON object; see
+    ``status_feed.get_status``. Given the ``cursor`` of a previous response
+    as ``since``, only the transfers changed in the meantime are returned.
+    """
     try:
-        client = MCPClient()
-        mcp_status = etree.XML(client.list())
-        mcp_available = True
-    except Exception:
-        pass
-
-    def encoder(obj):
-        items = []
-        for item in obj:
-            # Check if hidden (TODO: this method is slow)
-            if models.Transfer.objects.is_hidden(item['sipuuid']):
-                continue
-            jobs = models.Job.objects.filter(sipuuid=item['sipuuid'], subjobof='').order_by('-createdtime', 'subjobof')
-            item['directory'] = os.path.basename(utils.get_directory_name_from_job(jobs))
-            item['timestamp'] = calendar.timegm(item['timestamp'].timetuple())
-            item['uuid'] = item['sipuuid']
-            item['id'] = item['sipuuid']
-            del item['sipuuid']
-            item['jobs'] = []
-            for job in jobs:
-                newJob = {}
-                item['jobs'].append(newJob)
-                newJob['uuid'] = job.jobuuid
-                newJob['type'] = job.jobtype
-                newJob['microservicegroup'] = job.microservicegroup
-                newJob['subjobof'] = job.subjobof
-                newJob['currentstep'] = job.currentstep
-                newJob['currentstep_label'] = job.get_currentstep_display()
-                newJob['timestamp'] = '%d.%s' % (calendar.timegm(job.createdtime.timetuple()), str(job.createdtimedec).split('.')[-1])
-                try:
-                    mcp_status
-                except NameError:
-                    pass
-                else:
-                    xml_unit = mcp_status.xpath('choicesAvailableForUnit[UUID="%s"]' % job.jobuuid)
-                    if xml_unit:
-                        xml_unit_choices = xml_unit[0].findall('choices/choice')
-                        choices = {}
-                        for choice in xml_unit_choices:
-                            choices[choice.find("chainAvailable").text] = choice.find("description").text
-                        newJob['choices'] = choices
-            items.append(item)
-        return items
-    response = {}
-    response['objects'] = objects
-    response['mcp'] = mcp_available
-    return HttpResponse(json.JSONEncoder(default=encoder).encode(response), content_type='application/json')
+        since = status_feed.parse_cursor(request.GET.get('since'))
+    except ValueError:
+        return helpers.json_response({'error': True, 'message': '"since" must be a cursor.'}, status_code=400)
+    response = status_feed.get_status('unitTransfer', since)
+    for item in response['objects']:
+        item['directory'] = os.path.basename(item['directory'])
+    return helpers.json_response(response)
 
 
 def transfer_metadata_type_id():
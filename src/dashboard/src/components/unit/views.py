@@ -16,12 +16,14 @@
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 import logging
 
+from django.conf import settings as django_settings
 import django.http
 from django.shortcuts import render
 
 from components import helpers
 from contrib import utils
 from main import models
+import event_log
 
 LOGGER = logging.getLogger('archivematica.dashboard')
 
@@ -86,6 +88,8 @@ def mark_hidden(request, unit_type, unit_uuid):
         unit = unit_model.objects.get(uuid=unit_uuid)
         unit.hidden = True
         unit.save()
+        models.UnitStatus.objects.changed([unit_uuid], hidden=True)
+        event_log.publish(django_settings.SHARED_DIRECTORY, 'removed', {'units': [unit_uuid]})
         response = {'removed': True}
         return helpers.json_response(response)
     except Exception:
@@ -113,6 +117,8 @@ def mark_completed_hidden(request, unit_type):
             elif unit_type == 'ingest':
                 unit_model = models.SIP
             unit_model.objects.filter(uuid__in=completed).update(hidden=True)
+            models.UnitStatus.objects.changed(completed, hidden=True)
+            event_log.publish(django_settings.SHARED_DIRECTORY, 'removed', {'units': completed})
         response = {'removed': completed}
         return helpers.json_response(response)
     except Exception:
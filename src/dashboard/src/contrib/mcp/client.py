@@ -85,3 +85,26 @@ class MCPClient:
             return cPickle.loads(completed_job_request.result)
         elif completed_job_request.state == gearman.JOB_FAILED:
             raise RPCError("getNotifications failed (check MCPServer logs)")
+
+    def scheduler_stats(self):
+        """Return the queue depth, thread counts and wait times of the
+        MCPServer executors, and the number of jobs in flight in Gearman."""
+        gm_client = gearman.GearmanClient([self.server])
+        completed_job_request = gm_client.submit_job("getSchedulerStats", "", None)
+        gm_client.shutdown()
+        if completed_job_request.state == gearman.JOB_COMPLETE:
+            return cPickle.loads(completed_job_request.result)
+        elif completed_job_request.state == gearman.JOB_FAILED:
+            raise RPCError("getSchedulerStats failed (check MCPServer logs)")
+
+    def reload_workflow(self):
+        """Make MCPServer load the workflow from the database again, e.g.
+        after changing the workflow tables. Return the number of rows of
+        each kind loaded."""
+        gm_client = gearman.GearmanClient([self.server])
+        completed_job_request = gm_client.submit_job("reloadWorkflow", "", None)
+        gm_client.shutdown()
+        if completed_job_request.state == gearman.JOB_COMPLETE:
+            return cPickle.loads(completed_job_request.result)
+        elif completed_job_request.state == gearman.JOB_FAILED:
+            raise RPCError("reloadWorkflow failed (check MCPServer logs)")
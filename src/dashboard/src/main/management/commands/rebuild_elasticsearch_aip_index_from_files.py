@@ -168,15 +168,19 @@ def processAIPThenDeleteMETSFile(path, temp_dir, es_client,
             identifiers=[],  # TODO get these
             size=aip_info[0]['size'],
         )
-        elasticSearchFunctions.index_mets_file_metadata(
-            client=es_client,
-            uuid=aip_uuid,
-            metsFilePath=path_to_mets,
-            index='aips',
-            type_='aipfile',
-            sipName=aip_name,
-            identifiers=[],  # TODO get these
-        )
+        try:
+            elasticSearchFunctions.index_mets_file_metadata(
+                client=es_client,
+                uuid=aip_uuid,
+                metsFilePath=path_to_mets,
+                index='aips',
+                type_='aipfile',
+                sipName=aip_name,
+                identifiers=[],  # TODO get these
+            )
+        except elasticSearchFunctions.BulkIndexError as err:
+            print('Error indexing the files of AIP', aip_uuid, ':', err,
+                  file=sys.stderr)
 
 
 def is_hex(string):
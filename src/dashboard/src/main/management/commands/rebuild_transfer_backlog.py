@@ -128,10 +128,14 @@ class Command(DashboardCommand):
             storageService.reindex_file(transfer_uuid)
 
     def index_files(self, es_client, transfer_path, transfer_uuid):
-        transfer_path = elasticSearchFunctions.index_files(
+        exit_code = elasticSearchFunctions.index_files(
             es_client,
             'transfers',
             'transferfile',
             transfer_uuid,
             os.path.join(transfer_path, ''),  # Expected by index_files().
             status='backlog')
+        if exit_code != 0:
+            self.warning(
+                'Some files of transfer {} could not be indexed.'.format(
+                    transfer_uuid))
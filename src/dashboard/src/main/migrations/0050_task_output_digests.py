@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0049_change_pointer_file_filegrpuse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='stdout_digest',
+            field=models.CharField(default='', max_length=64, db_column=b'stdOutDigest', blank=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='stderror_digest',
+            field=models.CharField(default='', max_length=64, db_column=b'stdErrorDigest', blank=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import calendar
+
+from django.db import migrations, models
+
+import main.models
+
+
+def data_migration_up(apps, schema_editor):
+    """Summarize the existing units from their jobs."""
+    Job = apps.get_model('main', 'Job')
+    SIP = apps.get_model('main', 'SIP')
+    Transfer = apps.get_model('main', 'Transfer')
+    UnitStatus = apps.get_model('main', 'UnitStatus')
+
+    hidden = set(SIP.objects.filter(hidden=True).values_list('uuid', flat=True))
+    hidden.update(Transfer.objects.filter(hidden=True).values_list('uuid', flat=True))
+
+    statuses = {}
+    jobs = Job.objects.order_by('createdtime', 'createdtimedec').values_list(
+        'sipuuid', 'unittype', 'subjobof', 'directory', 'createdtime', 'createdtimedec')
+    for unit_uuid, unit_type, subjobof, directory, createdtime, createdtimedec in jobs.iterator():
+        status = statuses.get(unit_uuid)
+        if status is None:
+            status = statuses[unit_uuid] = UnitStatus(
+                unit_uuid=unit_uuid, unit_type=unit_type,
+                hidden=unit_uuid in hidden, revision=0)
+        if not subjobof:
+            status.directory = directory
+            status.timestamp = calendar.timegm(createdtime.utctimetuple()) + createdtimedec
+    UnitStatus.objects.bulk_create(statuses.values(), batch_size=1000)
+    UnitStatus.objects.update(revision=main.models.Revision())
+
+
+def data_migration_down(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0050_task_output_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitStatus',
+            fields=[
+                ('unit_uuid', models.CharField(max_length=36, serialize=False, primary_key=True, db_column='unitUUID')),
+                ('unit_type', models.CharField(max_length=50, db_column='unitType')),
+                ('directory', models.TextField(null=True, blank=True)),
+                ('timestamp', models.DecimalField(default=0, max_digits=26, decimal_places=10)),
+                ('hidden', models.BooleanField(default=False)),
+                ('revision', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'UnitStatuses',
+            },
+        ),
+        migrations.RunPython(data_migration_up, data_migration_down),
+    ]
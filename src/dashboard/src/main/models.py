@@ -26,7 +26,7 @@ import logging
 # Core Django, alphabetical by import source
 from django import forms
 from django.contrib.auth.models import User
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.translation import ugettext as _, ugettext_lazy as _l
@@ -552,6 +552,74 @@ class Job(models.Model):
         db_table = u'Jobs'
 
 
+class Revision(models.Func):
+    """
+    The current time of the database in microseconds, the revision of a
+    change. Read from the database rather than from the clock of the host
+    making the change (MCPServer or the dashboard), so that the revisions
+    follow the order of the changes whatever the clocks of those hosts.
+    """
+    template = 'CAST(UNIX_TIMESTAMP(NOW(6)) * 1000000 AS SIGNED)'
+
+    def __init__(self):
+        super(Revision, self).__init__(output_field=models.BigIntegerField())
+
+    def as_sqlite(self, compiler, connection):
+        return "CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)", []
+
+
+class UnitStatusManager(models.Manager):
+    def job_created(self, unit_uuid, unit_type, directory=None, timestamp=None):
+        """
+        Record the creation of a job of the unit, creating its summary with
+        ``unit_type`` for its first job. ``directory`` and ``timestamp`` are
+        only given for top-level jobs.
+        """
+        fields = {'revision': Revision()}
+        if timestamp is not None:
+            fields.update(directory=directory, timestamp=timestamp)
+        if self.filter(unit_uuid=unit_uuid).update(**fields):
+            return
+        # Inserts cannot be given expressions: the revision is set right after
+        values = dict(fields, revision=0)
+        try:
+            with transaction.atomic():
+                self.create(unit_uuid=unit_uuid, unit_type=unit_type, **values)
+        except IntegrityError:
+            # Created concurrently
+            pass
+        self.filter(unit_uuid=unit_uuid).update(**fields)
+
+    def changed(self, unit_uuids, **fields):
+        """Record a change to the units, e.g. to the status of their jobs."""
+        return self.filter(unit_uuid__in=unit_uuids).update(revision=Revision(), **fields)
+
+
+class UnitStatus(models.Model):
+    """
+    Summary of a unit on the dashboard, updated by MCPServer as its jobs are
+    created and change status, so that the dashboard can find the units that
+    changed since it last looked without going through their jobs.
+    """
+    unit_uuid = models.CharField(max_length=36, primary_key=True, db_column='unitUUID')
+    # The unitType of the first job of the unit
+    unit_type = models.CharField(max_length=50, db_column='unitType')
+    # Directory and creation time (in seconds) of the latest top-level job
+    directory = models.TextField(blank=True, null=True)
+    timestamp = models.DecimalField(max_digits=26, decimal_places=10, default=0)
+    hidden = models.BooleanField(default=False)
+    # Time of the latest change in microseconds, by the database clock
+    revision = models.BigIntegerField(db_index=True)
+
+    objects = UnitStatusManager()
+
+    class Meta:
+        db_table = u'UnitStatuses'
+
+    def __unicode__(self):
+        return u'%(type)s %(uuid)s' % {'type': self.unit_type, 'uuid': self.unit_uuid}
+
+
 class Task(models.Model):
     taskuuid = models.CharField(max_length=36, primary_key=True, db_column='taskUUID')
     job = models.ForeignKey('Job', db_column='jobuuid', to_field='jobuuid')
@@ -572,6 +640,10 @@ class Task(models.Model):
     # stdout and stderror actually `longblobs` in the database
     stdout = models.TextField(db_column='stdOut', blank=True)
     stderror = models.TextField(db_column='stdError', blank=True)
+    # SHA-256 digests of the whole stdout and stderror, when they were too
+    # long to be stored above and were spooled by MCPServer; see output_spool
+    stdout_digest = models.CharField(max_length=64, db_column='stdOutDigest', blank=True, default='')
+    stderror_digest = models.CharField(max_length=64, db_column='stdErrorDigest', blank=True, default='')
     exitcode = models.BigIntegerField(db_column='exitCode', null=True, blank=True)
 
     class Meta:
@@ -34,6 +34,7 @@ urlpatterns = [
     # Jobs and tasks (is part of ingest)
     url(r'tasks/(?P<uuid>' + settings.UUID_REGEX + ')/$', views.tasks),
     url(r'task/(?P<uuid>' + settings.UUID_REGEX + ')/$', views.task),
+    url(r'task/(?P<uuid>' + settings.UUID_REGEX + ')/(?P<stream>stdout|stderr)/$', views.task_output),
 
     # Access
     url(r'access/$', views.access_list),
@@ -41,6 +42,7 @@ urlpatterns = [
 
     # JSON feeds
     url(r'status/$', views.status),
+    url(r'status/events/$', views.status_events),
     url(r'formdata/(?P<type>\w+)/(?P<parent_id>\d+)/(?P<delete_id>\d+)/$', views.formdata_delete),
     url(r'formdata/(?P<type>\w+)/(?P<parent_id>\d+)/$', views.formdata),
 
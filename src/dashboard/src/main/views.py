@@ -15,8 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 
+import itertools
+import json
+import time
+
 from django.conf import settings as django_settings
 from django.core.urlresolvers import reverse
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.utils.translation import get_language, ugettext as _
@@ -30,6 +35,8 @@ from main import models
 from lxml import etree
 from components import helpers
 from archivematicaFunctions import escape
+import event_log
+import output_spool
 
 
 @cache_page(86400, key_prefix='js18n-%s' % get_language())
@@ -87,6 +94,50 @@ def status(request):
     return helpers.json_response(response)
 
 
+# Seconds between two reads of the event log, between two keep-alive
+# comments, and before the stream is closed for the browser to reconnect
+EVENTS_POLL_INTERVAL = 0.5
+EVENTS_KEEPALIVE_INTERVAL = 15
+EVENTS_STREAM_DURATION = 300
+
+
+def _event_stream(reader):
+    try:
+        yield 'retry: 3000\n\n'
+        if reader.missed:
+            yield 'event: reset\ndata: {}\n\n'
+        now = time.time()
+        deadline = now + EVENTS_STREAM_DURATION
+        keepalive = now + EVENTS_KEEPALIVE_INTERVAL
+        while now < deadline:
+            events = reader.read()
+            for event_id, event, data in events:
+                yield 'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, event, json.dumps(data))
+            if events:
+                keepalive = now + EVENTS_KEEPALIVE_INTERVAL
+            elif now >= keepalive:
+                yield ': keep-alive\n\n'
+                keepalive = now + EVENTS_KEEPALIVE_INTERVAL
+            time.sleep(EVENTS_POLL_INTERVAL)
+            now = time.time()
+    finally:
+        reader.close()
+
+
+def status_events(request):
+    """
+    Stream the job lifecycle events published by MCPServer (see ``events``
+    in MCPServer) as server-sent events. A ``reset`` event means that events
+    were missed and the status should be reloaded.
+    """
+    reader = event_log.EventReader(django_settings.SHARED_DIRECTORY, request.META.get('HTTP_LAST_EVENT_ID'))
+    response = StreamingHttpResponse(_event_stream(reader), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Do not buffer the stream in nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 """ @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
       Access
     @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@ """
@@ -135,6 +186,9 @@ def tasks(request, uuid):
     if (len(objects) == 0):
         return tasks_subjobs(request, uuid)
 
+    page = helpers.pager(objects, django_settings.TASKS_PER_PAGE, request.GET.get('page', None))
+    objects = page.object_list
+
     # Filenames can be any encoding - we want to be able to display
     # unicode, while just displaying unicode replacement characters
     # for any other encoding present.
@@ -144,9 +198,6 @@ def tasks(request, uuid):
         item.stdout = escape(item.stdout)
         item.stderror = escape(item.stderror)
 
-    page = helpers.pager(objects, django_settings.TASKS_PER_PAGE, request.GET.get('page', None))
-    objects = page.object_list
-
     # figure out duration in seconds
     for object in objects:
         object.duration = helpers.task_duration_in_seconds(object)
@@ -154,6 +205,22 @@ def tasks(request, uuid):
     return render(request, 'main/tasks.html', locals())
 
 
+def task_output(request, uuid, stream):
+    """Stream the whole stdout or stderr of a task whose output was spooled."""
+    task = get_object_or_404(models.Task, taskuuid=uuid)
+    digest = task.stdout_digest if stream == 'stdout' else task.stderror_digest
+    if not digest:
+        raise Http404
+    try:
+        chunks = output_spool.iter_output(django_settings.SHARED_DIRECTORY, digest)
+        first = next(chunks, '')
+    except IOError:
+        raise Http404
+    response = StreamingHttpResponse(itertools.chain([first], chunks), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="{}-{}.txt"'.format(uuid, stream)
+    return response
+
+
 def tasks_subjobs(request, uuid):
     jobs = []
     possible_jobs = models.Job.objects.filter(subjobof=uuid)
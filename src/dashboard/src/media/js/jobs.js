@@ -610,6 +610,20 @@ BaseAppView = Backbone.View.extend({
 
   idle: false,
 
+  // Milliseconds between two polls while events are streamed
+  streamingInterval: 60000,
+
+  // Cursor of the latest status response, and the units received so far
+  cursor: null,
+
+  units: {},
+
+  polling: false,
+
+  pollAgain: false,
+
+  streaming: false,
+
   events: {
     'click #sip-header-actions > .btn_remove_all_sips': 'removeAllSIPs'
   },
@@ -674,8 +688,10 @@ BaseAppView = Backbone.View.extend({
 
   initialize: function(options)
     {
-      this.statusUrl = options.statusUrl;
-      this.uid       = options.uid;
+      this.statusUrl      = options.statusUrl;
+      this.eventsUrl      = options.eventsUrl;
+      this.statusUnitType = options.statusUnitType;
+      this.uid            = options.uid;
 
       _.bindAll(this, 'add', 'remove');
       Sips.bind('add', this.add);
@@ -684,6 +700,7 @@ BaseAppView = Backbone.View.extend({
       window.statusWidget = new window.StatusView();
 
       this.poll(true);
+      this.listen();
     },
 
   add: function(sip)
@@ -818,15 +835,218 @@ BaseAppView = Backbone.View.extend({
         }
     },
 
+  // Merge the units changed since the previous response, returning all the
+  // units received, latest first
+  mergeUnits: function(response)
+    {
+      var units = this.units;
+
+      if (null === this.cursor)
+        {
+          units = this.units = {};
+        }
+      _.each(response.objects, function(sip)
+        {
+          units[sip.uuid] = sip;
+        });
+      _.each(response.removed || [], function(uuid)
+        {
+          delete units[uuid];
+        });
+      this.cursor = undefined === response.cursor ? null : response.cursor;
+
+      return this.sortedUnits();
+    },
+
+  sortedUnits: function()
+    {
+      return _.sortBy(_.values(this.units), function(sip)
+        {
+          return -1 * sip.timestamp;
+        });
+    },
+
+  // Show the units, latest first
+  updateUnits: function(objects)
+    {
+      if (getURLParameter('paged'))
+        {
+          this.updateSips(objects);
+        } else {
+
+          for (i in objects)
+            {
+              var sip = objects[i];
+              var item = Sips.find(function(item)
+                {
+                  return item.get('uuid') == sip.uuid;
+                });
+
+              if (undefined === item)
+                {
+                  // Add new sips
+                  Sips.add(sip);
+                }
+              else
+                {
+                  // Update sips
+                  item.set(sip);
+                }
+            }
+        }
+
+      // Delete sips
+      if (Sips.length > objects.length)
+      {
+        var unusedSips = Sips.reject(function(sip)
+            {
+              return -1 < $.inArray(sip.get('uuid'), _.pluck(objects, 'uuid'));
+            });
+
+        Sips.remove(unusedSips);
+      }
+    },
+
+  // Follow the job events pushed by the server, if the browser supports
+  // server-sent events; polling then only serves as a fallback
+  listen: function()
+    {
+      if (!this.eventsUrl || undefined === window.EventSource)
+        {
+          return;
+        }
+
+      var self = this
+        , source = new EventSource(this.eventsUrl);
+
+      source.addEventListener('open', function()
+        {
+          self.streaming = true;
+          // Catch up with what changed while not listening
+          self.catchUp();
+        });
+
+      source.addEventListener('error', function()
+        {
+          // The browser reconnects by itself
+          self.streaming = false;
+        });
+
+      source.addEventListener('reset', function()
+        {
+          self.catchUp();
+        });
+
+      _.each(['job', 'choices', 'tasks', 'removed'], function(name)
+        {
+          source.addEventListener(name, function(event)
+            {
+              self.applyEvent(name, JSON.parse(event.data));
+            });
+        });
+    },
+
+  // Poll now, or as soon as the current poll is complete
+  catchUp: function()
+    {
+      if (this.polling)
+        {
+          this.pollAgain = true;
+        }
+      else
+        {
+          clearTimeout(this.timer);
+          this.poll();
+        }
+    },
+
+  // Apply an event to the units received so far. Units and jobs not
+  // received yet are polled for instead.
+  applyEvent: function(name, data)
+    {
+      if ('removed' === name)
+        {
+          var units = this.units;
+          _.each(data.units, function(uuid)
+            {
+              delete units[uuid];
+            });
+          this.updateUnits(this.sortedUnits());
+          return;
+        }
+
+      var unit = this.units[data.unit];
+
+      if (undefined === unit)
+        {
+          if (data.unit_type === this.statusUnitType)
+            {
+              this.catchUp();
+            }
+          return;
+        }
+
+      var jobs = _.map(unit.jobs, _.clone)
+        , jobUuid = 'job' === name ? data.job.uuid : data.job
+        , job = _.find(jobs, function(job)
+            {
+              return job.uuid == jobUuid;
+            });
+
+      if ('job' === name)
+        {
+          if (undefined !== job)
+            {
+              // Choices are sent on their own, possibly before the status
+              if (job.choices && data.job.currentstep == Sip.prototype.statuses['STATUS_AWAITING_DECISION'])
+                {
+                  data.job.choices = job.choices;
+                }
+              jobs = _.without(jobs, job);
+            }
+          jobs = _.sortBy(jobs.concat([data.job]), function(job)
+            {
+              return -1 * job.timestamp;
+            });
+        }
+      else if (undefined === job)
+        {
+          this.catchUp();
+          return;
+        }
+      else if ('choices' === name)
+        {
+          job.choices = data.choices;
+        }
+      else if ('tasks' === name)
+        {
+          job.tasks = {total: data.total, remaining: data.remaining};
+        }
+
+      this.units[data.unit] = _.extend({}, unit, {
+        jobs: jobs,
+        timestamp: Math.max(unit.timestamp, data.timestamp || 0)
+      });
+      this.updateUnits(this.sortedUnits());
+    },
+
   poll: function(start)
     {
+      if (this.polling)
+        {
+          this.pollAgain = true;
+          return;
+        }
+      this.polling = true;
       this.firstPoll = undefined !== start;
 
+      var since = null === this.cursor ? '' : 'since=' + this.cursor + '&';
+
       $.ajax({
         context: this,
         dataType: 'json',
         type: 'GET',
-        url: this.statusUrl + '?' + new Date().getTime(),
+        url: this.statusUrl + '?' + since + new Date().getTime(),
         beforeSend: function()
           {
             window.statusWidget.startPoll();
@@ -837,44 +1057,7 @@ BaseAppView = Backbone.View.extend({
           },
         success: function(response)
           {
-            var objects = response.objects;
-
-            if (getURLParameter('paged'))
-              {
-                this.updateSips(objects);
-              } else {
-
-                for (i in objects)
-                  {
-                    var sip = objects[i];
-                    var item = Sips.find(function(item)
-                      {
-                        return item.get('uuid') == sip.uuid;
-                      });
-
-                    if (undefined === item)
-                      {
-                        // Add new sips
-                        Sips.add(sip);
-                      }
-                    else
-                      {
-                        // Update sips
-                        item.set(sip);
-                      }
-                  }
-              }
-
-            // Delete sips
-            if (Sips.length > objects.length)
-            {
-              var unusedSips = Sips.reject(function(sip)
-                  {
-                    return -1 < $.inArray(sip.get('uuid'), _.pluck(objects, 'uuid'));
-                  });
-
-              Sips.remove(unusedSips);
-            }
+            this.updateUnits(this.mergeUnits(response));
 
             // MCP status
             if (response.mcp)
@@ -892,12 +1075,20 @@ BaseAppView = Backbone.View.extend({
 
             window.statusWidget.endPoll();
 
-            if (!self.idle)
+            this.polling = false;
+            clearTimeout(this.timer);
+
+            if (this.pollAgain)
+            {
+              this.pollAgain = false;
+              this.poll();
+            }
+            else if (!self.idle)
             {
-              setTimeout(function()
+              this.timer = setTimeout(function()
                 {
                   self.poll();
-                }, this.interval);
+                }, this.streaming ? this.streamingInterval : this.interval);
             }
           }
       });
@@ -33,6 +33,8 @@ CONFIG_MAPPING = {
     'watch_directory': {'section': 'Dashboard', 'option': 'watch_directory', 'type': 'string'},
     'elasticsearch_server': {'section': 'Dashboard', 'option': 'elasticsearch_server', 'type': 'string'},
     'elasticsearch_timeout': {'section': 'Dashboard', 'option': 'elasticsearch_timeout', 'type': 'float'},
+    'elasticsearch_bulk_chunk_size': {'section': 'Dashboard', 'option': 'elasticsearch_bulk_chunk_size', 'type': 'int'},
+    'elasticsearch_bulk_max_bytes': {'section': 'Dashboard', 'option': 'elasticsearch_bulk_max_bytes', 'type': 'int'},
     'search_enabled': [
         {'section': 'Dashboard', 'option': 'disable_search_indexing', 'type': 'iboolean'},
         {'section': 'Dashboard', 'option': 'search_enabled', 'type': 'boolean'},
@@ -62,6 +64,8 @@ shared_directory = /var/archivematica/sharedDirectory/
 watch_directory = /var/archivematica/sharedDirectory/watchedDirectories/
 elasticsearch_server = 127.0.0.1:9200
 elasticsearch_timeout = 10
+elasticsearch_bulk_chunk_size = 500
+elasticsearch_bulk_max_bytes = 10485760
 search_enabled = true
 gearman_server = 127.0.0.1:4730
 shibboleth_authentication = False
@@ -426,6 +430,8 @@ SHARED_DIRECTORY = config.get('shared_directory')
 WATCH_DIRECTORY = config.get('watch_directory')
 ELASTICSEARCH_SERVER = config.get('elasticsearch_server')
 ELASTICSEARCH_TIMEOUT = config.get('elasticsearch_timeout')
+ELASTICSEARCH_BULK_CHUNK_SIZE = config.get('elasticsearch_bulk_chunk_size')
+ELASTICSEARCH_BULK_MAX_BYTES = config.get('elasticsearch_bulk_max_bytes')
 SEARCH_ENABLED = config.get('search_enabled')
 STORAGE_SERVICE_CLIENT_TIMEOUT = config.get('storage_service_client_timeout')
 AGENTARCHIVES_CLIENT_TIMEOUT = config.get('agentarchives_client_timeout')
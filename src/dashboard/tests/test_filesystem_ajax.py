@@ -7,8 +7,11 @@ import os
 from django.core.urlresolvers import reverse
 from django.test import TestCase
 from django.test.client import Client
+from django.test.utils import override_settings
+import mock
 
 from components import helpers
+from components.filesystem_ajax import views
 from main import models
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -150,3 +153,62 @@ class TestSIPArrange(TestCase):
         assert base64.b64encode('subsip') in response_dict['entries']
         assert base64.b64encode('newsip') in response_dict['entries']
         assert len(response_dict['entries']) == 2
+
+
+TRANSFER_UUID = 'a29e7e86-eca9-43b6-b059-6f23a9802dc8'
+TRANSFER_PATH = 'originals/newsip-' + TRANSFER_UUID + '/'
+
+BROWSE = {
+    TRANSFER_PATH: {
+        'entries': ['logs', 'objects', 'processingMCP.xml'],
+        'directories': ['logs', 'objects'],
+    },
+    TRANSFER_PATH + 'objects/': {
+        'entries': ['evelyn_s_photo.jpg', 'indexed.jpg', 'not_indexed.jpg'],
+        'directories': [],
+    },
+}
+
+INDEXED_FILES = [
+    {'_source': {'relative_path': 'newsip-' + TRANSFER_UUID + '/objects/evelyn_s_photo.jpg',
+                 'fileuuid': '4fa8f739-b633-4c0f-8833-d108a4f4e88d',
+                 'sipuuid': TRANSFER_UUID}},
+    {'_source': {'relative_path': 'newsip-' + TRANSFER_UUID + '/objects/indexed.jpg',
+                 'fileuuid': 'c2c9c5c8-1f2b-4bd5-a5d5-5c2c0e0a6a0c',
+                 'sipuuid': TRANSFER_UUID}},
+]
+
+
+@mock.patch('components.filesystem_ajax.views.storage_service.browse_location', side_effect=lambda uuid, path: BROWSE[path])
+@mock.patch('components.filesystem_ajax.views.storage_service.get_file_metadata', return_value=[{'fileuuid': 'e0a1e2b3-5b1c-4e3a-9b3b-1f7a3c2b1d4e', 'sipuuid': TRANSFER_UUID}])
+@mock.patch('components.filesystem_ajax.views.elasticSearchFunctions.scan_all_results', side_effect=lambda *args, **kwargs: iter(INDEXED_FILES))
+@mock.patch('components.filesystem_ajax.views.elasticSearchFunctions.get_client')
+class TestCopyToArrange(TestCase):
+
+    fixtures = [os.path.join(THIS_DIR, 'fixtures', 'sip_arrange.json')]
+
+    def arranged(self):
+        return {(a.original_path, a.file_uuid) for a in models.SIPArrange.objects.filter(arrange_path__startswith='/arrange/toplevel/newsip/')}
+
+    @override_settings(SEARCH_ENABLED=True)
+    def test_file_uuids_looked_up_in_index(self, get_client, scan_all_results, get_file_metadata, browse_location):
+        views.copy_files_to_arrange(TRANSFER_PATH, '/arrange/toplevel/', fetch_children=True, backlog_uuid='backlog')
+
+        assert scan_all_results.call_count == 1
+        # Only the file missing from the index is looked up in the Storage Service
+        get_file_metadata.assert_called_once_with(relative_path='newsip-' + TRANSFER_UUID + '/objects/not_indexed.jpg')
+        # evelyn_s_photo.jpg is already arranged
+        assert self.arranged() == {
+            (None, None),
+            (TRANSFER_PATH + 'objects/indexed.jpg', 'c2c9c5c8-1f2b-4bd5-a5d5-5c2c0e0a6a0c'),
+            (TRANSFER_PATH + 'objects/not_indexed.jpg', 'e0a1e2b3-5b1c-4e3a-9b3b-1f7a3c2b1d4e'),
+        }
+        assert models.SIPArrange.objects.filter(arrange_path__startswith='/arrange/toplevel/newsip/').count() == 4
+
+    @override_settings(SEARCH_ENABLED=False)
+    def test_file_uuids_looked_up_in_storage_service_without_search(self, get_client, scan_all_results, get_file_metadata, browse_location):
+        views.copy_files_to_arrange(TRANSFER_PATH, '/arrange/toplevel/', fetch_children=True, backlog_uuid='backlog')
+
+        assert scan_all_results.call_count == 0
+        assert get_file_metadata.call_count == 3
+        assert len(self.arranged()) == 3
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import base64
+import os
+
+from django.test import TestCase
+import mock
+
+from components.ingest import views
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TRANSFER_UUID = 'a29e7e86-eca9-43b6-b059-6f23a9802dc8'
+TRANSFER_DIR = 'newsip-' + TRANSFER_UUID
+
+
+def record(path):
+    return {
+        'relative_path': TRANSFER_DIR + '/' + path,
+        'fileuuid': 'uuid-' + path,
+        'size': 1,
+        'tags': [],
+        'bulk_extractor_reports': [],
+        'modification_date': '',
+        'format': [],
+    }
+
+
+BACKLOG_FILES = [
+    'logs/transfer.log',
+    'objects/evelyn_s_photo.jpg',
+    'objects/evelyn_s_second_photo/evelyn_s_second_photo.jpg',
+    'objects/evelyn_s_second_photo/other.jpg',
+    'objects/evelyn_s_third_photo/evelyn_s_third_photo.jpg',
+]
+
+
+def names(nodes, key):
+    return [base64.b64decode(node[key]) for node in nodes]
+
+
+class TestTransferBacklogTree(TestCase):
+
+    fixtures = [os.path.join(THIS_DIR, 'fixtures', 'sip_arrange.json')]
+
+    def test_arranged_paths(self):
+        arranged = views._get_arranged_paths()
+        assert TRANSFER_DIR + '/objects/evelyn_s_photo.jpg' in arranged
+        assert 'originals/' + TRANSFER_DIR + '/objects/evelyn_s_photo.jpg' in arranged
+        assert TRANSFER_DIR + '/objects/evelyn_s_second_photo/other.jpg' not in arranged
+
+    def test_directory_tree(self):
+        arranged = views._get_arranged_paths()
+        tree = []
+        for path in BACKLOG_FILES:
+            path = TRANSFER_DIR + '/' + path
+            views._es_results_to_directory_tree(path, tree, not_draggable=path in arranged)
+
+        assert names(tree, 'name') == [TRANSFER_DIR]
+        transfer = tree[0]
+        assert transfer['properties']['object count'] == 5
+        assert transfer['properties']['display_string'] == '5 objects'
+        assert transfer['properties']['not_draggable'] is False
+        logs, objects = transfer['children']
+        assert logs['properties']['not_draggable'] is True
+        assert names(objects['children'], 'name') == ['evelyn_s_photo.jpg', 'evelyn_s_second_photo', 'evelyn_s_third_photo']
+        photo, second, third = objects['children']
+        assert photo['properties'] == {'not_draggable': True}
+        # One of its files is not arranged
+        assert second['properties']['object count'] == 2
+        assert second['properties']['not_draggable'] is False
+        assert third['properties']['not_draggable'] is True
+
+    def test_appraisal_tab_format(self):
+        directory_map = {}
+        transfers = []
+        for path in BACKLOG_FILES:
+            views._es_results_to_appraisal_tab_format(record(path), directory_map, transfers)
+
+        assert names(transfers, 'title') == [TRANSFER_DIR]
+        objects = directory_map[TRANSFER_DIR + '/objects']
+        assert names(objects['children'], 'title') == ['evelyn_s_photo.jpg', 'evelyn_s_second_photo', 'evelyn_s_third_photo']
+        assert objects['object_count'] == 3
+        assert directory_map[TRANSFER_DIR + '/objects/evelyn_s_second_photo']['object_count'] == 2
+
+    def test_arranged_paths_in_directory(self):
+        arranged = views._get_arranged_paths(TRANSFER_DIR + '/objects/evelyn_s_second_photo/')
+        assert TRANSFER_DIR + '/objects/evelyn_s_photo.jpg' not in arranged
+        arranged = views._get_arranged_paths(TRANSFER_DIR + '/objects/')
+        assert TRANSFER_DIR + '/objects/evelyn_s_photo.jpg' in arranged
+
+    @mock.patch('components.ingest.views.elasticSearchFunctions.transfer_file_paths_are_prefixable',
+                return_value=True)
+    @mock.patch('components.ingest.views.elasticSearchFunctions.scan_all_results',
+                side_effect=lambda *args, **kwargs: ({'_source': record(path)} for path in BACKLOG_FILES))
+    def test_backlog_directory_nodes(self, scan_all_results, prefixable):
+        nodes = views._backlog_directory_nodes(None, TRANSFER_UUID, TRANSFER_DIR, {})
+        assert names(nodes, 'title') == ['logs', 'objects']
+        assert [node['object_count'] for node in nodes] == [1, 3]
+        assert [node['not_draggable'] for node in nodes] == [True, False]
+        query = scan_all_results.call_args[1]['body']['query']['bool']['must']
+        assert {'prefix': {'relative_path.relative_path_unanalyzed': TRANSFER_DIR + '/'}} in query
+
+        nodes = views._backlog_directory_nodes(None, TRANSFER_UUID, TRANSFER_DIR + '/objects/', {})
+        assert names(nodes, 'relative_path') == [
+            TRANSFER_DIR + '/objects/evelyn_s_photo.jpg',
+            TRANSFER_DIR + '/objects/evelyn_s_second_photo',
+            TRANSFER_DIR + '/objects/evelyn_s_third_photo',
+        ]
+        assert [node['type'] for node in nodes] == ['file', 'directory', 'directory']
+        assert [node['not_draggable'] for node in nodes] == [True, False, True]
+
+        nodes = views._backlog_directory_nodes(None, TRANSFER_UUID, TRANSFER_DIR + '/objects/evelyn_s_second_photo', {})
+        assert names(nodes, 'title') == ['evelyn_s_second_photo.jpg', 'other.jpg']
+        query = scan_all_results.call_args[1]['body']['query']['bool']['must']
+        assert {'prefix': {'relative_path.relative_path_unanalyzed': TRANSFER_DIR + '/objects/evelyn_s_second_photo/'}} in query
+
+    @mock.patch('components.ingest.views.elasticSearchFunctions.transfer_file_paths_are_prefixable',
+                return_value=False)
+    @mock.patch('components.ingest.views.elasticSearchFunctions.scan_all_results',
+                side_effect=lambda *args, **kwargs: ({'_source': record(path)} for path in BACKLOG_FILES))
+    def test_backlog_directory_nodes_without_unanalyzed_paths(self, scan_all_results, prefixable):
+        nodes = views._backlog_directory_nodes(None, TRANSFER_UUID, TRANSFER_DIR + '/objects/evelyn_s_second_photo', {})
+        assert names(nodes, 'title') == ['evelyn_s_second_photo.jpg', 'other.jpg']
+        query = scan_all_results.call_args[1]['body']['query']['bool']['must']
+        assert query == [{'term': {'sipuuid': TRANSFER_UUID}}]
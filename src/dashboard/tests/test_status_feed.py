@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.test import TestCase
+from django.utils import timezone
+import mock
+
+from components import status_feed
+from main import models
+
+TRANSFER_UUID = '3e1e56ed-923b-4b53-84fe-c5c1c0b0cf8e'
+OTHER_UUID = 'f0b3bd6e-1b3a-4bbc-9d4c-3eaa1a4a5e2f'
+
+
+def create_job(unit_uuid, job_uuid, currentstep=models.Job.STATUS_EXECUTING_COMMANDS):
+    models.Job.objects.create(
+        jobuuid=job_uuid, jobtype='Job ' + job_uuid, sipuuid=unit_uuid,
+        unittype='unitTransfer', createdtime=timezone.now(), currentstep=currentstep,
+        directory='%sharedPath%currentlyProcessing/test-' + unit_uuid + '/')
+    models.UnitStatus.objects.job_created(
+        unit_uuid, 'unitTransfer',
+        directory='%sharedPath%currentlyProcessing/test-' + unit_uuid + '/', timestamp=1)
+
+
+@mock.patch('components.status_feed.get_choices', return_value=({}, True))
+class TestStatusFeed(TestCase):
+
+    def setUp(self):
+        create_job(TRANSFER_UUID, 'd4bb8bb5-2c0e-4fa8-8ec3-d4b5dbe6a0d5')
+        create_job(OTHER_UUID, '5e6c6b8a-5bcb-4b2b-8a0d-6d2b1b0e2c4e')
+
+    def test_full_status(self, get_choices):
+        response = status_feed.get_status('unitTransfer')
+        assert response['mcp'] is True
+        assert response['removed'] == []
+        assert sorted(unit['uuid'] for unit in response['objects']) == sorted([TRANSFER_UUID, OTHER_UUID])
+        unit = response['objects'][0]
+        assert unit['directory'] == 'test'
+        assert len(unit['jobs']) == 1
+        assert get_choices.call_count == 1
+
+    def test_status_since_cursor(self, get_choices):
+        cursor = status_feed.get_status('unitTransfer')['cursor'] + status_feed.CURSOR_OVERLAP
+        assert status_feed.get_status('unitTransfer', cursor)['objects'] == []
+
+        models.UnitStatus.objects.changed([TRANSFER_UUID])
+        response = status_feed.get_status('unitTransfer', cursor)
+        assert [unit['uuid'] for unit in response['objects']] == [TRANSFER_UUID]
+
+    def test_hidden_units_are_removed(self, get_choices):
+        cursor = status_feed.get_status('unitTransfer')['cursor'] + status_feed.CURSOR_OVERLAP
+        models.UnitStatus.objects.changed([OTHER_UUID], hidden=True)
+
+        response = status_feed.get_status('unitTransfer', cursor)
+        assert response['objects'] == []
+        assert response['removed'] == [OTHER_UUID]
+        assert [unit['uuid'] for unit in status_feed.get_status('unitTransfer')['objects']] == [TRANSFER_UUID]
+
+    def test_choices_are_indexed_by_job(self, get_choices):
+        get_choices.return_value = ({'d4bb8bb5-2c0e-4fa8-8ec3-d4b5dbe6a0d5': {'chain': 'Approve'}}, True)
+        units = {unit['uuid']: unit for unit in status_feed.get_status('unitTransfer')['objects']}
+        assert units[TRANSFER_UUID]['jobs'][0]['choices'] == {'chain': 'Approve'}
+        assert 'choices' not in units[OTHER_UUID]['jobs'][0]
+
+    def test_cursor_follows_revisions(self, get_choices):
+        models.UnitStatus.objects.filter(unit_uuid=TRANSFER_UUID).update(revision=100 * status_feed.CURSOR_OVERLAP)
+        models.UnitStatus.objects.filter(unit_uuid=OTHER_UUID).update(revision=10 * status_feed.CURSOR_OVERLAP)
+        assert status_feed.get_status('unitTransfer')['cursor'] == 99 * status_feed.CURSOR_OVERLAP
+
+        # Returned again within the overlap, but the cursor never goes back
+        response = status_feed.get_status('unitTransfer', 99 * status_feed.CURSOR_OVERLAP + 1)
+        assert [unit['uuid'] for unit in response['objects']] == [TRANSFER_UUID]
+        assert response['cursor'] == 99 * status_feed.CURSOR_OVERLAP + 1
+
+        response = status_feed.get_status('unitTransfer', 100 * status_feed.CURSOR_OVERLAP)
+        assert response['objects'] == []
+        assert response['cursor'] == 100 * status_feed.CURSOR_OVERLAP
+
+    def test_revisions_ignore_the_clocks_of_writers(self, get_choices):
+        # A writer with its clock an hour ahead
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            models.UnitStatus.objects.changed([OTHER_UUID])
+        cursor = status_feed.get_status('unitTransfer')['cursor'] + status_feed.CURSOR_OVERLAP
+        # Revisions of the database clock are in milliseconds with SQLite
+        time.sleep(0.01)
+
+        # Then another one with its clock an hour behind
+        with mock.patch('time.time', return_value=time.time() - 3600):
+            models.UnitStatus.objects.changed([TRANSFER_UUID], hidden=True)
+        response = status_feed.get_status('unitTransfer', cursor)
+        assert response['removed'] == [TRANSFER_UUID]
+        revisions = dict(models.UnitStatus.objects.values_list('unit_uuid', 'revision'))
+        assert revisions[TRANSFER_UUID] >= revisions[OTHER_UUID]
+
+    def test_cursor_kept_without_mcp(self, get_choices):
+        get_choices.return_value = ({}, False)
+        assert status_feed.get_status('unitTransfer', 42)['cursor'] == 42